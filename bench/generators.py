@@ -0,0 +1,126 @@
+import math
+import random
+from typing import *
+
+from src.geometry import Point, Segment
+
+
+def random_grid(n: int, seed: int = 0) -> Set[Segment]:
+    """Generates a jittered grid subdivision.
+
+    The vertices of a square lattice are randomly displaced, and each of them is connected to its right and upper right
+    neighbors, so that the faces are triangles and no segment is vertical.
+
+    Args:
+        n (int): The number of segments.
+        seed (int): The seed of the generator.
+
+    Returns:
+        Set[Segment]: The set of segments.
+    """
+
+    rng = random.Random(seed)
+
+    k = math.ceil(math.sqrt(n / 2)) + 1
+    grid = [[Point(i * 10 + rng.uniform(-2, 2), j * 10 + rng.uniform(-2, 2)) for j in range(k)] for i in range(k)]
+
+    segments = []
+    for i in range(k - 1):
+        for j in range(k):
+            segments.append(Segment(grid[i][j], grid[i + 1][j]))
+            if j < k - 1:
+                segments.append(Segment(grid[i][j], grid[i + 1][j + 1]))
+
+    return set(segments[:n])
+
+
+def polygon_mesh(n: int, seed: int = 0, sides: int = 6) -> Set[Segment]:
+    """Generates a subdivision of disjoint convex polygons.
+
+    Each polygon is inscribed in its own cell of a square grid, with vertices at random angles.
+
+    Args:
+        n (int): The number of segments.
+        seed (int): The seed of the generator.
+        sides (int): The number of sides of each polygon.
+
+    Returns:
+        Set[Segment]: The set of segments.
+    """
+
+    rng = random.Random(seed)
+
+    m = math.ceil(n / sides)
+    k = math.ceil(math.sqrt(m))
+
+    segments = []
+    for c in range(m):
+        cx = (c % k) * 10 + 5
+        cy = (c // k) * 10 + 5
+        angles = sorted(rng.uniform(0, 2 * math.pi) for _ in range(sides))
+        vertices = [Point(cx + 4 * math.cos(a), cy + 4 * math.sin(a)) for a in angles]
+        for i in range(sides):
+            segments.append(Segment(vertices[i], vertices[(i + 1) % sides]))
+
+    return set(segments[:n])
+
+
+def random_polylines(n: int, seed: int = 0, length: int = 10) -> Set[Segment]:
+    """Generates a subdivision of x-monotone polylines, each confined to its own horizontal band.
+
+    Args:
+        n (int): The number of segments.
+        seed (int): The seed of the generator.
+        length (int): The number of segments of each polyline.
+
+    Returns:
+        Set[Segment]: The set of segments.
+    """
+
+    rng = random.Random(seed)
+
+    segments = []
+    for i in range(math.ceil(n / length)):
+        xs = sorted(rng.uniform(0, 1000) for _ in range(length + 1))
+        vertices = [Point(x, i * 10 + rng.uniform(0, 9)) for x in xs]
+        for a, b in zip(vertices, vertices[1:]):
+            segments.append(Segment(a, b))
+
+    return set(segments[:n])
+
+
+def shared_x(n: int, seed: int = 0, columns: int = 16, length: int = 10) -> Set[Segment]:
+    """Generates an adversarial subdivision where many endpoints share the same X coordinate.
+
+    The vertices of the polylines are snapped to a small number of integer columns, so that the endpoints are far from
+    general position.
+
+    Args:
+        n (int): The number of segments.
+        seed (int): The seed of the generator.
+        columns (int): The number of distinct X coordinates.
+        length (int): The number of segments of each polyline, at most columns - 1.
+
+    Returns:
+        Set[Segment]: The set of segments.
+    """
+
+    rng = random.Random(seed)
+
+    segments = []
+    for i in range(math.ceil(n / length)):
+        xs = sorted(rng.sample(range(columns), length + 1))
+        vertices = [Point(x, i * 10 + rng.uniform(0, 9)) for x in xs]
+        for a, b in zip(vertices, vertices[1:]):
+            segments.append(Segment(a, b))
+
+    return set(segments[:n])
+
+
+# The available generators, by name.
+GENERATORS = {
+    "random_grid": random_grid,
+    "polygon_mesh": polygon_mesh,
+    "random_polylines": random_polylines,
+    "shared_x": shared_x,
+}
@@ -0,0 +1,159 @@
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import *
+
+from bench.generators import GENERATORS
+from src.geometry import Point, Segment
+from src.nodes import SearchPath
+from src.structures import Subdivision
+
+
+def build(segments: Set[Segment], seed: int) -> Subdivision:
+    """Builds the trapezoidal map of a subdivision with a fixed insertion order.
+
+    Args:
+        segments (Set[Segment]): The set of segments.
+        seed (int): The seed of the insertion order.
+
+    Returns:
+        Subdivision: The subdivision, with its trapezoidal map and search structure.
+    """
+
+    S = Subdivision(segments)
+    S.trapezoidal_map(seed)
+
+    return S
+
+
+def measure(segments: Set[Segment], seed: int, queries: int, memory: bool) -> Dict[str, Any]:
+    """Measures the construction and the queries of a subdivision.
+
+    Args:
+        segments (Set[Segment]): The set of segments.
+        seed (int): The seed of the insertion order and of the query points.
+        queries (int): The number of query points.
+        memory (bool): True to measure the peak memory of the construction with a second, traced build.
+
+    Returns:
+        Dict[str, Any]: The measurements.
+    """
+
+    res = {}
+
+    # Measure the construction.
+    start = time.perf_counter()
+    S = build(segments, seed)
+    res["build_seconds"] = time.perf_counter() - start
+
+    if memory:
+        tracemalloc.start()
+        build(segments, seed)
+        res["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+    # Measure the size of the structures.
+    C = S.T.D.compile()
+    res["trapezoids"] = len(S.T.trapezoids)
+    res["nodes"] = len(C.kind)
+    res["max_depth"] = C.max_depth()
+
+    # Generate uniform query points in the bounding box.
+    rng = random.Random(seed)
+    xs = [p.x for s in segments for p in (s.p, s.q)]
+    ys = [p.y for s in segments for p in (s.p, s.q)]
+    points = [Point(rng.uniform(min(xs), max(xs)), rng.uniform(min(ys), max(ys))) for _ in range(queries)]
+
+    # Measure the average depth of the queries.
+    path = SearchPath()
+    for q in points:
+        S.T.D.query(q, path)
+    res["avg_depth"] = path.comparisons / queries
+
+    # Measure the query throughput of the object DAG.
+    start = time.perf_counter()
+    for q in points:
+        S.T.D.query(q)
+    res["queries_per_second"] = queries / (time.perf_counter() - start)
+
+    # Measure the query throughput of the compiled structure.
+    start = time.perf_counter()
+    for q in points:
+        C.locate(q.x, q.y)
+    res["compiled_queries_per_second"] = queries / (time.perf_counter() - start)
+
+    # Measure the batch query throughput, if NumPy is available.
+    try:
+        import numpy as np
+    except ImportError:
+        np = None
+    if np is not None:
+        bx = np.array([q.x for q in points])
+        by = np.array([q.y for q in points])
+        start = time.perf_counter()
+        C.query_many(bx, by)
+        res["batch_queries_per_second"] = queries / (time.perf_counter() - start)
+
+    return res
+
+
+def revision() -> Optional[str]:
+    """Returns the current git revision of the repository, if available.
+    """
+
+    try:
+        out = subprocess.run(["git", "rev-parse", "HEAD"], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                             universal_newlines=True)
+    except OSError:
+        return None
+
+    return out.stdout.strip() or None
+
+
+def main() -> None:
+    """Main function.
+
+    Runs the benchmark for every combination of generator and size, writing one JSON object per line.
+    """
+
+    parser = argparse.ArgumentParser(description="Benchmark the trapezoidal map construction and queries.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000],
+                        help="numbers of segments, from 10^2 up to 10^6")
+    parser.add_argument("--generators", nargs="+", default=list(GENERATORS), choices=list(GENERATORS))
+    parser.add_argument("--queries", type=int, default=10000, help="number of query points")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced build that measures peak memory")
+    parser.add_argument("--output", help="file where the results are appended, by default the standard output")
+    args = parser.parse_args()
+
+    meta = {
+        "revision": revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+    out = open(args.output, "a") if args.output else sys.stdout
+
+    for name in args.generators:
+        for n in args.sizes:
+            segments = GENERATORS[name](n, args.seed)
+
+            res = {"generator": name, "n": len(segments), "seed": args.seed}
+            res.update(measure(segments, args.seed, args.queries, not args.no_memory))
+            res.update(meta)
+
+            out.write(json.dumps(res) + "\n")
+            out.flush()
+
+    if out is not sys.stdout:
+        out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+from typing import *
+
+
+class Arena:
+    """Class for arenas.
+
+    An arena stores objects in a growable list of slots, and identifies each of them with a dense integer handle: the
+    index of its slot, which is also written in the handle attribute of the object. The slots of discarded objects are
+    kept in a free list and reused by the following allocations, so that the handles stay small.
+    A handle is stable for as long as its object is in the arena, and it only depends on the order of the allocations
+    and of the discards, so it can be used as an external key, unlike the address of the object.
+
+    Attributes:
+        slots (List[Optional[Any]]): The objects, indexed by handle, or None for the free slots.
+        free (List[int]): The handles of the free slots.
+        size (int): The number of objects in the arena.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty Arena object.
+        """
+
+        self.slots = []
+        self.free = []
+        self.size = 0
+
+    def __len__(self) -> int:
+        """Returns the number of objects in the arena.
+        """
+
+        return self.size
+
+    def __iter__(self) -> Iterator[Any]:
+        """Iterates over the objects in the arena, in order of handle.
+        """
+
+        return (obj for obj in self.slots if obj is not None)
+
+    def __contains__(self, obj: Any) -> bool:
+        """Checks if an object is in the arena.
+        """
+
+        handle = obj.handle
+
+        return handle is not None and handle < len(self.slots) and self.slots[handle] is obj
+
+    def __getitem__(self, handle: int) -> Any:
+        """Returns the object of a handle.
+
+        Args:
+            handle (int): The handle.
+
+        Returns:
+            Any: The object.
+        """
+
+        res = self.slots[handle]
+        if res is None:
+            raise KeyError(handle)
+
+        return res
+
+    def add(self, obj: Any) -> int:
+        """Allocates a slot for an object and assigns its handle, reusing the most recently freed slot if any.
+
+        Args:
+            obj (Any): The object, whose handle must be None.
+
+        Returns:
+            int: The handle of the object.
+        """
+
+        if self.free:
+            handle = self.free.pop()
+            self.slots[handle] = obj
+        else:
+            handle = len(self.slots)
+            self.slots.append(obj)
+
+        obj.handle = handle
+        self.size += 1
+
+        return handle
+
+    def discard(self, obj: Any) -> None:
+        """Frees the slot of an object, if it is in the arena, and resets its handle.
+
+        Args:
+            obj (Any): The object.
+        """
+
+        if obj not in self:
+            return
+
+        self.slots[obj.handle] = None
+        self.free.append(obj.handle)
+        obj.handle = None
+        self.size -= 1
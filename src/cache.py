@@ -0,0 +1,129 @@
+from collections import OrderedDict
+from typing import *
+
+from src.geometry import Trapezoid
+
+
+class QueryCache:
+    """Class for query caches.
+
+    A query cache stores the results of the latest point location queries, keyed by the coordinates of the query point,
+    and evicts the least recently used entry when it is full. The keys are either the exact coordinates or the indices
+    of the cells of a square grid: in the latter case, all the points of a cell share the result of the first one that
+    has been queried, which is only exact for cells that do not cross the boundary of a trapezoid.
+    Every trapezoid references the keys that lead to it, so that the entries of replaced trapezoids can be invalidated.
+
+    Attributes:
+        capacity (int): The maximum number of entries.
+        quantum (Optional[float]): The side of the cells of the grid, or None for exact keys.
+        entries (OrderedDict): The cached trapezoids by key, from the least to the most recently used.
+        keys (Dict[Trapezoid, Set[Tuple[float, float]]]): The keys of the entries of each cached trapezoid.
+        hits (int): The number of queries answered by the cache.
+        misses (int): The number of queries not found in the cache.
+    """
+
+    def __init__(self, capacity: int = 65536, quantum: Optional[float] = None) -> None:
+        """Initializes an empty QueryCache object.
+
+        Args:
+            capacity (int): The maximum number of entries, which must be positive.
+            quantum (Optional[float]): The side of the cells of the grid, or None for exact keys.
+        """
+
+        if capacity <= 0:
+            raise ValueError("The capacity of a query cache must be positive, not " + str(capacity) + ".")
+
+        self.capacity = capacity
+        self.quantum = quantum
+        self.entries = OrderedDict()
+        self.keys = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        """Returns the number of entries in the cache.
+        """
+
+        return len(self.entries)
+
+    def key(self, x: float, y: float) -> Tuple[float, float]:
+        """Returns the key of a query point, given by its coordinates.
+
+        Args:
+            x (float): The X coordinate of the query point.
+            y (float): The Y coordinate of the query point.
+
+        Returns:
+            Tuple[float, float]: The key.
+        """
+
+        if self.quantum is None:
+            return x, y
+
+        return x // self.quantum, y // self.quantum
+
+    def get(self, key: Tuple[float, float]) -> Optional[Trapezoid]:
+        """Returns the cached trapezoid of a key, marking it as the most recently used.
+
+        Args:
+            key (Tuple[float, float]): The key.
+
+        Returns:
+            Optional[Trapezoid]: The cached trapezoid, or None if the key is not in the cache.
+        """
+
+        res = self.entries.get(key)
+
+        if res is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.entries.move_to_end(key)
+
+        return res
+
+    def put(self, key: Tuple[float, float], t: Trapezoid) -> None:
+        """Caches the trapezoid of a key, evicting the least recently used entry if the cache is full.
+
+        Args:
+            key (Tuple[float, float]): The key.
+            t (Trapezoid): The trapezoid.
+        """
+
+        if key in self.entries:
+            return
+
+        # Evict the least recently used entry.
+        if len(self.entries) >= self.capacity:
+            old_key, old = self.entries.popitem(last=False)
+            self._unlink(old_key, old)
+
+        self.entries[key] = t
+        self.keys.setdefault(t, set()).add(key)
+
+    def invalidate(self, ts: Iterable[Trapezoid]) -> None:
+        """Removes the entries of the given trapezoids.
+
+        Args:
+            ts (Iterable[Trapezoid]): The trapezoids that are no longer valid.
+        """
+
+        for t in ts:
+            for key in self.keys.pop(t, ()):
+                del self.entries[key]
+
+    def clear(self) -> None:
+        """Removes all the entries, keeping the counters.
+        """
+
+        self.entries.clear()
+        self.keys.clear()
+
+    def _unlink(self, key: Tuple[float, float], t: Trapezoid) -> None:
+        """Removes a key from the references of its trapezoid.
+        """
+
+        keys = self.keys[t]
+        keys.discard(key)
+        if not keys:
+            del self.keys[t]
@@ -0,0 +1,458 @@
+import bisect
+import json
+import math
+import os
+import random
+from array import array
+from collections import OrderedDict
+from typing import *
+
+from src.compiled import CompiledSearchStructure
+from src.geometry import Point, Segment, SegmentTable, Trapezoid
+from src.storage import load
+from src.tracing import tracer, INFO
+
+# Name of the index file of a catalog, and current version of its format.
+INDEX = "catalog.json"
+VERSION = 1
+
+# Maximum number of segments sampled to place the grid lines.
+SAMPLE_SIZE = 65536
+
+# Label of the outside of every face while a shard is built, which tells it apart from the trapezoids without a label.
+_OUTSIDE = object()
+
+
+class MapCatalog:
+    """Class for map catalogs.
+
+    A map catalog splits a subdivision that does not fit in memory into the cells of a grid, and stores a trapezoidal
+    map for each cell in its own file (see TrapezoidalMap.save). A query is routed to the cell that contains it, and the
+    shard of the cell is loaded on demand. The shards stay memory-mapped until the least recently used ones are evicted
+    to keep the size of the loaded files within a budget.
+    Every shard is the map of the segments clipped to its cell, with the top side of the cell split at the segments
+    that cross it and labeled with the faces below it, so that the faces are found without the other cells. For this
+    reason, the labels must describe both sides of every segment, with None for the outside, as in a subdivision of
+    polygons that do not contain each other (see Subdivision.from_polygons). The trapezoids returned by the queries are
+    the ones of the shards, which are numbered one shard after the other.
+    A point on a grid line belongs to the cell to its right or above it. A point on a vertical line is located as if it
+    were moved to the right by the smallest amount, since the clipped segments of the cell end on the line.
+
+    Attributes:
+        directory (str): The directory of the catalog.
+        x_lines (List[float]): The X coordinates of the vertical grid lines, from left to right.
+        y_lines (List[float]): The Y coordinates of the horizontal grid lines, from bottom to top.
+        files (List[str]): The file of the shard of each cell, by column and then by row.
+        sizes (List[int]): The size in bytes of the file of each shard.
+        base (array): The index of the first trapezoid of each shard, with one extra entry for the total.
+        memory_budget (int): The maximum size in bytes of the loaded shards, unless a single shard exceeds it.
+        resident (OrderedDict): The loaded shards by cell, from the least to the most recently used.
+        resident_bytes (int): The size in bytes of the loaded shards.
+        loads (int): The number of shards loaded so far.
+    """
+
+    def __init__(self, directory: str, memory_budget: int = 256 * 2 ** 20) -> None:
+        """Opens the MapCatalog in a directory, without loading any shard.
+
+        Args:
+            directory (str): The directory of the catalog.
+            memory_budget (int): The maximum size in bytes of the loaded shards.
+        """
+
+        with open(os.path.join(directory, INDEX)) as f:
+            index = json.load(f)
+
+        if index["version"] != VERSION:
+            raise ValueError("Unsupported version " + str(index["version"]) + " of the catalog " + directory + ".")
+
+        self.directory = directory
+        self.x_lines = index["x_lines"]
+        self.y_lines = index["y_lines"]
+        self.files = [shard["file"] for shard in index["shards"]]
+        self.sizes = [shard["bytes"] for shard in index["shards"]]
+        self.base = array("q", [0])
+        for shard in index["shards"]:
+            self.base.append(self.base[-1] + shard["trapezoids"])
+
+        self.memory_budget = memory_budget
+        self.resident = OrderedDict()
+        self.resident_bytes = 0
+        self.loads = 0
+
+    def __len__(self) -> int:
+        """Returns the number of shards of the catalog.
+        """
+
+        return len(self.files)
+
+    @classmethod
+    def build(cls, segments: Iterable[Segment], directory: str, cells: Tuple[int, int] = (8, 8),
+              seed: Optional[int] = None, memory_budget: int = 256 * 2 ** 20) -> "MapCatalog":
+        """Builds a map catalog from a stream of segments.
+
+        The segments are read once and kept in a segment table, with their labels, so that only the segments of a
+        single cell are Python objects at a time. The grid lines are placed at the quantiles of the coordinates of the
+        endpoints of a sample of the segments, and moved off the endpoints that lie on them. The shards are built one at
+        a time, each with a random insertion order generated by the seed, and saved to the directory.
+
+        Args:
+            segments (Iterable[Segment]): The segments of the subdivision, possibly labeled with their faces.
+            directory (str): The directory of the catalog, which is created if needed.
+            cells (Tuple[int, int]): The number of columns and rows of the grid.
+            seed (Optional[int]): The seed of the sample and of the insertion orders, by default a random one.
+            memory_budget (int): The maximum size in bytes of the loaded shards of the returned catalog.
+
+        Returns:
+            MapCatalog: The catalog.
+        """
+
+        table = SegmentTable()
+        above = []
+        below = []
+        for s in segments:
+            table.append(s)
+            above.append(s.above)
+            below.append(s.below)
+
+        n = len(table)
+        if n == 0:
+            raise ValueError("A map catalog needs at least one segment.")
+
+        rng = random.Random(seed)
+
+        # Place the grid lines.
+        sample = rng.sample(range(n), min(n, SAMPLE_SIZE))
+        x_lines = _place_lines(sorted(v for i in sample for v in (table.px[i], table.qx[i])), cells[0])
+        y_lines = _place_lines(sorted(v for i in sample for v in (table.py[i], table.qy[i])), cells[1])
+        _clear_lines(x_lines, (table.px, table.qx))
+        _clear_lines(y_lines, (table.py, table.qy))
+
+        # Get the bounds of the cells, with the same margin as Subdivision.bounding_box.
+        xb = [min(table.px) - 1] + x_lines + [max(table.qx) + 1]
+        yb = [min(min(table.py), min(table.qy)) - 1] + y_lines + [max(max(table.py), max(table.qy)) + 1]
+        rows = len(yb) - 1
+
+        # Find the faces along the horizontal lines: each crossing leads from the face on its left to the one on its
+        # right, starting from the outside.
+        crossings = [[] for _ in y_lines]
+        for i in range(n):
+            y1, y2 = min(table.py[i], table.qy[i]), max(table.py[i], table.qy[i])
+            for j in range(bisect.bisect_left(y_lines, y1), bisect.bisect_left(y_lines, y2)):
+                crossings[j].append((_x_at(table, i, y_lines[j]), i))
+
+        lines = []
+        for cross in crossings:
+            cross.sort(key=lambda e: e[0])
+            xs = array("d", (x for x, i in cross))
+            faces = [below[i] if table.dy[i] > 0 or table.dx[i] == 0 else above[i] for x, i in cross]
+            lines.append((xs, faces))
+        del crossings
+
+        # Assign the segments to the cells that they cross.
+        members = [array("q") for _ in range((len(xb) - 1) * rows)]
+        for i in range(n):
+            for c in range(bisect.bisect_left(x_lines, table.px[i]), bisect.bisect_left(x_lines, table.qx[i]) + 1):
+                x1 = max(table.px[i], xb[c])
+                x2 = min(table.qx[i], xb[c + 1])
+                if table.dx[i] == 0:
+                    y1, y2 = table.py[i], table.qy[i]
+                else:
+                    s = table.segment(i)
+                    y1, y2 = sorted((s.y_at(x1), s.y_at(x2)))
+                for r in range(bisect.bisect_left(y_lines, y1), bisect.bisect_left(y_lines, y2) + 1):
+                    members[c * rows + r].append(i)
+
+        os.makedirs(directory, exist_ok=True)
+
+        # Build the shards, one at a time.
+        shards = []
+        for k, cell in enumerate(members):
+            c, r = divmod(k, rows)
+            tracer.message(INFO, "Building the shard of the cell (" + str(c) + ", " + str(r) + ")...")
+
+            x1, x2, y1, y2 = xb[c], xb[c + 1], yb[r], yb[r + 1]
+            top = lines[r] if r < rows - 1 else (array("d"), [])
+            S = _shard(table, above, below, cell, x1, x2, y1, y2, top)
+            S.trapezoidal_map(rng.randrange(2 ** 32))
+            for t in S.T.trapezoids:
+                if t.face is _OUTSIDE:
+                    t.face = None
+
+            name = "shard_" + str(c) + "_" + str(r) + ".tmap"
+            path = os.path.join(directory, name)
+            S.T.save(path)
+            shards.append({"file": name, "trapezoids": len(S.T.D.compiled.trap_top), "bytes": os.path.getsize(path)})
+
+        index = {"version": VERSION, "x_lines": x_lines, "y_lines": y_lines, "shards": shards}
+        with open(os.path.join(directory, INDEX), "w") as f:
+            json.dump(index, f)
+
+        return cls(directory, memory_budget)
+
+    def cell(self, x: float, y: float) -> int:
+        """Returns the cell that contains a point, given by its coordinates.
+
+        Args:
+            x (float): The X coordinate of the point.
+            y (float): The Y coordinate of the point.
+
+        Returns:
+            int: The index of the cell.
+        """
+
+        return bisect.bisect_right(self.x_lines, x) * (len(self.y_lines) + 1) + bisect.bisect_right(self.y_lines, y)
+
+    def _route(self, x: float, y: float) -> Tuple[int, float]:
+        """Returns the cell that contains a point and the X coordinate where the point is located in its shard.
+        """
+
+        k = self.cell(x, y)
+        c = bisect.bisect_right(self.x_lines, x)
+        if c > 0 and self.x_lines[c - 1] == x:
+            x = math.nextafter(x, math.inf)
+
+        return k, x
+
+    def shard(self, k: int) -> CompiledSearchStructure:
+        """Returns the shard of a cell, loading it if needed and marking it as the most recently used.
+
+        The least recently used shards are evicted until the new one fits in the memory budget.
+
+        Args:
+            k (int): The index of the cell.
+
+        Returns:
+            CompiledSearchStructure: The shard.
+        """
+
+        res = self.resident.get(k)
+        if res is not None:
+            self.resident.move_to_end(k)
+            return res
+
+        # Evict the least recently used shards.
+        while self.resident and self.resident_bytes + self.sizes[k] > self.memory_budget:
+            old, _ = self.resident.popitem(last=False)
+            self.resident_bytes -= self.sizes[old]
+
+        res = load(os.path.join(self.directory, self.files[k]))
+        self.resident[k] = res
+        self.resident_bytes += self.sizes[k]
+        self.loads += 1
+
+        return res
+
+    def locate(self, x: float, y: float) -> int:
+        """Locates a point, given by its coordinates, in the catalog.
+
+        Args:
+            x (float): The X coordinate of the query point.
+            y (float): The Y coordinate of the query point.
+
+        Returns:
+            int: The index of the trapezoid that contains the point, or -1 if the query is not valid.
+        """
+
+        k, x = self._route(x, y)
+        i = self.shard(k).locate(x, y)
+
+        return self.base[k] + i if i >= 0 else -1
+
+    def query(self, q: Point) -> Optional[Trapezoid]:
+        """Queries a point in the catalog.
+
+        Args:
+            q (Point): The query point.
+
+        Returns:
+            Optional[Trapezoid]: The trapezoid of the shard that contains the query point.
+        """
+
+        k, x = self._route(q.x, q.y)
+
+        return self.shard(k).query(q if x == q.x else Point(x, q.y))
+
+    def query_face(self, q: Point) -> Optional[Hashable]:
+        """Queries the face of the subdivision that contains a point.
+
+        Args:
+            q (Point): The query point.
+
+        Returns:
+            Optional[Hashable]: The label of the face that contains the query point, or None if the point lies outside
+                every labeled face or the query is not valid.
+        """
+
+        k, x = self._route(q.x, q.y)
+
+        return self.shard(k).query_face(q if x == q.x else Point(x, q.y))
+
+    def trapezoid(self, i: int) -> Trapezoid:
+        """Creates a Trapezoid object for the i-th trapezoid of the catalog. See CompiledSearchStructure.trapezoid.
+
+        Args:
+            i (int): The index of the trapezoid.
+
+        Returns:
+            Trapezoid: The trapezoid.
+        """
+
+        k = bisect.bisect_right(self.base, i) - 1
+
+        return self.shard(k).trapezoid(i - self.base[k])
+
+    def query_many(self, xs: Sequence[float], ys: Sequence[float]) -> "numpy.ndarray":
+        """Locates a batch of points, given by their coordinates, in the catalog.
+
+        The points are grouped by cell, and each group is located in its shard with a single batch, so that every shard
+        is loaded at most once. See CompiledSearchStructure.query_many.
+
+        Args:
+            xs (Sequence[float]): The X coordinates of the query points.
+            ys (Sequence[float]): The Y coordinates of the query points.
+
+        Returns:
+            numpy.ndarray: The index of the trapezoid that contains each point, or -1 if the query is not valid.
+        """
+
+        import numpy as np
+
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+
+        columns = np.searchsorted(self.x_lines, xs, side="right")
+        cells = columns * (len(self.y_lines) + 1) + np.searchsorted(self.y_lines, ys, side="right")
+
+        # Move the points on the vertical lines to the right.
+        x_lines = np.asarray([-math.inf] + self.x_lines)
+        xs = np.where(xs == x_lines[columns], np.nextafter(xs, math.inf), xs)
+        res = np.full(xs.shape[0], -1, dtype=np.int64)
+
+        # Locate the points of each cell in its shard.
+        order = np.argsort(cells, kind="stable")
+        bounds = np.flatnonzero(np.diff(cells[order])) + 1
+        for group in np.split(order, bounds):
+            if group.size == 0:
+                continue
+            k = int(cells[group[0]])
+            found = self.shard(k).query_many(xs[group], ys[group])
+            res[group] = np.where(found >= 0, found + self.base[k], -1)
+
+        return res
+
+
+def _place_lines(values: List[float], count: int) -> List[float]:
+    """Places the lines that split sorted coordinates into the given number of parts, halfway between two of them.
+    """
+
+    res = []
+    for j in range(1, count):
+        c = j * len(values) // count
+        while 0 < c < len(values) and not values[c - 1] < (values[c - 1] + values[c]) / 2 < values[c]:
+            c += 1
+        if 0 < c < len(values):
+            w = (values[c - 1] + values[c]) / 2
+            if not res or w > res[-1]:
+                res.append(w)
+
+    return res
+
+
+def _clear_lines(lines: List[float], coordinates: Tuple[array, ...]) -> None:
+    """Moves the lines, in place, until no coordinate lies on them.
+    """
+
+    while True:
+        hits = set(lines).intersection(v for values in coordinates for v in values)
+        if not hits:
+            return
+        lines[:] = [math.nextafter(w, math.inf) if w in hits else w for w in lines]
+
+
+def _x_at(table: SegmentTable, i: int, y: float) -> float:
+    """Computes the X coordinate where the i-th segment of the table crosses a horizontal line.
+    """
+
+    if table.dx[i] == 0:
+        return table.px[i]
+
+    return table.px[i] + table.dx[i] * (y - table.py[i]) / table.dy[i]
+
+
+def _shard(table: SegmentTable, above: List[Optional[Hashable]], below: List[Optional[Hashable]], cell: array,
+           x1: float, x2: float, y1: float, y2: float, top: Tuple[array, List[Optional[Hashable]]]) -> "Subdivision":
+    """Creates the subdivision of a cell.
+
+    The segments are clipped to the cell, and the top side of the cell is split at the crossings of its line and
+    labeled with the face below each part. The missing labels of the segments are replaced with the outside label, so
+    that the trapezoids of the cell always take a label from their sides. The endpoints are shared by coordinates.
+
+    Args:
+        table (SegmentTable): The segments of the subdivision.
+        above (List[Optional[Hashable]]): The face above each segment.
+        below (List[Optional[Hashable]]): The face below each segment.
+        cell (array): The indices of the segments that cross the cell.
+        x1 (float): The minimum X coordinate of the cell.
+        x2 (float): The maximum X coordinate of the cell.
+        y1 (float): The minimum Y coordinate of the cell.
+        y2 (float): The maximum Y coordinate of the cell.
+        top (Tuple[array, List[Optional[Hashable]]]): The X coordinates of the crossings of the top line, from left to
+            right, and the face to the right of each of them.
+
+    Returns:
+        Subdivision: The subdivision of the cell.
+    """
+
+    from src.structures import Subdivision
+
+    points = {}
+
+    def point(x: float, y: float) -> Point:
+        return points.setdefault((x, y), Point(x, y))
+
+    def segment(p: Point, q: Point, a: Optional[Hashable], b: Optional[Hashable]) -> Segment:
+        s = Segment(p, q)
+        s.above = a if a is not None else _OUTSIDE
+        s.below = b if b is not None else _OUTSIDE
+        return s
+
+    segments = set()
+    for i in cell:
+        px, py, qx, qy, dx, dy = table.px[i], table.py[i], table.qx[i], table.qy[i], table.dx[i], table.dy[i]
+
+        if dx == 0:
+            # Clip the vertical segment to the bottom and top lines.
+            p = point(px, py) if py >= y1 else point(px, y1)
+            q = point(qx, qy) if qy <= y2 else point(qx, y2)
+            if p.y < q.y:
+                segments.add(segment(p, q, above[i], below[i]))
+            continue
+
+        # Clip the segment to the vertical lines.
+        s = table.segment(i)
+        lo, p = (px, point(px, py)) if px >= x1 else (x1, point(x1, s.y_at(x1)))
+        hi, q = (qx, point(qx, qy)) if qx <= x2 else (x2, point(x2, s.y_at(x2)))
+
+        # Clip it to the horizontal lines that it crosses.
+        for h in (y1, y2):
+            if min(py, qy) < h < max(py, qy):
+                x = _x_at(table, i, h)
+                if (dy > 0) == (h == y1) and x > lo:
+                    lo, p = x, point(x, h)
+                elif (dy > 0) != (h == y1) and x < hi:
+                    hi, q = x, point(x, h)
+
+        if lo < hi and y1 <= p.y <= y2 and y1 <= q.y <= y2:
+            segments.add(segment(p, q, above[i], below[i]))
+
+    # Split the top side at the crossings and label each part with the face below it.
+    xs, faces = top
+    first = bisect.bisect_right(xs, x1)
+    last = bisect.bisect_left(xs, x2)
+    cuts = [x1] + list(xs[first:last]) + [x2]
+    for k in range(len(cuts) - 1):
+        if cuts[k] < cuts[k + 1]:
+            face = faces[first + k - 1] if first + k > 0 else None
+            segments.add(segment(point(cuts[k], y2), point(cuts[k + 1], y2), None, face))
+
+    return Subdivision(segments)
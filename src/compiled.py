@@ -0,0 +1,566 @@
+from array import array
+from typing import *
+
+from src.geometry import Point, Segment, SegmentTable, Trapezoid
+from src.predicates import ERRBOUND, exact_lies_above, lies_above
+
+# Node kinds of the compiled search structure.
+X_NODE = 0
+Y_NODE = 1
+LEAF = 2
+
+
+class CompiledSearchStructure:
+    """Class for compiled search structures.
+
+    A compiled search structure is a flat, array-backed copy of a search structure. The nodes of the DAG are numbered
+    from the root, which has index 0, and are described by four parallel arrays: the kind of the node, the index of its
+    key and the indices of its children. The key of an X-node is a point, the key of a Y-node is a segment and the key
+    of a leaf is a trapezoid, each referenced by its index in the corresponding table.
+    The trapezoids are indexed by their handles in the trapezoidal map, so that the results of the queries can be joined
+    with the map and its adjacency graph, and they stay valid in a saved structure. The rows of the free slots of the
+    arena are empty, with -1 in every column.
+    Queries are answered by an iterative loop over integer indices, without touching the original objects.
+
+    Attributes:
+        kind (array): The kind of each node.
+        key (array): The key index of each node.
+        left (array): The left child of each node, or -1 for leaves.
+        right (array): The right child of each node, or -1 for leaves.
+        pt_x (array): The X coordinates of the points.
+        pt_y (array): The Y coordinates of the points.
+        segments (SegmentTable): The segment table.
+        trap_top (array): The top segment of each trapezoid.
+        trap_bottom (array): The bottom segment of each trapezoid.
+        trap_leftp (array): The left generator endpoint of each trapezoid.
+        trap_rightp (array): The right generator endpoint of each trapezoid.
+        trap_uln (array): The upper left neighbor of each trapezoid, or -1.
+        trap_lln (array): The lower left neighbor of each trapezoid, or -1.
+        trap_urn (array): The upper right neighbor of each trapezoid, or -1.
+        trap_lrn (array): The lower right neighbor of each trapezoid, or -1.
+        trap_face (array): The face of each trapezoid, as an index in the face table, or -1.
+        faces (List[Hashable]): The face table, with the label of each face.
+        trapezoids (List[Optional[Trapezoid]]): The original trapezoids, indexed like the trapezoid table, or None for
+            the empty rows, if available.
+        buffer (Optional[mmap]): The memory-mapped file that backs the arrays, if the structure has been loaded.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty CompiledSearchStructure object.
+        """
+
+        # Node arrays.
+        self.kind = array("b")
+        self.key = array("q")
+        self.left = array("q")
+        self.right = array("q")
+
+        # Point table.
+        self.pt_x = array("d")
+        self.pt_y = array("d")
+
+        # Segment table.
+        self.segments = SegmentTable()
+
+        # Trapezoid table.
+        self.trap_top = array("q")
+        self.trap_bottom = array("q")
+        self.trap_leftp = array("q")
+        self.trap_rightp = array("q")
+        self.trap_uln = array("q")
+        self.trap_lln = array("q")
+        self.trap_urn = array("q")
+        self.trap_lrn = array("q")
+        self.trap_face = array("q")
+
+        # Face table.
+        self.faces = []
+
+        self.trapezoids = []
+        self.buffer = None
+
+    def __str__(self) -> str:
+        """Returns the string representation of a CompiledSearchStructure object.
+        """
+
+        res = ""
+        res += "\tNodes: " + str(len(self.kind)) + "\n"
+        res += "\tPoints: " + str(len(self.pt_x)) + "\n"
+        res += "\tSegments: " + str(len(self.segments)) + "\n"
+        res += "\tTrapezoids: " + str(len(self.trap_top)) + "\n"
+
+        return res
+
+    @classmethod
+    def from_root(cls, root: "Node") -> "CompiledSearchStructure":
+        """Compiles the DAG rooted in the given node.
+
+        The nodes are numbered from the root (see number_nodes). Points and segments are numbered in order of first
+        appearance, and trapezoids by their handles.
+        If some trapezoid has no handle, as in a DAG built by hand, the trapezoids are numbered in order of first
+        appearance too.
+
+        Args:
+            root (Node): The root of the search structure.
+
+        Returns:
+            CompiledSearchStructure: The compiled search structure.
+        """
+
+        res = cls()
+
+        point_ids = {}
+        segment_ids = {}
+        trapezoid_ids = {}
+
+        def point_index(p: Point) -> int:
+            i = point_ids.get(id(p))
+            if i is None:
+                i = point_ids[id(p)] = len(res.pt_x)
+                res.pt_x.append(p.x)
+                res.pt_y.append(p.y)
+            return i
+
+        def segment_index(s: Segment) -> int:
+            i = segment_ids.get(id(s))
+            if i is None:
+                i = segment_ids[id(s)] = res.segments.append(s)
+            return i
+
+        def trapezoid_index(t: Trapezoid) -> int:
+            res.trapezoids.append(t)
+            return len(res.trapezoids) - 1
+
+        res.kind, res.key, res.left, res.right = number_nodes(root, point_index, segment_index, trapezoid_index)
+
+        # Number the trapezoids by their handles.
+        ts = res.trapezoids
+        if all(t.handle is not None for t in ts):
+            res.trapezoids = [None] * (max(t.handle for t in ts) + 1)
+            for t in ts:
+                res.trapezoids[t.handle] = t
+            for i in range(len(res.kind)):
+                if res.kind[i] == LEAF:
+                    res.key[i] = ts[res.key[i]].handle
+
+        for i, t in enumerate(res.trapezoids):
+            if t is not None:
+                trapezoid_ids[id(t)] = i
+
+        face_ids = {}
+
+        def face_index(label: Optional[Hashable]) -> int:
+            if label is None:
+                return -1
+            i = face_ids.get(label)
+            if i is None:
+                i = face_ids[label] = len(res.faces)
+                res.faces.append(label)
+            return i
+
+        def neighbor_index(t: Optional[Trapezoid]) -> int:
+            # Neighbors that are not leaves of the structure are recorded as missing.
+            return trapezoid_ids.get(id(t), -1)
+
+        # Fill the trapezoid table.
+        for t in res.trapezoids:
+            if t is None:
+                for column in (res.trap_top, res.trap_bottom, res.trap_leftp, res.trap_rightp, res.trap_uln,
+                               res.trap_lln, res.trap_urn, res.trap_lrn, res.trap_face):
+                    column.append(-1)
+                continue
+
+            res.trap_top.append(segment_index(t.top))
+            res.trap_bottom.append(segment_index(t.bottom))
+            res.trap_leftp.append(point_index(t.leftp))
+            res.trap_rightp.append(point_index(t.rightp))
+            res.trap_uln.append(neighbor_index(t.uln))
+            res.trap_lln.append(neighbor_index(t.lln))
+            res.trap_urn.append(neighbor_index(t.urn))
+            res.trap_lrn.append(neighbor_index(t.lrn))
+            res.trap_face.append(face_index(t.face))
+
+        return res
+
+    def locate(self, x: float, y: float) -> int:
+        """Locates a point, given by its coordinates, in the compiled search structure.
+
+        The traversal follows the same rules as Node.locate: it stops without a result when the point coincides with
+        the endpoint referenced by an X-node or with the left endpoint of the segment referenced by a Y-node.
+
+        Args:
+            x (float): The X coordinate of the query point.
+            y (float): The Y coordinate of the query point.
+
+        Returns:
+            int: The index of the trapezoid that contains the point, or -1 if the query is not valid.
+        """
+
+        kind = self.kind
+        key = self.key
+        left = self.left
+        right = self.right
+        pt_x = self.pt_x
+        pt_y = self.pt_y
+        seg_px = self.segments.px
+        seg_py = self.segments.py
+        seg_qx = self.segments.qx
+        seg_qy = self.segments.qy
+        seg_dx = self.segments.dx
+        seg_dy = self.segments.dy
+
+        i = 0
+        while True:
+            k = kind[i]
+            j = key[i]
+
+            if k == X_NODE:
+                px = pt_x[j]
+                if x == px and y == pt_y[j]:
+                    return -1
+                i = left[i] if x < px or (x == px and y < pt_y[j]) else right[i]
+            elif k == Y_NODE:
+                if x == seg_px[j] and y == seg_py[j]:
+                    return -1
+
+                above = lies_above(seg_px[j], seg_py[j], seg_qx[j], seg_qy[j], seg_dx[j], seg_dy[j], x, y)
+                i = left[i] if above else right[i]
+            else:
+                return j
+
+    def query(self, q: Point) -> Optional[Trapezoid]:
+        """Queries a point in the compiled search structure.
+
+        Args:
+            q (Point): The query point.
+
+        Returns:
+            Optional[Trapezoid]: The trapezoid that contains the query point.
+        """
+
+        i = self.locate(q.x, q.y)
+
+        if i < 0:
+            return None
+
+        return self.trapezoids[i] if self.trapezoids else self.trapezoid(i)
+
+    def query_face(self, q: Point) -> Optional[Hashable]:
+        """Queries the face that contains a point in the compiled search structure.
+
+        Args:
+            q (Point): The query point.
+
+        Returns:
+            Optional[Hashable]: The label of the face that contains the query point, or None if the point lies outside
+                every labeled face or the query is not valid.
+        """
+
+        i = self.locate(q.x, q.y)
+
+        if i < 0 or self.trap_face[i] < 0:
+            return None
+
+        return self.faces[self.trap_face[i]]
+
+    def trapezoid(self, i: int) -> Trapezoid:
+        """Creates a Trapezoid object for the i-th trapezoid of the table.
+
+        It is used when the original trapezoids are not available, as in loaded structures. The face is set, while the
+        neighbors are not.
+
+        Args:
+            i (int): The index of the trapezoid.
+
+        Returns:
+            Trapezoid: The trapezoid.
+        """
+
+        if self.trap_top[i] < 0:
+            raise ValueError("The row " + str(i) + " of the trapezoid table is empty.")
+
+        top = self.segments.segment(self.trap_top[i])
+        bottom = self.segments.segment(self.trap_bottom[i])
+        leftp = Point(self.pt_x[self.trap_leftp[i]], self.pt_y[self.trap_leftp[i]])
+        rightp = Point(self.pt_x[self.trap_rightp[i]], self.pt_y[self.trap_rightp[i]])
+
+        res = Trapezoid(top, bottom, leftp, rightp)
+        if self.trap_face[i] >= 0:
+            res.face = self.faces[self.trap_face[i]]
+
+        return res
+
+    def query_many(self, xs: Sequence[float], ys: Sequence[float]) -> "numpy.ndarray":
+        """Locates a batch of points, given by their coordinates, in the compiled search structure.
+
+        The DAG is descended one level at a time for all the queries that are still active: every step evaluates the
+        X-node and Y-node predicates of the whole batch at once with NumPy masks, and retires the queries that have
+        reached a leaf or an invalid position. The results are the same as the ones of locate.
+        NumPy is required by this method only.
+
+        Args:
+            xs (Sequence[float]): The X coordinates of the query points.
+            ys (Sequence[float]): The Y coordinates of the query points.
+
+        Returns:
+            numpy.ndarray: The index of the trapezoid that contains each point, or -1 if the query is not valid.
+        """
+
+        import numpy as np
+
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+
+        kind = np.asarray(self.kind)
+        key = np.asarray(self.key)
+        left = np.asarray(self.left)
+        right = np.asarray(self.right)
+        pt_x = np.asarray(self.pt_x)
+        pt_y = np.asarray(self.pt_y)
+        seg_px = np.asarray(self.segments.px)
+        seg_py = np.asarray(self.segments.py)
+        seg_qx = np.asarray(self.segments.qx)
+        seg_qy = np.asarray(self.segments.qy)
+        seg_dx = np.asarray(self.segments.dx)
+        seg_dy = np.asarray(self.segments.dy)
+
+        res = np.full(xs.shape[0], -1, dtype=np.int64)
+
+        # Every query starts from the root.
+        idx = np.arange(xs.shape[0])
+        cur = np.zeros(xs.shape[0], dtype=np.int64)
+
+        while idx.size > 0:
+            k = kind[cur]
+            j = key[cur]
+            x = xs[idx]
+            y = ys[idx]
+
+            go_left = np.zeros(idx.size, dtype=bool)
+            done = k == LEAF
+
+            # Evaluate the X-nodes.
+            is_x = np.flatnonzero(k == X_NODE)
+            px = pt_x[j[is_x]]
+            py = pt_y[j[is_x]]
+            go_left[is_x] = (x[is_x] < px) | ((x[is_x] == px) & (y[is_x] < py))
+            done[is_x] = (x[is_x] == px) & (y[is_x] == py)
+
+            # Evaluate the Y-nodes, with the filtered predicate of predicates.lies_above inlined over the batch.
+            is_y = np.flatnonzero(k == Y_NODE)
+            js = j[is_y]
+            px = seg_px[js]
+            py = seg_py[js]
+            xy = x[is_y]
+            yy = y[is_y]
+            a = seg_dx[js] * (seg_qy[js] - yy)
+            b = seg_dy[js] * (seg_qx[js] - xy)
+            xp = a - b
+            above = xp < 0
+
+            # Evaluate the uncertain signs in exact arithmetic.
+            for u in np.flatnonzero(np.abs(xp) <= ERRBOUND * (np.abs(a) + np.abs(b))):
+                ju = js[u]
+                above[u] = exact_lies_above(px[u], py[u], seg_qx[ju], seg_qy[ju], xy[u], yy[u])
+
+            go_left[is_y] = above
+            done[is_y] = (xy == px) & (yy == py)
+
+            # Retire the queries that have reached a leaf. Invalid queries keep their default result.
+            leaf = k == LEAF
+            res[idx[leaf]] = j[leaf]
+
+            # Move the remaining queries one level down.
+            nxt = np.where(go_left, left[cur], right[cur])
+            keep = ~done
+            idx = idx[keep]
+            cur = nxt[keep]
+
+        return res
+
+    def ray_shoot_up(self, xs: Sequence[float], ys: Sequence[float]) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+        """Finds the first segment hit by a vertical ray going up from each point of a batch.
+
+        The segment is the top of the trapezoid that contains the point (see query_many). A point on a segment lies in
+        the trapezoid above it, so its ray hits the next segment. NumPy is required.
+
+        Args:
+            xs (Sequence[float]): The X coordinates of the query points.
+            ys (Sequence[float]): The Y coordinates of the query points.
+
+        Returns:
+            Tuple[numpy.ndarray, numpy.ndarray]: The index of the hit segment in the segment table and the Y coordinate
+                of the hit point, for each point. The index is -1 and the coordinate is NaN if the ray only hits the
+                bounding box or if the query is not valid.
+        """
+
+        return self._ray_shoot(xs, ys, self.trap_top)
+
+    def ray_shoot_down(self, xs: Sequence[float], ys: Sequence[float]) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+        """Finds the first segment hit by a vertical ray going down from each point of a batch.
+
+        The segment is the bottom of the trapezoid that contains the point (see query_many). A point on a segment lies
+        in the trapezoid above it, so its ray hits the segment itself, at the same Y coordinate. NumPy is required.
+
+        Args:
+            xs (Sequence[float]): The X coordinates of the query points.
+            ys (Sequence[float]): The Y coordinates of the query points.
+
+        Returns:
+            Tuple[numpy.ndarray, numpy.ndarray]: The index of the hit segment in the segment table and the Y coordinate
+                of the hit point, for each point. The index is -1 and the coordinate is NaN if the ray only hits the
+                bounding box or if the query is not valid.
+        """
+
+        return self._ray_shoot(xs, ys, self.trap_bottom)
+
+    def _ray_shoot(self, xs: Sequence[float], ys: Sequence[float],
+                   side: array) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+        """Finds the segments on one side of the trapezoids that contain a batch of points, and their Y coordinates.
+
+        Args:
+            xs (Sequence[float]): The X coordinates of the query points.
+            ys (Sequence[float]): The Y coordinates of the query points.
+            side (array): The top or the bottom segment of each trapezoid.
+
+        Returns:
+            Tuple[numpy.ndarray, numpy.ndarray]: The index of the segment and the Y coordinate of the hit point.
+        """
+
+        import numpy as np
+
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+
+        seg_px = np.asarray(self.segments.px)
+        seg_py = np.asarray(self.segments.py)
+        seg_qx = np.asarray(self.segments.qx)
+        seg_qy = np.asarray(self.segments.qy)
+
+        # The sides of the bounding box are the only segments that are not keys of Y-nodes.
+        real = np.zeros(len(self.segments), dtype=bool)
+        real[np.asarray(self.key)[np.asarray(self.kind) == Y_NODE]] = True
+
+        ts = self.query_many(xs, ys)
+        seg = np.full(ts.shape[0], -1, dtype=np.int64)
+        valid = np.flatnonzero(ts >= 0)
+        seg[valid] = np.asarray(side)[ts[valid]]
+        seg[valid[~real[seg[valid]]]] = -1
+
+        # Evaluate the lines of the hit segments, returning their endpoints exactly.
+        hit = np.flatnonzero(seg >= 0)
+        j = seg[hit]
+        x = xs[hit]
+        px = seg_px[j]
+        py = seg_py[j]
+        qx = seg_qx[j]
+        qy = seg_qy[j]
+        dx = qx - px
+        vertical = dx == 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            y = py + (qy - py) * (x - px) / dx
+        y = np.where(x == px, py, np.where(x == qx, qy, y))
+
+        # A vertical segment is hit at the query point if it passes through it, or else at its nearest endpoint.
+        y[vertical] = np.clip(ys[hit][vertical], np.minimum(py, qy)[vertical], np.maximum(py, qy)[vertical])
+
+        res = np.full(ts.shape[0], np.nan)
+        res[hit] = y
+
+        return seg, res
+
+    def max_depth(self) -> int:
+        """Computes the maximum depth of the compiled search structure.
+
+        The maximum depth is the number of inner nodes on the longest path from the root to a leaf, which bounds the
+        number of comparisons of any query. It is computed with an explicit stack, visiting every node once.
+
+        Returns:
+            int: The maximum depth.
+        """
+
+        kind = self.kind
+        left = self.left
+        right = self.right
+
+        # Height of each node above its deepest leaf, or -1 if not computed yet.
+        height = array("q", [-1]) * len(kind)
+
+        stack = [0]
+        while stack:
+            i = stack[-1]
+
+            if height[i] >= 0:
+                stack.pop()
+            elif kind[i] == LEAF:
+                height[i] = 0
+                stack.pop()
+            elif height[left[i]] < 0:
+                stack.append(left[i])
+            elif height[right[i]] < 0:
+                stack.append(right[i])
+            else:
+                height[i] = 1 + max(height[left[i]], height[right[i]])
+                stack.pop()
+
+        return height[0]
+
+
+def number_nodes(root: "Node", point_index: Callable[[Point], int], segment_index: Callable[[Segment], int],
+                 trapezoid_index: Callable[[Trapezoid], int]) -> Tuple[array, array, array, array]:
+    """Numbers the nodes of the DAG rooted in the given node and describes them with flat arrays.
+
+    The nodes are numbered in depth-first order with an explicit stack, so that deep structures do not hit the recursion
+    limit, and the slot of each node is reserved before its children are visited. The root has index 0. The keys of the
+    nodes are numbered by the given functions, which are called once per node, in the order of the numbering.
+
+    Args:
+        root (Node): The root of the DAG.
+        point_index (Callable[[Point], int]): The function that numbers the point of an X-node.
+        segment_index (Callable[[Segment], int]): The function that numbers the segment of a Y-node.
+        trapezoid_index (Callable[[Trapezoid], int]): The function that numbers the trapezoid of a leaf.
+
+    Returns:
+        Tuple[array, array, array, array]: The kind, the key index and the left and right children of each node, with
+            -1 as the children of the leaves.
+    """
+
+    from src.nodes import XNode, YNode, LeafNode
+
+    kind = array("b")
+    key = array("q")
+    left = array("q")
+    right = array("q")
+
+    node_ids = {}
+    stack = []
+
+    def node_index(node: "Node") -> int:
+        i = node_ids.get(id(node))
+        if i is None:
+            i = node_ids[id(node)] = len(kind)
+            kind.append(LEAF)
+            key.append(-1)
+            left.append(-1)
+            right.append(-1)
+            stack.append(node)
+        return i
+
+    node_index(root)
+    while stack:
+        node = stack.pop()
+        i = node_ids[id(node)]
+
+        if isinstance(node, LeafNode):
+            key[i] = trapezoid_index(node.trapezoid)
+        else:
+            if isinstance(node, XNode):
+                kind[i] = X_NODE
+                key[i] = point_index(node.point)
+            elif isinstance(node, YNode):
+                kind[i] = Y_NODE
+                key[i] = segment_index(node.segment)
+            left[i] = node_index(node.left_child)
+            right[i] = node_index(node.right_child)
+
+    return kind, key, left, right
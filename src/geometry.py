@@ -1,16 +1,22 @@
+import math
+from array import array
 from typing import *
 
+from src.predicates import lies_above, orientation
+
 
 class Point:
     """Class for points.
 
-    A point is represented by its X and Y coordinates.
+    A point is represented by its X and Y coordinates. Points are lightweight handles without an instance dictionary.
 
     Attributes:
         x (float): The X coordinate.
         y (float): The Y coordinate.
     """
 
+    __slots__ = ("x", "y")
+
     def __init__(self, x: float, y: float) -> None:
         """Initializes a Point object.
 
@@ -33,6 +39,10 @@ class Point:
     def lies_left(self, p: "Point") -> bool:
         """Checks if the current point lies to the left of the given point.
 
+        Points with the same X coordinate are ordered by their Y coordinate, as if the plane were sheared by an
+        infinitesimal amount. This symbolic perturbation puts the points in general position, so that vertical segments
+        and endpoints with the same X coordinate are handled consistently.
+
         Args:
             p (Point): The other point.
 
@@ -40,11 +50,14 @@ class Point:
             bool: True if the current point lies to the left, False otherwise.
         """
 
-        return self.x < p.x
+        return self.x < p.x or (self.x == p.x and self.y < p.y)
 
     def lies_above(self, s: "Segment") -> bool:
         """Checks if the point lies above the given segment.
 
+        A point on the line of the segment lies above it. The predicate is exact: the floating-point cross product is
+        only trusted when it exceeds its error bound (see predicates.lies_above).
+
         Args:
             s (Segment): The segment.
 
@@ -52,32 +65,30 @@ class Point:
             bool: True if the point lies above, False otherwise.
         """
 
-        x = self.x
-        y = self.y
-        px = s.p.x
-        py = s.p.y
-        qx = s.q.x
-        qy = s.q.y
+        p = s.p
+        q = s.q
 
-        v1 = (qx - px, qy - py)
-        v2 = (qx - x, qy - y)
-
-        # Compute the cross product between the vectors.
-        xp = (v1[0] * v2[1]) - (v1[1] * v2[0])
-
-        return xp <= 0
+        return lies_above(p.x, p.y, q.x, q.y, s.dx, s.dy, self.x, self.y)
 
 
 class Segment:
     """Class for segments.
 
-    A segment is defined by its endpoints, which are specified from left to right.
+    A segment is defined by its endpoints, which are specified from left to right. Its direction is precomputed once,
+    since it is needed by every predicate that involves the segment. In a labeled subdivision, a segment also records
+    the faces that lie on its two sides.
 
     Attributes:
         p (Point): The leftmost endpoint.
         q (Point): The rightmost endpoint.
+        dx (float): The horizontal component of the direction, from p to q.
+        dy (float): The vertical component of the direction, from p to q.
+        above (Optional[Hashable]): The label of the face above the segment, if any.
+        below (Optional[Hashable]): The label of the face below the segment, if any.
     """
 
+    __slots__ = ("p", "q", "dx", "dy", "above", "below")
+
     def __init__(self, p1: Point, p2: Point) -> None:
         """Initializes a Segment object.
 
@@ -87,13 +98,21 @@ class Segment:
         """
 
         # Initialize the endpoints from left to right.
-        if p1.x < p2.x:
+        if p1.lies_left(p2):
             self.p = p1
             self.q = p2
         else:
             self.p = p2
             self.q = p1
 
+        # Precompute the direction of the segment.
+        self.dx = self.q.x - self.p.x
+        self.dy = self.q.y - self.p.y
+
+        # The faces are unknown until the segment is labeled.
+        self.above = None
+        self.below = None
+
     def __str__(self) -> str:
         """Returns the string representation of a Segment object.
         """
@@ -103,6 +122,139 @@ class Segment:
 
         return res
 
+    def y_at(self, x: float) -> float:
+        """Computes the Y coordinate of the line of the segment at the given X coordinate.
+
+        Args:
+            x (float): The X coordinate, which should lie in the X range of the segment.
+
+        Returns:
+            float: The Y coordinate, or the one of the left endpoint if the segment is vertical.
+        """
+
+        # Return the endpoints exactly.
+        if x == self.p.x or self.dx == 0:
+            return self.p.y
+        if x == self.q.x:
+            return self.q.y
+
+        return self.p.y + self.dy * (x - self.p.x) / self.dx
+
+    def side(self, other: "Segment") -> int:
+        """Computes the side of another segment where the current segment lies, over their common X range.
+
+        The segments must not cross. The result is given by the first endpoint of a segment that lies within the X range
+        of the other one and does not touch its line.
+
+        Args:
+            other (Segment): The other segment.
+
+        Returns:
+            int: 1 if the segment lies above the other one, -1 if it lies below and 0 if they cannot be told apart.
+        """
+
+        op = other.p
+        oq = other.q
+
+        # Test the endpoints of the current segment against the other one.
+        for r in (self.p, self.q):
+            if op.x <= r.x <= oq.x:
+                res = orientation(op.x, op.y, oq.x, oq.y, r.x, r.y)
+                if res != 0:
+                    return res
+
+        # Test the endpoints of the other segment against the current one.
+        for r in (op, oq):
+            if self.p.x <= r.x <= self.q.x:
+                res = orientation(self.p.x, self.p.y, self.q.x, self.q.y, r.x, r.y)
+                if res != 0:
+                    return -res
+
+        return 0
+
+
+class SegmentTable:
+    """Class for segment tables.
+
+    A segment table stores a set of segments as a structure of arrays: each coordinate of the endpoints and each
+    component of the direction is kept in its own contiguous array of floats, and a segment is referenced by its index.
+    The direction is precomputed once per segment, so that the predicates only evaluate the final cross product.
+
+    Attributes:
+        px (array): The X coordinates of the left endpoints.
+        py (array): The Y coordinates of the left endpoints.
+        qx (array): The X coordinates of the right endpoints.
+        qy (array): The Y coordinates of the right endpoints.
+        dx (array): The horizontal components of the directions.
+        dy (array): The vertical components of the directions.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty SegmentTable object.
+        """
+
+        self.px = array("d")
+        self.py = array("d")
+        self.qx = array("d")
+        self.qy = array("d")
+        self.dx = array("d")
+        self.dy = array("d")
+
+    def __len__(self) -> int:
+        """Returns the number of segments in the table.
+        """
+
+        return len(self.px)
+
+    @classmethod
+    def from_segments(cls, segments: Iterable[Segment]) -> "SegmentTable":
+        """Creates a segment table from the given segments, in order.
+
+        Args:
+            segments (Iterable[Segment]): The segments.
+
+        Returns:
+            SegmentTable: The segment table.
+        """
+
+        res = cls()
+
+        for s in segments:
+            res.append(s)
+
+        return res
+
+    def append(self, s: Segment) -> int:
+        """Appends a segment to the table.
+
+        Args:
+            s (Segment): The segment.
+
+        Returns:
+            int: The index of the segment in the table.
+        """
+
+        self.px.append(s.p.x)
+        self.py.append(s.p.y)
+        self.qx.append(s.q.x)
+        self.qy.append(s.q.y)
+        self.dx.append(s.dx)
+        self.dy.append(s.dy)
+
+        return len(self.px) - 1
+
+    def segment(self, i: int) -> Segment:
+        """Creates a Segment handle for the i-th segment of the table.
+
+        Args:
+            i (int): The index of the segment.
+
+        Returns:
+            Segment: The segment.
+        """
+
+        return Segment(Point(self.px[i], self.py[i]), Point(self.qx[i], self.qy[i]))
+
 
 class Trapezoid:
     """Class for trapezoids.
@@ -120,6 +272,8 @@ class Trapezoid:
         urn (Optional[Trapezoid]): The upper right neighbor.
         lrn (Optional[Trapezoid]): The lower right neighbor.
         leaf (LeafNode): The corresponding leaf.
+        face (Optional[Hashable]): The label of the face that contains the trapezoid, if any.
+        handle (Optional[int]): The handle of the trapezoid in its trapezoidal map, if it belongs to one.
     """
 
     def __init__(self, top: Segment, bottom: Segment, leftp: Point, rightp: Point) -> None:
@@ -147,6 +301,10 @@ class Trapezoid:
         # Create a new leaf associated to the trapezoid.
         self.leaf = LeafNode(self)
 
+        # The face and the handle are assigned by the trapezoidal map.
+        self.face = None
+        self.handle = None
+
     def __str__(self) -> str:
         """Returns the string representation of a Trapezoid object.
         """
@@ -163,6 +321,110 @@ class Trapezoid:
 
         return res
 
+    def contains(self, q: Point) -> bool:
+        """Checks if a point lies in the trapezoid, excluding its vertical walls.
+
+        As in the search structure, a point on the bottom segment lies in the trapezoid, while a point on the top
+        segment lies in the trapezoid above.
+
+        Args:
+            q (Point): The point.
+
+        Returns:
+            bool: True if the point lies in the trapezoid, False otherwise.
+        """
+
+        return self.leftp.x < q.x < self.rightp.x and q.lies_above(self.bottom) and not q.lies_above(self.top)
+
+    def overlaps(self, x1: float, y1: float, x2: float, y2: float, closed: bool = False) -> bool:
+        """Checks if the interior of the trapezoid overlaps the interior of a rectangle.
+
+        A trapezoid with no width, such as the one between two endpoints on the same vertical line, overlaps the
+        rectangle if its vertical side crosses it. If closed is True, the trapezoid may also just touch the rectangle.
+
+        Args:
+            x1 (float): The minimum X coordinate of the rectangle.
+            y1 (float): The minimum Y coordinate of the rectangle.
+            x2 (float): The maximum X coordinate of the rectangle.
+            y2 (float): The maximum Y coordinate of the rectangle.
+            closed (bool): True to include the boundaries of the trapezoid and of the rectangle.
+
+        Returns:
+            bool: True if the trapezoid overlaps the rectangle, False otherwise.
+        """
+
+        # Clip the X range of the trapezoid.
+        lo = max(self.leftp.x, x1)
+        hi = min(self.rightp.x, x2)
+        if lo > hi or (lo == hi and not closed and not x1 < lo < x2):
+            return False
+
+        # Since the sides are linear, their extreme values are reached at the ends of the clipped range.
+        top = self.top
+        bottom = self.bottom
+        if top.dx == 0:
+            ymax = max(top.p.y, top.q.y)
+        else:
+            ymax = max(top.y_at(lo), top.y_at(hi))
+        if bottom.dx == 0:
+            ymin = min(bottom.p.y, bottom.q.y)
+        else:
+            ymin = min(bottom.y_at(lo), bottom.y_at(hi))
+
+        if closed:
+            return ymax >= y1 and ymin <= y2
+
+        return ymax > y1 and ymin < y2
+
+    def centroid(self) -> Point:
+        """Computes the centroid of the trapezoid.
+
+        Returns:
+            Point: The centroid, or the average of the vertices if the trapezoid has no area.
+        """
+
+        x1 = self.leftp.x
+        x2 = self.rightp.x
+        b1 = self.bottom.y_at(x1)
+        b2 = self.bottom.y_at(x2)
+        h1 = self.top.y_at(x1) - b1
+        h2 = self.top.y_at(x2) - b2
+
+        # The centroid of the trapezoid is the weighted centroid of the two triangles split by its diagonal.
+        h = h1 + h2
+        if x1 == x2 or h <= 0:
+            return Point((x1 + x2) / 2, (b1 + b2 + (h1 + h2) / 2) / 2)
+
+        w = x2 - x1
+        x = x1 + w * (h1 + 2 * h2) / (3 * h)
+        y = (b1 * (2 * h1 + h2) + b2 * (h1 + 2 * h2) + h1 * h1 + h1 * h2 + h2 * h2) / (3 * h)
+
+        return Point(x, y)
+
+    def wall(self, other: "Trapezoid") -> Tuple[float, float, float]:
+        """Computes the vertical wall shared with a neighbor.
+
+        The wall passes through the generator endpoint on the side of the neighbor. A vertical segment is sheared as in
+        Point.lies_left, so it crosses the wall at the Y coordinate of the endpoint, clamped to its extent.
+
+        Args:
+            other (Trapezoid): The neighbor, on either side.
+
+        Returns:
+            Tuple[float, float, float]: The X coordinate of the wall, and the minimum and maximum Y coordinates of the
+                part that is shared by the two trapezoids, which are equal if they only touch.
+        """
+
+        v = self.rightp if other is self.urn or other is self.lrn else self.leftp
+
+        y1 = -math.inf
+        y2 = math.inf
+        for t in (self, other):
+            y1 = max(y1, t.bottom.y_at(v.x) if t.bottom.dx != 0 else min(max(v.y, t.bottom.p.y), t.bottom.q.y))
+            y2 = min(y2, t.top.y_at(v.x) if t.top.dx != 0 else min(max(v.y, t.top.p.y), t.top.q.y))
+
+        return v.x, y1, max(y1, y2)
+
     def set_neighbors(self, uln: Optional["Trapezoid"], lln: Optional["Trapezoid"],
                       urn: Optional["Trapezoid"], lrn: Optional["Trapezoid"]) -> None:
         """Sets the neighbors of the trapezoid.
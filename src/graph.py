@@ -0,0 +1,92 @@
+from array import array
+from typing import *
+
+from src.geometry import Trapezoid
+
+
+class AdjacencyGraph:
+    """Class for adjacency graphs.
+
+    An adjacency graph is an array-backed copy of the neighbor links of a trapezoidal map, in compressed sparse row
+    (CSR) format. The vertices are the trapezoids, numbered by their handles, so the rows of the free slots of the arena
+    are empty. The neighbors of the i-th trapezoid are indices[indptr[i]:indptr[i + 1]], and each edge is weighted with
+    the length of the vertical wall shared by the two trapezoids.
+    The arrays can be wrapped by NumPy or SciPy without copies, so graph algorithms do not touch the original objects.
+
+    Attributes:
+        indptr (array): The offset of the neighbors of each trapezoid, with one extra entry for the end.
+        indices (array): The neighbors of all the trapezoids, one row after the other.
+        wall (array): The length of the wall shared by each pair of neighbors, aligned with indices.
+        centroid_x (array): The X coordinate of the centroid of each trapezoid, or NaN for free slots.
+        centroid_y (array): The Y coordinate of the centroid of each trapezoid, or NaN for free slots.
+        face (List[Optional[Hashable]]): The face of each trapezoid, or None.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty AdjacencyGraph object.
+        """
+
+        self.indptr = array("q", [0])
+        self.indices = array("q")
+        self.wall = array("d")
+        self.centroid_x = array("d")
+        self.centroid_y = array("d")
+        self.face = []
+
+    def __len__(self) -> int:
+        """Returns the number of vertices, including the free slots.
+        """
+
+        return len(self.indptr) - 1
+
+    @classmethod
+    def from_trapezoids(cls, slots: Sequence[Optional[Trapezoid]]) -> "AdjacencyGraph":
+        """Builds the adjacency graph of the trapezoids of an arena, in one pass.
+
+        Args:
+            slots (Sequence[Optional[Trapezoid]]): The trapezoids, indexed by handle, or None for the free slots.
+
+        Returns:
+            AdjacencyGraph: The adjacency graph.
+        """
+
+        res = cls()
+        nan = float("nan")
+
+        for t in slots:
+            if t is None:
+                res.indptr.append(len(res.indices))
+                res.centroid_x.append(nan)
+                res.centroid_y.append(nan)
+                res.face.append(None)
+                continue
+
+            # Add the distinct neighbors, with the length of their shared wall.
+            prev = None
+            for n in (t.uln, t.lln, t.urn, t.lrn):
+                if n is None or n is prev:
+                    continue
+                _, y1, y2 = t.wall(n)
+                res.indices.append(n.handle)
+                res.wall.append(y2 - y1)
+                prev = n
+            res.indptr.append(len(res.indices))
+
+            c = t.centroid()
+            res.centroid_x.append(c.x)
+            res.centroid_y.append(c.y)
+            res.face.append(t.face)
+
+        return res
+
+    def neighbors(self, i: int) -> array:
+        """Returns the neighbors of the i-th trapezoid.
+
+        Args:
+            i (int): The handle of the trapezoid.
+
+        Returns:
+            array: The handles of the neighbors.
+        """
+
+        return self.indices[self.indptr[i]:self.indptr[i + 1]]
@@ -1,5 +1,6 @@
 from src.geometry import Point, Segment
 from src.structures import Subdivision
+from src.tracing import set_tracing, DEBUG
 
 
 def main():
@@ -11,6 +12,9 @@ def main():
 
     example = 2  # Number of the example
 
+    # Trace every step of the construction and of the query on the standard output.
+    set_tracing(DEBUG)
+
     # Create a sample subdivision.
     print("\n\n*** INITIALIZATION ***")
 
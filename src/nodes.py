@@ -1,6 +1,8 @@
 from typing import *
 
 from src.geometry import Point, Segment, Trapezoid
+from src.predicates import lies_above, orientation
+from src.tracing import tracer, INFO, DEBUG
 from src.util import *
 
 
@@ -8,18 +10,18 @@ class Node:
     """Class for the nodes of a search structure.
 
     Attributes:
-        parents (Set[Node]): The parents.
         left_child (Optional[Node]): The left child.
         right_child (Optional[Node]): The right child.
+        handle (Optional[int]): The handle of the node in its search structure, once it has been registered.
     """
 
     def __init__(self) -> None:
         """Initializes Node.
         """
 
-        self.parents = set()
         self.left_child = None
         self.right_child = None
+        self.handle = None
 
     def __str__(self) -> str:
         """Returns the string representation of a Node object.
@@ -32,22 +34,6 @@ class Node:
 
         return res
 
-    def add_parent(self, parent: "Node") -> None:
-        """Adds a new parent for the current node.
-
-        Args:
-            parent (Node): The new parent.
-        """
-
-        self.parents.add(parent)
-
-    def remove_parents(self):
-        """Removes all parents from the current node.
-        """
-
-        # Clear the parents.
-        self.parents.clear()
-
     def set_left_child(self, child: Optional["Node"]) -> None:
         """Sets the left child of the current node.
 
@@ -57,10 +43,6 @@ class Node:
 
         self.left_child = child
 
-        if child is not None:
-            # Add the current node as a parent of the child.
-            child.add_parent(self)
-
     def set_right_child(self, child: Optional["Node"]) -> None:
         """Sets the right child of the current node.
 
@@ -70,81 +52,305 @@ class Node:
 
         self.right_child = child
 
-        if child is not None:
-            # Add the current node as a parent of the child.
-            child.add_parent(self)
-
     def replace_leaf(self, old: "Node") -> None:
-        """Replaces an existing leaf by updating the children of all its parents.
+        """Replaces an existing leaf in place, turning it into the current node.
+
+        The old leaf takes the class and the attributes of the current node, so that all its parents reach the new node
+        through the references they already hold and the DAG needs no back-pointers. The current node is discarded and
+        must not be referenced anywhere else: its children are shared, but the node itself is not.
+        The old leaf keeps its handle, which now refers to the new node.
 
         Args:
             old (Node): The leaf to replace.
         """
 
-        # Iterate over all the parents of the old leaf.
-        for parent in old.parents:
-            if old == parent.left_child:
-                # Become the new left child.
-                parent.set_left_child(self)
-            if old == parent.right_child:  #
-                # Become the new right child.
-                parent.set_right_child(self)
-
-        # old.remove_parents()
+        handle = old.handle
+        old.__class__ = self.__class__
+        old.__dict__ = self.__dict__
+        old.handle = handle
 
-    def traverse(self, q: Point) -> Optional["Node"]:
-        """Recursively traverses the search structure until a leaf, or an X-node if the point is already present.
+    def traverse(self, q: Point, path: Optional["SearchPath"] = None) -> Optional["Node"]:
+        """Traverses the search structure until a leaf, or an X-node if the point is already present.
 
         In the search structure, each leaf represents a trapezoid of the refined subdivision. The search starts from the
         root and, by evaluating the inner nodes, a path to a leaf is obtained.
         X-nodes represent endpoints of the subdivision: the query point is either to the left or to the right.
         Y-nodes represent segments of the subdivision: the query point is either above or below.
-        The traversal is performed recursively, exploiting the tree-like structure of the DAG.
+        See locate, which performs the traversal iteratively.
 
         Args:
             q (Point): The query point.
+            path (Optional[SearchPath]): The container where the visited nodes are recorded, if any.
 
         Returns:
             Optional[Node]: The resulting node.
         """
 
-        # If the node is a leaf, it represents a trapezoid.
-        if isinstance(self, LeafNode):
-            print("Trapezoid ID: " + get_id(self.trapezoid))
-            return self
-        else:
+        return self.locate(q.x, q.y, path)
+
+    def locate(self, x: float, y: float, path: Optional["SearchPath"] = None) -> Optional["Node"]:
+        """Iteratively traverses the search structure from the current node, given the coordinates of the query point.
+
+        The traversal stops at a leaf, or at an inner node when the query point coincides with the endpoint of an X-node
+        or with the left endpoint of the segment of a Y-node. The query point is passed by its coordinates, so that
+        shifted points can be located without creating new Point objects.
+
+        Args:
+            x (float): The X coordinate of the query point.
+            y (float): The Y coordinate of the query point.
+            path (Optional[SearchPath]): The container where the visited nodes are recorded, if any.
+
+        Returns:
+            Optional[Node]: The resulting node.
+        """
+
+        trace = tracer.level >= DEBUG
+
+        node = self
+        while True:
+            if path is not None:
+                path.nodes.append(node)
+
+            # If the node is a leaf, it represents a trapezoid.
+            if isinstance(node, LeafNode):
+                if trace:
+                    tracer.emit(DEBUG, "leaf_reached", node=node, trapezoid=node.trapezoid)
+                return node
+
+            if path is not None:
+                path.comparisons += 1
+
             # If the node is an X-node, it represents an endpoint.
-            if isinstance(self, XNode):
-                if q.x == self.point.x and q.y == self.point.y:
+            if isinstance(node, XNode):
+                point = node.point
+                if x == point.x and y == point.y:
                     # Stop the traversal at the current X-node.
-                    return self
+                    return node
+
+                # Evaluate the same predicate as Point.lies_left.
+                if x < point.x or (x == point.x and y < point.y):
+                    branch = "left"
+                    nnext = node.left_child
                 else:
-                    if q.lies_left(self.point):
-                        print("<-\t" + str(self.point))
-                        nnext = self.left_child
-                    else:
-                        print("->\t" + str(self.point))
-                        nnext = self.right_child
+                    branch = "right"
+                    nnext = node.right_child
+                if trace:
+                    tracer.emit(DEBUG, "node_visited", node=node, key=point, branch=branch)
 
             # If the node is a Y-node, it represents as segment.
-            elif isinstance(self, YNode):
-                if q.x == self.segment.p.x and q.y == self.segment.p.y:
+            elif isinstance(node, YNode):
+                segment = node.segment
+                p = segment.p
+                q = segment.q
+                if x == p.x and y == p.y:
                     # Stop the traversal at the current Y-node.
-                    return self
+                    return node
+
+                if lies_above(p.x, p.y, q.x, q.y, segment.dx, segment.dy, x, y):
+                    branch = "above"
+                    nnext = node.left_child
+                else:
+                    branch = "below"
+                    nnext = node.right_child
+                if trace:
+                    tracer.emit(DEBUG, "node_visited", node=node, key=segment, branch=branch)
+
+            else:
+                tracer.message(INFO, "Error: Wrong node type.")
+                return
+
+            # Continue the traversal from the selected child.
+            node = nnext
+
+    def locate_segment(self, s: Segment, path: Optional["SearchPath"] = None) -> "LeafNode":
+        """Iteratively traverses the search structure from the current node to the trapezoid where a segment starts.
+
+        The traversal locates the left endpoint of the segment, moved by an infinitesimal amount along the segment, so
+        that the ties are broken symbolically during a single descent. At an X-node that coincides with the endpoint,
+        the segment lies to the right. At a Y-node whose line passes through the endpoint, such as a segment that
+        shares it, the segment lies on the side of its right endpoint.
+
+        Args:
+            s (Segment): The segment.
+            path (Optional[SearchPath]): The container where the visited nodes are recorded, if any.
+
+        Returns:
+            LeafNode: The leaf of the trapezoid that contains the beginning of the segment.
+        """
+
+        trace = tracer.level >= DEBUG
+
+        p = s.p
+        x = p.x
+        y = p.y
+
+        node = self
+        while True:
+            if path is not None:
+                path.nodes.append(node)
+
+            # If the node is a leaf, it represents a trapezoid.
+            if isinstance(node, LeafNode):
+                if trace:
+                    tracer.emit(DEBUG, "leaf_reached", node=node, trapezoid=node.trapezoid)
+                return node
+
+            if path is not None:
+                path.comparisons += 1
+
+            # If the node is an X-node, it represents an endpoint.
+            if isinstance(node, XNode):
+                point = node.point
+
+                # The segment starts to the right of its own endpoint.
+                if x < point.x or (x == point.x and y < point.y):
+                    branch = "left"
+                    nnext = node.left_child
+                else:
+                    branch = "right"
+                    nnext = node.right_child
+                if trace:
+                    tracer.emit(DEBUG, "node_visited", node=node, key=point, branch=branch)
+
+            # If the node is a Y-node, it represents as segment.
+            elif isinstance(node, YNode):
+                segment = node.segment
+                sp = segment.p
+                sq = segment.q
+
+                # If the endpoint lies on the line, the segment lies on the side of its right endpoint.
+                side = orientation(sp.x, sp.y, sq.x, sq.y, x, y)
+                if side == 0:
+                    side = orientation(sp.x, sp.y, sq.x, sq.y, s.q.x, s.q.y)
+
+                if side >= 0:
+                    branch = "above"
+                    nnext = node.left_child
                 else:
-                    if q.lies_above(self.segment):
-                        print("/\\\t" + str(self.segment))
-                        nnext = self.left_child
+                    branch = "below"
+                    nnext = node.right_child
+                if trace:
+                    tracer.emit(DEBUG, "node_visited", node=node, key=segment, branch=branch)
+
+            else:
+                tracer.message(INFO, "Error: Wrong node type.")
+                return
+
+            # Continue the traversal from the selected child.
+            node = nnext
+
+    def locate_beside(self, s: Segment, x: float, y: float, above: bool,
+                      path: Optional["SearchPath"] = None) -> "LeafNode":
+        """Iteratively traverses the search structure from the current node to the trapezoid beside a segment.
+
+        The traversal locates a point in the interior of the segment, moved by an infinitesimal amount above or below
+        it, so that the result is the trapezoid that the segment bounds from below or from above there. A vertical
+        segment is sheared as in Point.lies_left, so the trapezoid above it lies to its left.
+        The Y coordinate of the point is only used for vertical segments, since it is given by X for the other ones.
+
+        Args:
+            s (Segment): The segment.
+            x (float): The X coordinate of the point, strictly within the X range of the segment unless it is vertical.
+            y (float): The Y coordinate of the point, strictly within the Y range of the segment if it is vertical.
+            above (bool): True for the trapezoid above the segment, False for the one below.
+            path (Optional[SearchPath]): The container where the visited nodes are recorded, if any.
+
+        Returns:
+            LeafNode: The leaf of the trapezoid next to the segment.
+        """
+
+        trace = tracer.level >= DEBUG
+
+        node = self
+        while True:
+            if path is not None:
+                path.nodes.append(node)
+
+            # If the node is a leaf, it represents a trapezoid.
+            if isinstance(node, LeafNode):
+                if trace:
+                    tracer.emit(DEBUG, "leaf_reached", node=node, trapezoid=node.trapezoid)
+                return node
+
+            if path is not None:
+                path.comparisons += 1
+
+            # If the node is an X-node, it represents an endpoint.
+            if isinstance(node, XNode):
+                point = node.point
+
+                # On the same vertical line, the point lies to the left of the endpoints above the segment, or above
+                # the point itself if the segment is vertical.
+                if x == point.x:
+                    side = orientation(s.p.x, s.p.y, s.q.x, s.q.y, point.x, point.y)
+                    if side == 0 and s.dx == 0:
+                        left = y < point.y
                     else:
-                        print("\\/\t" + str(self.segment))
-                        nnext = self.right_child
+                        left = side > 0 or (side == 0 and not above)
+                else:
+                    left = x < point.x
+
+                if left:
+                    branch = "left"
+                    nnext = node.left_child
+                else:
+                    branch = "right"
+                    nnext = node.right_child
+                if trace:
+                    tracer.emit(DEBUG, "node_visited", node=node, key=point, branch=branch)
+
+            # If the node is a Y-node, it represents as segment.
+            elif isinstance(node, YNode):
+                segment = node.segment
+
+                # Compare the segments, which do not cross, and break the ties with the side of the point.
+                side = 0 if segment is s else s.side(segment)
+                if side == 0:
+                    side = 1 if above else -1
+
+                if side > 0:
+                    branch = "above"
+                    nnext = node.left_child
+                else:
+                    branch = "below"
+                    nnext = node.right_child
+                if trace:
+                    tracer.emit(DEBUG, "node_visited", node=node, key=segment, branch=branch)
 
             else:
-                print("Error: Wrong node type.")
+                tracer.message(INFO, "Error: Wrong node type.")
                 return
 
-            # Recursively traverse the DAG.
-            return nnext.traverse(q)
+            # Continue the traversal from the selected child.
+            node = nnext
+
+class SearchPath:
+    """Class for search paths.
+
+    A search path records the cost of a traversal of the search structure. It can be passed to the traversal methods to
+    inspect individual queries.
+
+    Attributes:
+        nodes (List[Node]): The visited nodes, in order, including the resulting one.
+        comparisons (int): The number of inner nodes whose predicate has been evaluated.
+    """
+
+    def __init__(self) -> None:
+        """Initializes an empty SearchPath object.
+        """
+
+        self.nodes = []
+        self.comparisons = 0
+
+    def __str__(self) -> str:
+        """Returns the string representation of a SearchPath object.
+        """
+
+        res = ""
+        res += "\tNodes: " + " -> ".join(get_id(node) for node in self.nodes) + "\n"
+        res += "\tComparisons: " + str(self.comparisons) + "\n"
+
+        return res
 
 
 class XNode(Node):
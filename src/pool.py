@@ -0,0 +1,104 @@
+import multiprocessing
+from typing import *
+
+from src.storage import load
+
+# The structure attached to the current worker process.
+_structure = None
+
+
+def _attach(path: str) -> None:
+    """Attaches a worker process to the saved structure.
+
+    Args:
+        path (str): The path of the file.
+    """
+
+    global _structure
+
+    _structure = load(path)
+
+
+def _query_chunk(chunk: Tuple["numpy.ndarray", "numpy.ndarray"]) -> "numpy.ndarray":
+    """Locates a chunk of points in the structure attached to the worker process.
+
+    Args:
+        chunk (Tuple[numpy.ndarray, numpy.ndarray]): The X and Y coordinates of the query points.
+
+    Returns:
+        numpy.ndarray: The index of the trapezoid that contains each point, or -1 if the query is not valid.
+    """
+
+    xs, ys = chunk
+
+    return _structure.query_many(xs, ys)
+
+
+class QueryPool:
+    """Class for query pools.
+
+    A query pool serves batch point location queries with several worker processes. Every worker memory-maps the same
+    saved structure (see TrapezoidalMap.save), so that a single read-only copy is shared through the page cache and no
+    worker rebuilds or unpickles the structure. The queries are dispatched to the workers as chunks of coordinates.
+    NumPy is required, as by CompiledSearchStructure.query_many.
+
+    Attributes:
+        path (str): The path of the saved structure.
+        chunk_size (int): The maximum number of queries dispatched to a worker at once.
+        pool (multiprocessing.pool.Pool): The pool of worker processes.
+    """
+
+    def __init__(self, path: str, processes: Optional[int] = None, chunk_size: int = 65536) -> None:
+        """Initializes a QueryPool object and starts its worker processes.
+
+        Args:
+            path (str): The path of the saved structure.
+            processes (Optional[int]): The number of worker processes, by default the number of CPUs.
+            chunk_size (int): The maximum number of queries dispatched to a worker at once.
+        """
+
+        self.path = path
+        self.chunk_size = chunk_size
+        self.pool = multiprocessing.Pool(processes, initializer=_attach, initargs=(path,))
+
+    def __enter__(self) -> "QueryPool":
+        """Returns the pool itself, which is closed when the context is exited.
+        """
+
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        """Closes the pool when the context is exited.
+        """
+
+        self.close()
+
+    def query_many(self, xs: Sequence[float], ys: Sequence[float]) -> "numpy.ndarray":
+        """Locates a batch of points, given by their coordinates, using the worker processes.
+
+        Args:
+            xs (Sequence[float]): The X coordinates of the query points.
+            ys (Sequence[float]): The Y coordinates of the query points.
+
+        Returns:
+            numpy.ndarray: The index of the trapezoid that contains each point, or -1 if the query is not valid.
+        """
+
+        import numpy as np
+
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+
+        # Split the batch into chunks and preserve their order in the result.
+        chunks = [(xs[i:i + self.chunk_size], ys[i:i + self.chunk_size]) for i in range(0, len(xs), self.chunk_size)]
+        if not chunks:
+            return np.zeros(0, dtype=np.int64)
+
+        return np.concatenate(self.pool.map(_query_chunk, chunks))
+
+    def close(self) -> None:
+        """Stops the worker processes.
+        """
+
+        self.pool.close()
+        self.pool.join()
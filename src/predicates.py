@@ -0,0 +1,89 @@
+from fractions import Fraction
+
+# Unit roundoff of double precision arithmetic.
+EPSILON = 2.0 ** -53
+
+# Relative error bound of the floating-point cross product a - b, where a and b are products of coordinate differences:
+# if |a - b| exceeds ERRBOUND * (|a| + |b|), its sign is the exact one (Shewchuk, "Adaptive Precision Floating-Point
+# Arithmetic and Fast Robust Geometric Predicates", 1997).
+ERRBOUND = (3.0 + 16.0 * EPSILON) * EPSILON
+
+
+def lies_above(px: float, py: float, qx: float, qy: float, dx: float, dy: float, x: float, y: float) -> bool:
+    """Checks if a point lies above the line of a segment, or on it, with a filtered exact predicate.
+
+    The cross product is evaluated in floating point, and its sign is accepted if the result exceeds the error bound.
+    Otherwise, the point is too close to the line and the predicate is evaluated again in exact arithmetic.
+
+    Args:
+        px (float): The X coordinate of the left endpoint of the segment.
+        py (float): The Y coordinate of the left endpoint of the segment.
+        qx (float): The X coordinate of the right endpoint of the segment.
+        qy (float): The Y coordinate of the right endpoint of the segment.
+        dx (float): The horizontal component of the direction of the segment, qx - px.
+        dy (float): The vertical component of the direction of the segment, qy - py.
+        x (float): The X coordinate of the point.
+        y (float): The Y coordinate of the point.
+
+    Returns:
+        bool: True if the point lies above or on the line, False otherwise.
+    """
+
+    a = dx * (qy - y)
+    b = dy * (qx - x)
+    xp = a - b
+
+    if abs(xp) > ERRBOUND * (abs(a) + abs(b)):
+        return xp < 0
+
+    return exact_lies_above(px, py, qx, qy, x, y)
+
+
+def exact_lies_above(px: float, py: float, qx: float, qy: float, x: float, y: float) -> bool:
+    """Checks if a point lies above the line of a segment, or on it, in exact rational arithmetic.
+
+    Floating-point coordinates are converted to fractions without rounding, so the result is exact for any input.
+
+    Args:
+        px (float): The X coordinate of the left endpoint of the segment.
+        py (float): The Y coordinate of the left endpoint of the segment.
+        qx (float): The X coordinate of the right endpoint of the segment.
+        qy (float): The Y coordinate of the right endpoint of the segment.
+        x (float): The X coordinate of the point.
+        y (float): The Y coordinate of the point.
+
+    Returns:
+        bool: True if the point lies above or on the line, False otherwise.
+    """
+
+    px, py, qx, qy, x, y = (Fraction(c) for c in (px, py, qx, qy, x, y))
+
+    return (qx - px) * (qy - y) - (qy - py) * (qx - x) <= 0
+
+
+def orientation(px: float, py: float, qx: float, qy: float, x: float, y: float) -> int:
+    """Computes the side of the line of a segment where a point lies, with a filtered exact predicate.
+
+    Args:
+        px (float): The X coordinate of the left endpoint of the segment.
+        py (float): The Y coordinate of the left endpoint of the segment.
+        qx (float): The X coordinate of the right endpoint of the segment.
+        qy (float): The Y coordinate of the right endpoint of the segment.
+        x (float): The X coordinate of the point.
+        y (float): The Y coordinate of the point.
+
+    Returns:
+        int: 1 if the point lies above the line, -1 if it lies below and 0 if it lies on it.
+    """
+
+    a = (qx - px) * (qy - y)
+    b = (qy - py) * (qx - x)
+    xp = a - b
+
+    if abs(xp) > ERRBOUND * (abs(a) + abs(b)):
+        return 1 if xp < 0 else -1
+
+    px, py, qx, qy, x, y = (Fraction(c) for c in (px, py, qx, qy, x, y))
+    xp = (qx - px) * (qy - y) - (qy - py) * (qx - x)
+
+    return (xp < 0) - (xp > 0)
@@ -0,0 +1,252 @@
+import heapq
+import math
+from array import array
+from typing import *
+
+from src.geometry import Point
+
+
+class Roadmap:
+    """Class for roadmaps.
+
+    A roadmap is a graph for motion planning among the obstacles of a subdivision, built from its trapezoidal map. The
+    free trapezoids are the ones whose face is free, by default the trapezoids outside every labeled polygon. Each free
+    trapezoid has a node at its centroid, and each wall shared by two free trapezoids has a node at its midpoint, linked
+    to the centroids of both. Since trapezoids are convex, every edge lies in the free space.
+    The graph is stored in compressed sparse row (CSR) format, with the Euclidean length of each edge as its weight.
+    The roadmap refers to the trapezoids of the map when it is built, so it must be built again after an update.
+
+    Attributes:
+        D (SearchStructure): The search structure used to locate the start and goal points.
+        node_x (array): The X coordinate of each node.
+        node_y (array): The Y coordinate of each node.
+        indptr (array): The offset of the edges of each node, with one extra entry for the end.
+        indices (array): The target node of each edge.
+        weight (array): The length of each edge.
+        component (array): The connected component of each node.
+        trap_node (array): The centroid node of each trapezoid, by handle, or -1 if the trapezoid is not free.
+    """
+
+    def __init__(self, D: "SearchStructure") -> None:
+        """Initializes an empty Roadmap object.
+
+        Args:
+            D (SearchStructure): The search structure used to locate the start and goal points.
+        """
+
+        self.D = D
+        self.node_x = array("d")
+        self.node_y = array("d")
+        self.indptr = array("q", [0])
+        self.indices = array("q")
+        self.weight = array("d")
+        self.component = array("q")
+        self.trap_node = array("q")
+
+    def __len__(self) -> int:
+        """Returns the number of nodes of the roadmap.
+        """
+
+        return len(self.node_x)
+
+    @classmethod
+    def from_map(cls, T: "TrapezoidalMap", free: Container[Optional[Hashable]] = (None,)) -> "Roadmap":
+        """Builds the roadmap of a trapezoidal map.
+
+        Args:
+            T (TrapezoidalMap): The trapezoidal map, whose faces have been labeled.
+            free (Container[Optional[Hashable]]): The labels of the free faces, where None stands for the outside.
+
+        Returns:
+            Roadmap: The roadmap.
+        """
+
+        res = cls(T.D)
+        slots = T.trapezoids.slots
+
+        # Create the centroid nodes of the free trapezoids.
+        res.trap_node = array("q", [-1]) * len(slots)
+        for t in slots:
+            if t is not None and t.face in free:
+                c = t.centroid()
+                res.trap_node[t.handle] = len(res.node_x)
+                res.node_x.append(c.x)
+                res.node_y.append(c.y)
+
+        # Create the wall nodes, visiting each pair of free neighbors once, and collect the edges.
+        adj = [[] for _ in range(len(res.node_x))]
+        for t in slots:
+            if t is None or res.trap_node[t.handle] < 0:
+                continue
+
+            for n in (t.urn, t.lrn if t.lrn is not t.urn else None):
+                if n is None or res.trap_node[n.handle] < 0:
+                    continue
+
+                # Skip the walls that only touch, where the obstacles meet.
+                x, y1, y2 = t.wall(n)
+                if y1 >= y2:
+                    continue
+
+                w = len(res.node_x)
+                res.node_x.append(x)
+                res.node_y.append((y1 + y2) / 2)
+                adj.append([])
+                for u in (res.trap_node[t.handle], res.trap_node[n.handle]):
+                    adj[u].append(w)
+                    adj[w].append(u)
+
+        # Store the edges in CSR format.
+        for u, targets in enumerate(adj):
+            for v in targets:
+                res.indices.append(v)
+                res.weight.append(math.hypot(res.node_x[v] - res.node_x[u], res.node_y[v] - res.node_y[u]))
+            res.indptr.append(len(res.indices))
+
+        res.label_components()
+
+        return res
+
+    def label_components(self) -> None:
+        """Labels the connected components of the roadmap, so that unreachable goals are detected in constant time.
+        """
+
+        indptr = self.indptr
+        indices = self.indices
+
+        self.component = array("q", [-1]) * len(self)
+        count = 0
+        for i in range(len(self)):
+            if self.component[i] >= 0:
+                continue
+
+            # Flood the component of the current node.
+            self.component[i] = count
+            stack = [i]
+            while stack:
+                u = stack.pop()
+                for v in indices[indptr[u]:indptr[u + 1]]:
+                    if self.component[v] < 0:
+                        self.component[v] = count
+                        stack.append(v)
+            count += 1
+
+    def node(self, q: Point) -> int:
+        """Finds the centroid node of the free trapezoid that contains a point.
+
+        Args:
+            q (Point): The point.
+
+        Returns:
+            int: The node, or -1 if the point is not valid or does not lie in the free space.
+        """
+
+        t = self.D.query(q)
+        if t is None or t.handle is None or t.handle >= len(self.trap_node):
+            return -1
+
+        return self.trap_node[t.handle]
+
+    def search(self, s: int, g: int) -> Optional[List[int]]:
+        """Finds the shortest path between two nodes of the roadmap with A*.
+
+        The heuristic is the Euclidean distance to the goal node, which never overestimates the length of a path.
+
+        Args:
+            s (int): The start node.
+            g (int): The goal node.
+
+        Returns:
+            Optional[List[int]]: The nodes of the path from start to goal, or None if the goal is not reachable.
+        """
+
+        if self.component[s] != self.component[g]:
+            return None
+
+        indptr = self.indptr
+        indices = self.indices
+        weight = self.weight
+        node_x = self.node_x
+        node_y = self.node_y
+        gx = node_x[g]
+        gy = node_y[g]
+
+        dist = {s: 0.0}
+        prev = {s: -1}
+        heap = [(math.hypot(node_x[s] - gx, node_y[s] - gy), 0.0, s)]
+        while heap:
+            _, d, u = heapq.heappop(heap)
+            if u == g:
+                break
+            if d > dist[u]:
+                continue
+
+            # Relax the edges of the current node.
+            for e in range(indptr[u], indptr[u + 1]):
+                v = indices[e]
+                nd = d + weight[e]
+                if nd < dist.get(v, math.inf):
+                    dist[v] = nd
+                    prev[v] = u
+                    heapq.heappush(heap, (nd + math.hypot(node_x[v] - gx, node_y[v] - gy), nd, v))
+
+        # Walk back from the goal.
+        res = []
+        u = g
+        while u >= 0:
+            res.append(u)
+            u = prev[u]
+        res.reverse()
+
+        return res
+
+    def plan(self, start: Point, goal: Point) -> Optional[List[Point]]:
+        """Plans a path between two points of the free space.
+
+        The points are located in the search structure and joined to the centroids of their trapezoids, which are
+        connected by the shortest path on the roadmap.
+
+        Args:
+            start (Point): The start point.
+            goal (Point): The goal point.
+
+        Returns:
+            Optional[List[Point]]: The vertices of the path, from start to goal, or None if there is no path.
+        """
+
+        return self.plan_many([start], [goal])[0]
+
+    def plan_many(self, starts: Sequence[Point], goals: Sequence[Point]) -> List[Optional[List[Point]]]:
+        """Plans the paths between many pairs of points of the free space.
+
+        All the points are located first, then the pairs in different components are discarded without a search, and
+        the pairs that connect the same nodes share a single search.
+
+        Args:
+            starts (Sequence[Point]): The start points.
+            goals (Sequence[Point]): The goal points, one for each start point.
+
+        Returns:
+            List[Optional[List[Point]]]: The vertices of each path, from start to goal, or None if there is no path.
+        """
+
+        paths = {}
+        res = []
+        for start, goal in zip(starts, goals):
+            s = self.node(start)
+            g = self.node(goal)
+            if s < 0 or g < 0:
+                res.append(None)
+                continue
+
+            # Search the roadmap once for each pair of nodes.
+            if (s, g) not in paths:
+                paths[s, g] = self.search(s, g)
+            nodes = paths[s, g]
+            if nodes is None:
+                res.append(None)
+                continue
+
+            res.append([start] + [Point(self.node_x[u], self.node_y[u]) for u in nodes] + [goal])
+
+        return res
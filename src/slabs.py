@@ -0,0 +1,414 @@
+import bisect
+import math
+import random
+from array import array
+from typing import *
+
+from src.arena import Arena
+from src.compiled import X_NODE, Y_NODE, LEAF, number_nodes
+from src.geometry import Point, Segment, Trapezoid
+from src.nodes import Node, XNode, YNode, LeafNode
+from src.tracing import tracer, INFO
+
+# Space between a wall and the side of the bounding box of the slabs next to it.
+MARGIN = 1
+
+
+def place_walls(segments: List[Segment], count: int) -> Tuple[List[float], List[List[Tuple[float, int]]]]:
+    """Places the vertical walls that cut a subdivision into slabs with about the same number of endpoints.
+
+    Every wall lies halfway between two consecutive X coordinates of the endpoints, so that no endpoint and no vertical
+    segment lies on it. The segments that cross a wall are clipped there, at the Y coordinate of their line rounded to a
+    float: if two crossings cannot be told apart after rounding, the wall is moved to the following gap, or dropped.
+
+    Args:
+        segments (List[Segment]): The segments of the subdivision.
+        count (int): The number of slabs.
+
+    Returns:
+        Tuple[List[float], List[List[Tuple[float, int]]]]: The X coordinates of the walls, from left to right, and the
+            crossings of each wall, as the Y coordinate and the index of each crossing segment, from bottom to top.
+    """
+
+    xs = sorted(p.x for s in segments for p in (s.p, s.q))
+
+    # Pick the gap between endpoints closest to each quantile.
+    gaps = []
+    for j in range(1, count):
+        c = max(j * len(xs) // count, gaps[-1] + 1 if gaps else 1)
+        while c < len(xs) and not xs[c - 1] < (xs[c - 1] + xs[c]) / 2 < xs[c]:
+            c += 1
+        if c < len(xs):
+            gaps.append(c)
+
+    walls = [(xs[c - 1] + xs[c]) / 2 for c in gaps]
+
+    # Find the crossings of all the walls in a single pass.
+    crossings = [[] for _ in walls]
+    for i, s in enumerate(segments):
+        for j in range(bisect.bisect_left(walls, s.p.x), bisect.bisect_left(walls, s.q.x)):
+            crossings[j].append((s.y_at(walls[j]), i))
+
+    res = ([], [])
+    for j, c in enumerate(gaps):
+        end = gaps[j + 1] if j + 1 < len(gaps) else len(xs)
+        cross = sorted(crossings[j], key=lambda e: e[0])
+
+        # Move the wall until its crossings are separated.
+        while not _separated(segments, cross):
+            c += 1
+            while c < end and not xs[c - 1] < (xs[c - 1] + xs[c]) / 2 < xs[c]:
+                c += 1
+            if c >= end:
+                break
+            w = (xs[c - 1] + xs[c]) / 2
+            cross = sorted(((s.y_at(w), i) for i, s in enumerate(segments) if s.p.x < w < s.q.x), key=lambda e: e[0])
+        else:
+            res[0].append((xs[c - 1] + xs[c]) / 2)
+            res[1].append(cross)
+
+    return res
+
+
+def _separated(segments: List[Segment], cross: List[Tuple[float, int]]) -> bool:
+    """Checks if the rounded crossings of a wall are distinct and in the same order as the segments.
+    """
+
+    for (y1, i), (y2, j) in zip(cross, cross[1:]):
+        if not y1 < y2 or segments[j].side(segments[i]) != 1:
+            return False
+
+    return True
+
+
+def build_slabs(segments: List[Segment], R: Trapezoid, walls: List[float], crossings: List[List[Tuple[float, int]]],
+                processes: Optional[int] = None, seed: Optional[int] = None) -> "TrapezoidalMap":
+    """Builds a trapezoidal map by slabs, in parallel, and stitches them together.
+
+    Each slab has its own bounding box, which extends past its walls by a margin, and the segments are clipped to the
+    walls. The map and the search structure of every slab are built by a worker process and sent back as flat tables,
+    since deeply linked objects cannot be pickled. In each slab, the trapezoids that lie beyond a wall are artifacts of
+    the clipping, and the ones that touch a wall are merged with their counterparts across it, which have the same top
+    and bottom segments. Since the trapezoidal map does not depend on the insertion order, the result is the same map
+    built by Subdivision.trapezoidal_map.
+    The search structure is a tree of X-nodes on the walls, whose leaves are the search structures of the slabs. Their
+    merged leaves forward to the leaf of the merged trapezoid, and the leaves of the artifacts to a tree of Y-nodes over
+    the crossings of their wall, which only points on the wall can reach. A query that coincides with a crossing is not
+    valid, as a query on an endpoint.
+
+    Args:
+        segments (List[Segment]): The segments, in the canonical order that is shuffled in each slab.
+        R (Trapezoid): The bounding box rectangle.
+        walls (List[float]): The X coordinates of the walls, from left to right (see place_walls).
+        crossings (List[List[Tuple[float, int]]]): The crossings of each wall, from bottom to top (see place_walls).
+        processes (Optional[int]): The number of worker processes, by default the number of CPUs, or 1 to build the
+            slabs in the current process.
+        seed (Optional[int]): The seed that generates the seeds of the slabs, by default a random one.
+
+    Returns:
+        TrapezoidalMap: The trapezoidal map, with its search structure.
+    """
+
+    from src.structures import TrapezoidalMap
+
+    count = len(walls) + 1
+    tracer.message(INFO, "Building the trapezoidal map in " + str(count) + " slabs...")
+
+    # Create the points where the segments cross the walls, shared by the slabs on both sides.
+    wall_points = [{i: Point(w, y) for y, i in cross} for w, cross in zip(walls, crossings)]
+
+    # Collect the corners, the endpoints and the segments of each slab.
+    y1 = R.bottom.p.y
+    y2 = R.top.q.y
+    points = []
+    point_ids = []
+    tables = []
+    for k in range(count):
+        ll = Point(walls[k - 1] - MARGIN, y1) if k > 0 else R.bottom.p
+        ul = Point(walls[k - 1] - MARGIN, y2) if k > 0 else R.top.p
+        lr = Point(walls[k] + MARGIN, y1) if k < count - 1 else R.bottom.q
+        ur = Point(walls[k] + MARGIN, y2) if k < count - 1 else R.top.q
+        points.append([ll, lr, ul, ur])
+        point_ids.append({id(p): i for i, p in enumerate(points[k])})
+        tables.append(array("q"))
+
+    def point_index(k: int, p: Point) -> int:
+        i = point_ids[k].get(id(p))
+        if i is None:
+            i = point_ids[k][id(p)] = len(points[k])
+            points[k].append(p)
+        return i
+
+    for i, s in enumerate(segments):
+        first = bisect.bisect_left(walls, s.p.x)
+        last = bisect.bisect_left(walls, s.q.x)
+
+        # Clip the segment to every slab that it crosses.
+        for k in range(first, last + 1):
+            p = s.p if k == first else wall_points[k - 1][i]
+            q = s.q if k == last else wall_points[k][i]
+            tables[k].extend((i, point_index(k, p), point_index(k, q)))
+
+    rng = random.Random(seed)
+    tasks = [(array("d", (p.x for p in points[k])), array("d", (p.y for p in points[k])), tables[k],
+              rng.randrange(2 ** 32)) for k in range(count)]
+
+    # Build the slabs.
+    if processes == 1:
+        results = [_build_slab(*task) for task in tasks]
+    else:
+        import multiprocessing
+
+        with multiprocessing.Pool(min(processes or count, count)) as pool:
+            results = pool.starmap(_build_slab, tasks)
+
+    tracer.message(INFO, "Stitching the slabs...")
+
+    # Merge the trapezoids that touch the walls into chains, from left to right.
+    chains = []
+    gaps = [{} for _ in walls]
+    artifacts = [[] for _ in walls]
+    roots = []
+    open_chains = {}
+    for k, (traps, nodes) in enumerate(results):
+        pieces, root = _rebuild(points[k], segments, R, traps, nodes)
+        roots.append(root)
+
+        left = walls[k - 1] if k > 0 else -math.inf
+        right = walls[k] if k < count - 1 else math.inf
+
+        reaching = {}
+        for t in pieces:
+            if t.rightp.x <= left:
+                artifacts[k - 1].append(t)
+                continue
+            if t.leftp.x >= right:
+                artifacts[k].append(t)
+                continue
+
+            key = (t.top, t.bottom)
+            if t.leftp.x <= left:
+                # Continue the chain that reaches the wall from the left.
+                chain = open_chains.pop(key, None)
+                if chain is None:
+                    raise ValueError("The slabs cannot be stitched at the wall X = " + str(left) + ".")
+                chain.append(t)
+            else:
+                chain = [t]
+                chains.append(chain)
+
+            if t.rightp.x >= right:
+                reaching[key] = chain
+                gaps[k][key] = chain
+
+        if open_chains:
+            raise ValueError("The slabs cannot be stitched at the wall X = " + str(left) + ".")
+        open_chains = reaching
+
+    # Create a trapezoid for every chain, which takes over the leaf of its first piece.
+    final = {}
+    res = []
+    for chain in chains:
+        first = chain[0]
+        if len(chain) == 1:
+            t = first
+        else:
+            t = Trapezoid(first.top, first.bottom, first.leftp, chain[-1].rightp)
+            t.leaf = first.leaf
+            t.leaf.trapezoid = t
+            for piece in chain[1:]:
+                _forward(piece.leaf, t.leaf)
+
+        for piece in chain:
+            final[piece] = t
+        res.append(t)
+
+    # Link the trapezoids to the ones of the neighbors of the ends of their chains.
+    links = [(final.get(chain[0].uln), final.get(chain[0].lln), final.get(chain[-1].urn), final.get(chain[-1].lrn))
+             for chain in chains]
+    for t, (uln, lln, urn, lrn) in zip(res, links):
+        t.uln, t.lln, t.urn, t.lrn = uln, lln, urn, lrn
+
+    # Forward the leaves of the artifacts to the trapezoids along their wall.
+    for j, cross in enumerate(crossings):
+        sides = [R.bottom] + [segments[i] for y, i in cross] + [R.top]
+        ts = [final[gaps[j][(sides[i + 1], sides[i])][0]] for i in range(len(sides) - 1)]
+        wall_root = _y_tree(sides[1:-1], ts)
+        for t in artifacts[j]:
+            _forward(t.leaf, wall_root)
+
+    # Assemble the trapezoidal map.
+    T = TrapezoidalMap(R)
+    T.remove_trapezoid(R)
+    for t in res:
+        T.add_trapezoid(t)
+
+    T.D.root = _router(walls, roots, y1 - 1)
+    T.D.nodes = Arena()
+    T.D.register(T.D.root)
+
+    T.label_faces()
+
+    return T
+
+
+def _build_slab(xs: array, ys: array, table: array, seed: int) -> Tuple[array, Tuple[array, array, array, array]]:
+    """Builds the trapezoidal map and the search structure of a slab, and flattens them into arrays.
+
+    The arrays refer to the points of the slab and to the global indices of its segments, so that the slab can be
+    rebuilt around the original objects (see _rebuild).
+
+    Args:
+        xs (array): The X coordinates of the points of the slab, starting with the lower left, lower right, upper left
+            and upper right corners of its bounding box.
+        ys (array): The Y coordinates of the points.
+        table (array): The segments of the slab, as triples of global index and indices of the two endpoints.
+        seed (int): The seed of the insertion order.
+
+    Returns:
+        Tuple[array, Tuple[array, array, array, array]]: The trapezoid table, with the indices of the top and bottom
+            segments, of the generator endpoints and of the four neighbors of each trapezoid, and the kind, the key and
+            the two children of each node (see number_nodes). The sides of the bounding box are the segments -1 and -2.
+    """
+
+    from src.structures import TrapezoidalMap
+
+    points = [Point(x, y) for x, y in zip(xs, ys)]
+    ll, lr, ul, ur = points[:4]
+    top = Segment(ul, ur)
+    bottom = Segment(ll, lr)
+    T = TrapezoidalMap(Trapezoid(top, bottom, ll, lr))
+
+    segment_ids = {id(top): -1, id(bottom): -2}
+    segments = []
+    for k in range(0, len(table), 3):
+        s = Segment(points[table[k + 1]], points[table[k + 2]])
+        segment_ids[id(s)] = table[k]
+        segments.append(s)
+
+    # Insert the segments in random order.
+    random.Random(seed).shuffle(segments)
+    for s in segments:
+        T.update(s, T.follow_segment(s))
+
+    point_ids = {id(p): i for i, p in enumerate(points)}
+    trapezoid_ids = {id(t): i for i, t in enumerate(T.trapezoids)}
+
+    def neighbor_index(t: Optional[Trapezoid]) -> int:
+        return trapezoid_ids[id(t)] if t is not None else -1
+
+    traps = array("q")
+    for t in T.trapezoids:
+        traps.extend((segment_ids[id(t.top)], segment_ids[id(t.bottom)], point_ids[id(t.leftp)],
+                      point_ids[id(t.rightp)], neighbor_index(t.uln), neighbor_index(t.lln), neighbor_index(t.urn),
+                      neighbor_index(t.lrn)))
+
+    nodes = number_nodes(T.D.root, lambda p: point_ids[id(p)], lambda s: segment_ids[id(s)],
+                         lambda t: trapezoid_ids[id(t)])
+
+    return traps, nodes
+
+
+def _rebuild(points: List[Point], segments: List[Segment], R: Trapezoid, traps: array,
+             nodes: Tuple[array, array, array, array]) -> Tuple[List[Trapezoid], Node]:
+    """Rebuilds the trapezoids and the search structure of a slab from its tables (see _build_slab).
+
+    The clipped segments are replaced with the original ones, and the sides of the bounding box of the slab with the
+    ones of the whole map.
+
+    Returns:
+        Tuple[List[Trapezoid], Node]: The trapezoids of the slab and the root of its search structure.
+    """
+
+    sides = {-1: R.top, -2: R.bottom}
+
+    def segment(i: int) -> Segment:
+        return segments[i] if i >= 0 else sides[i]
+
+    pieces = [Trapezoid(segment(traps[k]), segment(traps[k + 1]), points[traps[k + 2]], points[traps[k + 3]])
+              for k in range(0, len(traps), 8)]
+    for t, k in zip(pieces, range(0, len(traps), 8)):
+        t.uln, t.lln, t.urn, t.lrn = (pieces[i] if i >= 0 else None for i in traps[k + 4:k + 8])
+
+    kind, key, left, right = nodes
+    res = []
+    for i in range(len(kind)):
+        if kind[i] == X_NODE:
+            res.append(XNode(points[key[i]]))
+        elif kind[i] == Y_NODE:
+            res.append(YNode(segment(key[i])))
+        else:
+            res.append(pieces[key[i]].leaf)
+
+    for i, node in enumerate(res):
+        if kind[i] != LEAF:
+            node.set_left_child(res[left[i]])
+            node.set_right_child(res[right[i]])
+
+    return pieces, res[0]
+
+
+def _forward(leaf: LeafNode, target: Node) -> None:
+    """Replaces a leaf in place with a node that leads to the target, without aliasing it.
+    """
+
+    if isinstance(target, LeafNode):
+        sub_root = XNode(target.trapezoid.leftp)
+        sub_root.set_left_child(target)
+        sub_root.set_right_child(target)
+    else:
+        sub_root = YNode(target.segment)
+        sub_root.set_left_child(target.left_child)
+        sub_root.set_right_child(target.right_child)
+
+    sub_root.replace_leaf(leaf)
+
+
+def _y_tree(segments: List[Segment], ts: List[Trapezoid]) -> Node:
+    """Builds a balanced tree of Y-nodes that locates a point on a wall among the trapezoids across it.
+
+    Args:
+        segments (List[Segment]): The segments that cross the wall, from bottom to top.
+        ts (List[Trapezoid]): The trapezoids between them, from bottom to top, one more than the segments.
+
+    Returns:
+        Node: The root of the tree, which is the leaf of the trapezoid if there is only one.
+    """
+
+    if len(ts) == 1:
+        return ts[0].leaf
+
+    # Split the trapezoids at the middle segment, with the upper ones on the left.
+    mid = len(ts) // 2
+    node = YNode(segments[mid - 1])
+    node.set_left_child(_y_tree(segments[mid:], ts[mid:]))
+    node.set_right_child(_y_tree(segments[:mid - 1], ts[:mid]))
+
+    return node
+
+
+def _router(walls: List[float], roots: List[Node], y: float) -> Node:
+    """Builds a balanced tree of X-nodes on the walls, whose leaves are the search structures of the slabs.
+
+    A point on a wall belongs to the slab to its right. The points of the X-nodes lie below the bounding box, so that
+    the points and the segments that touch a wall lie above them, and their coordinates stay finite for the exact
+    predicates.
+
+    Args:
+        walls (List[float]): The X coordinates of the walls, from left to right.
+        roots (List[Node]): The roots of the search structures of the slabs, one more than the walls.
+        y (float): The Y coordinate of the points of the X-nodes, below the bounding box.
+
+    Returns:
+        Node: The root of the tree.
+    """
+
+    if len(roots) == 1:
+        return roots[0]
+
+    mid = len(roots) // 2
+    node = XNode(Point(walls[mid - 1], y))
+    node.set_left_child(_router(walls[:mid - 1], roots[:mid], y))
+    node.set_right_child(_router(walls[mid:], roots[mid:], y))
+
+    return node
@@ -0,0 +1,143 @@
+import json
+import mmap
+import struct
+import sys
+from typing import *
+
+from src.compiled import CompiledSearchStructure
+
+# Identifier and current version of the file format.
+MAGIC = b"TMAP"
+VERSION = 2
+
+# Header: magic, version, byte order, number of nodes, points, segments and trapezoids, size of the face table.
+HEADER = struct.Struct("<4sII5Q")
+
+# Arrays of the format, in order: attribute path, type code and the count they are sized by.
+LAYOUT = [
+    ("kind", "b", 0),
+    ("key", "q", 0),
+    ("left", "q", 0),
+    ("right", "q", 0),
+    ("pt_x", "d", 1),
+    ("pt_y", "d", 1),
+    ("segments.px", "d", 2),
+    ("segments.py", "d", 2),
+    ("segments.qx", "d", 2),
+    ("segments.qy", "d", 2),
+    ("segments.dx", "d", 2),
+    ("segments.dy", "d", 2),
+    ("trap_top", "q", 3),
+    ("trap_bottom", "q", 3),
+    ("trap_leftp", "q", 3),
+    ("trap_rightp", "q", 3),
+    ("trap_uln", "q", 3),
+    ("trap_lln", "q", 3),
+    ("trap_urn", "q", 3),
+    ("trap_lrn", "q", 3),
+    ("trap_face", "q", 3),
+]
+
+# Every array starts at a multiple of the alignment.
+ALIGNMENT = 8
+
+# Byte order marker: 1 for little-endian, 2 for big-endian.
+BYTE_ORDER = 1 if sys.byteorder == "little" else 2
+
+
+def _get(obj: object, path: str) -> Any:
+    """Returns the attribute of an object given its dotted path.
+    """
+
+    for name in path.split("."):
+        obj = getattr(obj, name)
+
+    return obj
+
+
+def _set(obj: object, path: str, value: Any) -> None:
+    """Sets the attribute of an object given its dotted path.
+    """
+
+    names = path.split(".")
+    for name in names[:-1]:
+        obj = getattr(obj, name)
+
+    setattr(obj, names[-1], value)
+
+
+def _padding(offset: int) -> int:
+    """Returns the number of bytes that align the offset.
+    """
+
+    return -offset % ALIGNMENT
+
+
+def save(C: CompiledSearchStructure, path: str) -> None:
+    """Saves a compiled search structure to a binary file.
+
+    The file starts with a versioned header, followed by the arrays of the structure, each aligned to 8 bytes and stored
+    in the byte order of the machine, which is recorded in the header. The face table is stored last, as JSON, so the
+    face labels must be strings or numbers.
+
+    Args:
+        C (CompiledSearchStructure): The compiled search structure.
+        path (str): The path of the file.
+    """
+
+    faces = json.dumps(C.faces).encode("utf-8")
+    counts = (len(C.kind), len(C.pt_x), len(C.segments), len(C.trap_top), len(faces))
+
+    with open(path, "wb") as f:
+        offset = f.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER, *counts))
+
+        for name, code, count in LAYOUT:
+            offset += f.write(b"\0" * _padding(offset))
+            offset += f.write(memoryview(_get(C, name)).cast("B"))
+
+        f.write(faces)
+
+
+def load(path: str) -> CompiledSearchStructure:
+    """Loads a compiled search structure from a binary file.
+
+    The file is memory-mapped and the arrays of the structure are read-only views of it, so that loading is immediate
+    and the pages are shared through the page cache by all the processes that load the same file. The original
+    trapezoids are not available in the loaded structure.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        CompiledSearchStructure: The compiled search structure.
+    """
+
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    view = memoryview(buffer)
+
+    # Check the header.
+    magic, version, byte_order, *counts = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise ValueError("The file " + path + " is not a trapezoidal map.")
+    if version != VERSION:
+        raise ValueError("Unsupported version " + str(version) + " of the file " + path + ".")
+    if byte_order != BYTE_ORDER:
+        raise ValueError("The file " + path + " has been saved with a different byte order.")
+
+    res = CompiledSearchStructure()
+    res.buffer = buffer
+
+    # Map every array to its region of the file.
+    offset = HEADER.size
+    for name, code, count in LAYOUT:
+        offset += _padding(offset)
+        size = counts[count] * struct.calcsize(code)
+        _set(res, name, view[offset:offset + size].cast(code))
+        offset += size
+
+    # Decode the face table.
+    res.faces = json.loads(bytes(view[offset:offset + counts[4]]).decode("utf-8"))
+
+    return res
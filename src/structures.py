@@ -1,8 +1,17 @@
+import math
 import random
+from collections import deque
 from typing import *
 
+from src.arena import Arena
+from src.cache import QueryCache
+from src.compiled import CompiledSearchStructure
+from src.graph import AdjacencyGraph
 from src.geometry import Segment, Point, Trapezoid
-from src.nodes import Node, XNode, YNode, LeafNode
+from src.nodes import Node, XNode, YNode, LeafNode, SearchPath
+from src.roadmap import Roadmap
+from src.slabs import place_walls, build_slabs
+from src.tracing import tracer, INFO, STEP, DEBUG
 from src.util import *
 
 
@@ -67,12 +76,13 @@ class TrapezoidalMap:
     A trapezoidal map is a refinement of a subdivision, obtained by drawing for each segment endpoint vertical
     extensions that stop at the first non-vertical segment.
     Every element of the map is a trapezoid, or a triangle in the degenerate case. The structure is therefore
-    represented as a set of Trapezoid objects.
+    represented as an arena of Trapezoid objects, each identified by its handle.
     The whole map is enclosed in a bounding box, which is a rectangle.
 
     Attributes:
-        trapezoids (Set[Trapezoids]): The set of trapezoids.
+        trapezoids (Arena): The arena of trapezoids.
         D (SearchStructure): The corresponding search structure.
+        R (Trapezoid): The bounding box rectangle, whose sides and corners are shared by the outermost trapezoids.
     """
 
     def __init__(self, R: Trapezoid) -> None:
@@ -82,10 +92,12 @@ class TrapezoidalMap:
             R (Trapezoid): The bounding box rectangle.
         """
 
-        print("Initializing the trapezoidal map...")
+        tracer.message(INFO, "Initializing the trapezoidal map...")
 
-        # Create the set of trapezoids and add the bounding box.
-        self.trapezoids = set()
+        self.R = R
+
+        # Create the arena of trapezoids and add the bounding box.
+        self.trapezoids = Arena()
         self.add_trapezoid(R)
 
         # Create the search structure.
@@ -104,6 +116,40 @@ class TrapezoidalMap:
 
         return res
 
+    def grow(self, x1: float, y1: float, x2: float, y2: float) -> None:
+        """Grows the bounding box so that it contains the given rectangle.
+
+        The corners and the sides of the bounding box are shared by all the outermost trapezoids, so they are moved in
+        place. The existing trapezoids remain valid, and so does the search structure, since none of its nodes refers to
+        the bounding box.
+
+        Args:
+            x1 (float): The minimum X coordinate of the rectangle.
+            y1 (float): The minimum Y coordinate of the rectangle.
+            x2 (float): The maximum X coordinate of the rectangle.
+            y2 (float): The maximum Y coordinate of the rectangle.
+        """
+
+        top = self.R.top
+        bottom = self.R.bottom
+
+        # Get the corners of the bounding box.
+        ll, lr = bottom.p, bottom.q
+        ul, ur = top.p, top.q
+
+        # Move the corners.
+        ll.x = ul.x = min(ll.x, x1)
+        lr.x = ur.x = max(lr.x, x2)
+        ll.y = lr.y = min(ll.y, y1)
+        ul.y = ur.y = max(ul.y, y2)
+
+        # Update the precomputed directions of the sides.
+        top.dx = ur.x - ul.x
+        bottom.dx = lr.x - ll.x
+
+        # Invalidate the compiled copy of the search structure.
+        self.D.compiled = None
+
     def add_trapezoid(self, trapezoid: Trapezoid) -> None:
         """Adds a trapezoid to the trapezoidal map.
 
@@ -113,7 +159,8 @@ class TrapezoidalMap:
 
         if trapezoid is not None:
             self.trapezoids.add(trapezoid)
-            print("\t(+) Trapezoid " + get_id(trapezoid) + " added.")
+            if tracer.level >= STEP:
+                tracer.emit(STEP, "trapezoid_created", trapezoid=trapezoid)
 
     def add_trapezoids(self, new_ts: NewTrapezoids) -> None:
         """Adds multiple trapezoids to the trapezoidal map.
@@ -122,10 +169,11 @@ class TrapezoidalMap:
             new_ts: The container of the new trapezoids.
         """
 
+        # Skip the repeated trapezoids, keeping the order so that the handles are deterministic.
         self.add_trapezoid(new_ts.first)
-        for delta in set(new_ts.upper):
+        for delta in dict.fromkeys(new_ts.upper):
             self.add_trapezoid(delta)
-        for delta in set(new_ts.lower):
+        for delta in dict.fromkeys(new_ts.lower):
             self.add_trapezoid(delta)
         self.add_trapezoid(new_ts.last)
 
@@ -136,8 +184,9 @@ class TrapezoidalMap:
             trapezoid (Trapezoid): The trapezoid to remove.
         """
 
+        if tracer.level >= STEP:
+            tracer.emit(STEP, "trapezoid_destroyed", trapezoid=trapezoid)
         self.trapezoids.discard(trapezoid)
-        print("\t(-) Trapezoid " + get_id(trapezoid) + " removed.")
 
     def remove_trapezoids(self, old_ts: List[Trapezoid]) -> None:
         """Removes multiple trapezoids from the trapezoidal map.
@@ -149,49 +198,116 @@ class TrapezoidalMap:
         for delta in old_ts:
             self.remove_trapezoid(delta)
 
-    def follow_segment(self, s: Segment) -> List[Trapezoid]:
+    def label_faces(self, ts: Optional[Iterable[Trapezoid]] = None) -> None:
+        """Labels the trapezoids with the faces of the subdivision that contain them.
+
+        A trapezoid lies in the face above its bottom segment, which is also the face below its top segment. The
+        trapezoids without a labeled side, such as the ones bounded by the bounding box, take the label of their
+        neighbors instead, since the vertical walls between neighbors never separate two faces. The trapezoids that
+        remain without a label lie outside every labeled face.
+        The labels are only meaningful when all the segments of the subdivision are in the map.
+
+        Args:
+            ts (Optional[Iterable[Trapezoid]]): The trapezoids to label, by default all the trapezoids of the map.
+        """
+
+        if ts is None:
+            ts = self.trapezoids
+
+        # Label the trapezoids by the sides of their segments.
+        pending = []
+        for t in ts:
+            face = t.bottom.above
+            if face is None:
+                face = t.top.below
+            t.face = face
+            if face is None:
+                pending.append(t)
+
+        # Propagate the labels across the walls.
+        stack = pending
+        pending = set(pending)
+        while stack:
+            t = stack.pop()
+            if t not in pending:
+                continue
+
+            neighbors = (t.uln, t.lln, t.urn, t.lrn)
+            face = next((n.face for n in neighbors if n is not None and n.face is not None), None)
+            if face is None:
+                continue
+
+            t.face = face
+            pending.discard(t)
+            stack.extend(n for n in neighbors if n in pending)
+
+    def save(self, path: str) -> None:
+        """Saves the trapezoidal map and its search structure to a binary file.
+
+        The search structure is compiled and written in the format of the storage module. The file can be loaded with
+        storage.load, which returns a query-ready compiled search structure.
+
+        Args:
+            path (str): The path of the file.
+        """
+
+        from src.storage import save
+
+        if self.D.compiled is None:
+            self.D.compiled = self.D.compile()
+
+        save(self.D.compiled, path)
+
+    def adjacency(self) -> AdjacencyGraph:
+        """Exports the neighbor links of the trapezoids as an adjacency graph in CSR format.
+
+        The vertices of the graph are numbered by the handles of the trapezoids. See AdjacencyGraph.
+
+        Returns:
+            AdjacencyGraph: The adjacency graph.
+        """
+
+        return AdjacencyGraph.from_trapezoids(self.trapezoids.slots)
+
+    def roadmap(self, free: Container[Optional[Hashable]] = (None,)) -> Roadmap:
+        """Builds a roadmap for motion planning in the free faces of the map. See Roadmap.
+
+        Args:
+            free (Container[Optional[Hashable]]): The labels of the free faces, where None stands for the outside.
+
+        Returns:
+            Roadmap: The roadmap.
+        """
+
+        return Roadmap.from_map(self, free)
+
+    def follow_segment(self, s: Segment, path: Optional[SearchPath] = None) -> List[Trapezoid]:
         """Finds the trapezoids that are intersected by a segment.
 
-        The search starts from the leftmost intersected trapezoid, obtained by querying the left endpoint of the segment
-        on the current search structure. Then, iteratively, the right neighbor of each intersected trapezoid is found
-        until the right endpoint is reached.
+        The search starts from the leftmost intersected trapezoid, obtained by locating the beginning of the segment on
+        the current search structure (see Node.locate_segment). Then, iteratively, the right neighbor of each
+        intersected trapezoid is found until the right endpoint is reached.
         The result is the list of intersected trapezoids, ordered from left to right.
 
         Args:
             s (Segment): The segment.
+            path (Optional[SearchPath]): The container where the nodes visited by the query are recorded, if any.
 
         Returns:
             List[Trapezoid]: The list of intersected trapezoids.
         """
 
-        print("\n>>> Finding the intersected trapezoids...")
+        if tracer.level >= STEP:
+            tracer.message(STEP, "\n>>> Finding the intersected trapezoids...")
 
         # Initialize the list of trapezoids.
         deltas = []
 
-        # Get the endpoints of the segment.
-        p, q = s.p, s.q
-
-        # Query the segment's left endpoint on the search structure.
-        node = self.D.root.traverse(p)
-
-        while not isinstance(node, LeafNode):
-            # Move the query point to the right by an epsilon, in the direction of the segment.
-            m = (q.y - p.y) / (q.x - p.x)
-            epsilon = 0.0000001
-            new_x = p.x + epsilon
-            new_y = p.y + m * epsilon
-            new_p = Point(new_x, new_y)
+        # Get the right endpoint of the segment.
+        q = s.q
 
-            print("The endpoint " + str(p) + " already exists. Retrying the query with " + str(new_p) + "...")
-
-            # Restart the traversal from the current node.
-            node = node.traverse(new_p)
-
-        if isinstance(node, LeafNode):
-            curr = node.trapezoid
-        else:
-            curr = None
+        # Locate the beginning of the segment on the search structure, breaking the ties at its left endpoint.
+        curr = self.D.root.locate_segment(s, path).trapezoid
 
         deltas.append(curr)
 
@@ -208,21 +324,266 @@ class TrapezoidalMap:
 
         return deltas
 
-    def update(self, s: Segment, old_ts: List[Trapezoid]) -> None:
+    def trapezoids_along(self, s: Segment) -> (List[Trapezoid], List[Trapezoid]):
+        """Finds the trapezoids that lie directly above and below a segment of the map.
+
+        On each side, the trapezoid next to the middle of the segment is located in the search structure (see
+        Node.locate_beside), and the trapezoids along the segment are collected by following the neighbor links in both
+        directions. The cost depends on the depth of the search structure and on the number of trapezoids found.
+
+        Args:
+            s (Segment): The segment.
+
+        Returns:
+            (List[Trapezoid], List[Trapezoid]): The lists of the trapezoids above and below the segment, respectively,
+                ordered from left to right. Both are empty if the segment is not part of the map.
+        """
+
+        # Get a point in the interior of the segment.
+        if s.dx == 0:
+            x = s.p.x
+            y = (s.p.y + s.q.y) / 2
+        else:
+            x = (s.p.x + s.q.x) / 2
+            y = s.y_at(x)
+
+        res = []
+        for above in (True, False):
+            t = self.D.root.locate_beside(s, x, y, above).trapezoid
+
+            def along(n: Optional[Trapezoid]) -> bool:
+                return n is not None and (n.bottom if above else n.top) is s
+
+            if not along(t):
+                return [], []
+
+            # Go back to the leftmost trapezoid, then collect the chain from left to right.
+            while True:
+                n = next((n for n in (t.uln, t.lln) if along(n)), None)
+                if n is None:
+                    break
+                t = n
+
+            chain = [t]
+            while True:
+                n = next((n for n in (t.urn, t.lrn) if along(n)), None)
+                if n is None:
+                    break
+                chain.append(n)
+                t = n
+
+            res.append(chain)
+
+        return res[0], res[1]
+
+    def query_window(self, x1: float, y1: float, x2: float, y2: float) -> List[Trapezoid]:
+        """Finds the trapezoids that overlap a rectangle.
+
+        The trapezoid at the lower left corner of the rectangle is located in the search structure. Then, the region is
+        flooded: from each overlapping trapezoid, the search moves to its neighbors across the vertical walls, and to
+        the trapezoids on the other side of its top and bottom segments, which are located next to the segments where
+        they cross the rectangle (see Node.locate_beside). Only the trapezoids that overlap or touch the rectangle are
+        expanded, so the cost depends on the size of the result rather than on the size of the map.
+
+        Args:
+            x1 (float): The minimum X coordinate of the rectangle.
+            y1 (float): The minimum Y coordinate of the rectangle.
+            x2 (float): The maximum X coordinate of the rectangle.
+            y2 (float): The maximum Y coordinate of the rectangle.
+
+        Returns:
+            List[Trapezoid]: The trapezoids that overlap the rectangle, in no particular order.
+        """
+
+        R = self.R
+        root = self.D.root
+
+        # A rectangle without area does not overlap any trapezoid.
+        if x1 >= x2 or y1 >= y2:
+            return []
+
+        # Clip the corner to the bounding box.
+        x = max(x1, R.leftp.x)
+        y = max(y1, R.bottom.p.y)
+        if x >= min(x2, R.rightp.x) or y >= min(y2, R.top.p.y):
+            return []
+
+        # Locate the corner, moved by an infinitesimal amount to the right.
+        start = root.locate_segment(Segment(Point(x, y), Point(x + 1, y))).trapezoid
+
+        res = []
+        visited = {start}
+        stack = [start]
+        crossed = set()
+        while stack:
+            t = stack.pop()
+
+            # Expand the trapezoids that touch the rectangle, since the corner may lie on their boundary, and only
+            # report the ones that overlap it.
+            if not t.overlaps(x1, y1, x2, y2, True):
+                continue
+            if t.overlaps(x1, y1, x2, y2):
+                res.append(t)
+
+            # Collect the trapezoids on the other side of the segments, if they cross the rectangle. Each segment is
+            # crossed once, since the trapezoids along either side of it are connected by their walls.
+            lo = max(t.leftp.x, x1)
+            hi = min(t.rightp.x, x2)
+            beside = []
+            for s, above in ((t.top, True), (t.bottom, False)):
+                if s in crossed or s is R.top or s is R.bottom:
+                    continue
+
+                # Cross a vertical segment in the middle of the Y range where it lies inside the rectangle.
+                if s.dx == 0:
+                    a = max(min(s.p.y, s.q.y), y1)
+                    b = min(max(s.p.y, s.q.y), y2)
+                    if a < b and x1 <= s.p.x <= x2:
+                        beside.append(root.locate_beside(s, s.p.x, (a + b) / 2, above).trapezoid)
+                        crossed.add(s)
+                    continue
+
+                # Find the X range where the segment lies inside the rectangle.
+                a, b = lo, hi
+                if s.dy != 0:
+                    c = s.p.x + (y1 - s.p.y) * s.dx / s.dy
+                    d = s.p.x + (y2 - s.p.y) * s.dx / s.dy
+                    a = max(a, min(c, d))
+                    b = min(b, max(c, d))
+                elif not y1 < s.p.y < y2:
+                    continue
+                if a < b:
+                    xm = (a + b) / 2
+                    beside.append(root.locate_beside(s, xm, s.y_at(xm), above).trapezoid)
+                    crossed.add(s)
+
+            # Visit the neighbors and the trapezoids beside the segments.
+            for n in (t.uln, t.lln, t.urn, t.lrn, *beside):
+                if n is not None and n not in visited:
+                    visited.add(n)
+                    stack.append(n)
+
+        return res
+
+    def query_window_segments(self, x1: float, y1: float, x2: float, y2: float) -> Set[Segment]:
+        """Finds the segments of the map that cross a rectangle.
+
+        Args:
+            x1 (float): The minimum X coordinate of the rectangle.
+            y1 (float): The minimum Y coordinate of the rectangle.
+            x2 (float): The maximum X coordinate of the rectangle.
+            y2 (float): The maximum Y coordinate of the rectangle.
+
+        Returns:
+            Set[Segment]: The distinct segments that bound the overlapping trapezoids and cross the rectangle.
+        """
+
+        R = self.R
+
+        res = set()
+        for t in self.query_window(x1, y1, x2, y2):
+            for s in (t.top, t.bottom):
+                if s is R.top or s is R.bottom or s in res:
+                    continue
+
+                # Clip the X range of the segment and check its Y range there.
+                lo = max(s.p.x, x1)
+                hi = min(s.q.x, x2)
+                if lo > hi:
+                    continue
+                if s.dx == 0:
+                    ya, yb = s.p.y, s.q.y
+                else:
+                    ya, yb = s.y_at(lo), s.y_at(hi)
+                if min(ya, yb) <= y2 and max(ya, yb) >= y1:
+                    res.add(s)
+
+        return res
+
+    def query_window_faces(self, x1: float, y1: float, x2: float, y2: float) -> Set[Hashable]:
+        """Finds the faces of the subdivision that overlap a rectangle.
+
+        Args:
+            x1 (float): The minimum X coordinate of the rectangle.
+            y1 (float): The minimum Y coordinate of the rectangle.
+            x2 (float): The maximum X coordinate of the rectangle.
+            y2 (float): The maximum Y coordinate of the rectangle.
+
+        Returns:
+            Set[Hashable]: The labels of the faces of the overlapping trapezoids (see label_faces).
+        """
+
+        return {t.face for t in self.query_window(x1, y1, x2, y2) if t.face is not None}
+
+    def remove(self, s: Segment) -> None:
+        """Removes a segment from the trapezoidal map.
+
+        The trapezoids above and below the segment are merged. If an endpoint of the segment is not shared with other
+        segments, its vertical extension disappears as well, so the trapezoid on the other side of it joins the region.
+        The affected region is decomposed again, and the leaves of its old trapezoids are redirected to the new ones in
+        the search structure, where the inner nodes of the segment are left as tombstones.
+
+        Args:
+            s (Segment): The segment.
+        """
+
+        if tracer.level >= STEP:
+            tracer.message(STEP, "\n>>> Removing a segment from the trapezoidal map...")
+
+        upper, lower = self.trapezoids_along(s)
+        if not upper or not lower:
+            raise ValueError("The segment " + str(s) + " is not part of the trapezoidal map.")
+
+        p, q = s.p, s.q
+
+        # Check whether the left endpoint is free, in which case a single trapezoid lies to its left.
+        first = upper[0].uln
+        if first is not None and first is lower[0].lln and first.rightp is p and \
+                upper[0].top.p is not p and lower[0].bottom.p is not p:
+            upper.insert(0, first)
+            lower.insert(0, first)
+
+        # Check whether the right endpoint is free, in which case a single trapezoid lies to its right.
+        last = upper[-1].urn
+        if last is not None and last is lower[-1].lrn and last.leftp is q and \
+                upper[-1].top.q is not q and lower[-1].bottom.q is not q:
+            upper.append(last)
+            lower.append(last)
+
+        old_ts = list(dict.fromkeys(upper + lower))
+        new_ts = merge_region(upper, lower)
+
+        if tracer.level >= STEP:
+            tracer.emit(STEP, "intersected", trapezoids=old_ts)
+
+        # Replace the old trapezoids with the new ones.
+        self.remove_trapezoids(old_ts)
+        for delta in new_ts:
+            self.add_trapezoid(delta)
+        self.label_faces(new_ts)
+
+        # Update the search structure.
+        self.D.replace(old_ts, new_ts)
+
+    def update(self, s: Segment, old_ts: List[Trapezoid], relabel: bool = False) -> None:
         """Updates the trapezoidal map after some trapezoids have been intersected by the segment.
 
         The intersected trapezoids are removed and replaced with the new ones. The search structure is also updated.
+        During a construction, the faces are labeled once at the end, so the new trapezoids are only labeled on request.
 
         Args:
             s (Segment): The segment.
             old_ts (List[Trapezoids]): The list of intersected trapezoids.
+            relabel (bool): True to label the new trapezoids with their faces, as when inserting into a complete map.
         """
 
-        print("\n>>> Updating the trapezoidal map...")
+        if tracer.level >= STEP:
+            tracer.message(STEP, "\n>>> Updating the trapezoidal map...")
 
         # Check whether one or more trapezoids have been intersected.
         if len(old_ts) == 1:
-            print("Single trapezoid detected.")
+            if tracer.level >= STEP:
+                tracer.message(STEP, "Single trapezoid detected.")
 
             # Get the single intersected trapezoid.
             old = old_ts[0]
@@ -257,17 +618,8 @@ class TrapezoidalMap:
 
             new_ts = NewTrapezoids(A, B, [C], [D])
         else:
-            print("Multiple trapezoids detected.")
-
-            # Split the intermediate intersected trapezoids into their upper and lower parts.
-            print("Splitting the intermediate trapezoids...")
-            upper_split, lower_split = split_trapezoids(s, old_ts)
-
-            # Merge the upper and the lower parts where possible.
-            print("Merging the upper parts...")
-            upper = merge_trapezoids(upper_split)
-            print("Merging the lower parts...")
-            lower = merge_trapezoids(lower_split)
+            if tracer.level >= STEP:
+                tracer.message(STEP, "Multiple trapezoids detected.")
 
             # Get the default neighbors.
             uln = old_ts[0].uln
@@ -275,40 +627,44 @@ class TrapezoidalMap:
             urn = old_ts[-1].urn
             lrn = old_ts[-1].lrn
 
-            # Check the existence of the leftmost and rightmost new trapezoids.
-            first = Trapezoid(old_ts[0].top, old_ts[0].bottom, old_ts[0].leftp, s.p)
-            last = Trapezoid(old_ts[-1].top, old_ts[-1].bottom, s.q, old_ts[-1].rightp)
-            if first.leftp != first.rightp:
+            # Create the leftmost and rightmost new trapezoids, unless they are degenerate.
+            first = None
+            last = None
+            if old_ts[0].leftp != s.p:
+                first = Trapezoid(old_ts[0].top, old_ts[0].bottom, old_ts[0].leftp, s.p)
+            if old_ts[-1].rightp != s.q:
+                last = Trapezoid(old_ts[-1].top, old_ts[-1].bottom, s.q, old_ts[-1].rightp)
+
+            # Split the intersected trapezoids, merge their parts and set their neighbors in a single pass per side.
+            if tracer.level >= DEBUG:
+                tracer.message(DEBUG, "Splitting and merging the upper parts...")
+            left = first if first is not None else uln
+            right = last if last is not None else urn
+            upper = split_chain(s, old_ts, left, right, True)
+            if tracer.level >= DEBUG:
+                tracer.message(DEBUG, "Splitting and merging the lower parts...")
+            left = first if first is not None else lln
+            right = last if last is not None else lrn
+            lower = split_chain(s, old_ts, left, right, False)
+
+            # Set the neighbors of the leftmost and rightmost trapezoids.
+            if first is not None:
                 first.set_neighbors(uln, lln, upper[0], lower[0])
-                uln = first
-                lln = first
-            else:
-                first = None
-            if last.leftp != last.rightp:
+            if last is not None:
                 last.set_neighbors(upper[-1], lower[-1], urn, lrn)
-                urn = last
-                lrn = last
-            else:
-                last = None
-
-            # Set the neighbors of each merged trapezoid.
-            print("Updating the neighbors of the upper trapezoids...")
-            update_neighbors(upper_split, upper, uln, urn, True)
-            print("Updating the neighbors of the lower trapezoids...")
-            update_neighbors(lower_split, lower, lln, lrn, False)
 
             new_ts = NewTrapezoids(first, last, upper, lower)
 
-        print("\nIntersected trapezoids:")
-        for delta in old_ts:
-            print(get_id(delta))
-
-        print("\nNew trapezoids:")
-        print(new_ts)
+        if tracer.level >= STEP:
+            tracer.emit(STEP, "intersected", trapezoids=old_ts)
+        if tracer.level >= DEBUG:
+            tracer.emit(DEBUG, "new_trapezoids", new_trapezoids=new_ts)
 
         # Remove the old trapezoids and add the new ones.
         self.remove_trapezoids(old_ts)
         self.add_trapezoids(new_ts)
+        if relabel:
+            self.label_faces(new_ts.upper + new_ts.lower + [t for t in (new_ts.first, new_ts.last) if t is not None])
 
         # Update the search structure.
         self.D.update(s, old_ts, new_ts)
@@ -320,9 +676,13 @@ class SearchStructure:
     The search structure is a directed acyclic graph (DAG) used to query the location of points in trapezoids.
     All inner nodes have an out-degree of exactly 2 and can be X-nodes (endpoints) or Y-nodes (segments). Each leaf of
     the DAG represents a trapezoid.
+    The nodes are registered in an arena, so that each of them is identified by its handle.
 
     Attributes:
         root (Node): The root of the directed acyclic graph.
+        nodes (Arena): The arena of the nodes.
+        compiled (Optional[CompiledSearchStructure]): The cached compiled copy, reset after every update.
+        cache (Optional[QueryCache]): The cache of the query results, if enabled.
     """
 
     def __init__(self, R: Trapezoid) -> None:
@@ -332,10 +692,14 @@ class SearchStructure:
             R (Trapezoid): The bounding box rectangle.
         """
 
-        print("Initializing the search structure...")
+        tracer.message(INFO, "Initializing the search structure...")
 
-        # Create the root and add it to the set of nodes.
+        # Create the root and add it to the arena of nodes.
         self.root = R.leaf
+        self.nodes = Arena()
+        self.nodes.add(self.root)
+        self.compiled = None
+        self.cache = None
 
     def __str__(self) -> str:
         """Returns the string representation of a SearchStructure object.
@@ -357,7 +721,13 @@ class SearchStructure:
             new_ts (NewTrapezoids): The container of the new trapezoids.
         """
 
-        print("\n>>> Updating the search structure...")
+        if tracer.level >= STEP:
+            tracer.message(STEP, "\n>>> Updating the search structure...")
+
+        # Invalidate the compiled copy and the cached results of the old trapezoids.
+        self.compiled = None
+        if self.cache is not None:
+            self.cache.invalidate(old_ts)
 
         x_nodes = set()
         y_nodes = set()
@@ -406,12 +776,9 @@ class SearchStructure:
                 sub_root = ns
                 y_nodes.add(ns)
 
-            if sub_root is not None:
-                # Replace the old leaf with the new subtree where needed.
-                if self.root == old:
-                    self.root = sub_root
-                else:
-                    sub_root.replace_leaf(old)
+            # Replace the old leaf with the new subtree, in place.
+            sub_root.replace_leaf(old)
+            self.register(old)
 
         else:
             # Get the new trapezoids.
@@ -452,52 +819,306 @@ class SearchStructure:
                 nq.replace_leaf(old_last)
                 x_nodes.add(nq)
 
-            # Replace each remaining leaf with a Y-node.
+            # Replace each remaining leaf with a Y-node, skipping those that already became X-nodes.
             for i in range(len(old_ts)):
-                ns = ns_list[i]
-                old = old_ts[i].leaf
+                if (i == 0 and np is not None) or (i == len(old_ts) - 1 and nq is not None):
+                    continue
 
                 # Replace the leaf of the old trapezoid.
-                ns.replace_leaf(old)
+                ns_list[i].replace_leaf(old_ts[i].leaf)
+
+            # Register the new nodes.
+            for old in old_ts:
+                self.register(old.leaf)
+
+        if tracer.level >= DEBUG:
+            tracer.emit(DEBUG, "nodes_created", x_nodes=x_nodes, y_nodes=y_nodes)
+
+    def replace(self, old_ts: List[Trapezoid], new_ts: List[Trapezoid]) -> None:
+        """Replaces the leaves of old trapezoids with the new trapezoids that cover the same region.
+
+        Each old trapezoid is covered by one or more consecutive new trapezoids, separated by vertical walls. Its leaf
+        is taken over by the single covering trapezoid, or it is turned in place into a balanced tree of X-nodes on the
+        walls. Since leaves are replaced in place, the leaf of a trapezoid that covers several old ones is taken over
+        only once, and the other old leaves become X-nodes that forward to it.
+
+        Args:
+            old_ts (List[Trapezoid]): The old trapezoids.
+            new_ts (List[Trapezoid]): The new trapezoids, ordered from left to right.
+        """
+
+        # Invalidate the compiled copy and the cached results of the old trapezoids.
+        self.compiled = None
+        if self.cache is not None:
+            self.cache.invalidate(old_ts)
+
+        # Find the range of new trapezoids that overlap each old one.
+        ranges = []
+        k = 0
+        for old in sorted(old_ts, key=lambda t: (t.leftp.x, t.leftp.y)):
+            # Skip the new trapezoids that lie to the left of the old one.
+            while not old.leftp.lies_left(new_ts[k].rightp):
+                k += 1
+
+            # Collect the new trapezoids that overlap the old one.
+            end = k + 1
+            while end < len(new_ts) and new_ts[end].leftp.lies_left(old.rightp):
+                end += 1
+
+            ranges.append((old, k, end))
+
+        # Let a new trapezoid that covers a whole old one take over its leaf, if it has not taken over another one.
+        adopted = set()
+        for old, k, end in ranges:
+            t = new_ts[k]
+            if end - k == 1 and t not in adopted:
+                old.leaf.trapezoid = t
+                t.leaf = old.leaf
+                adopted.add(t)
+
+        # Replace the other leaves in place.
+        for old, k, end in ranges:
+            if end - k == 1:
+                t = new_ts[k]
+                if t.leaf is old.leaf:
+                    continue
+
+                # Forward to the leaf taken over by the trapezoid, which cannot be aliased.
+                sub_root = XNode(t.leftp)
+                sub_root.set_left_child(t.leaf)
+                sub_root.set_right_child(t.leaf)
+            else:
+                sub_root = x_tree(new_ts[k:end])
 
-        print("X-nodes:")
-        for x_node in x_nodes:
-            print(x_node)
+            sub_root.replace_leaf(old.leaf)
+            self.register(old.leaf)
 
-        print("Y-nodes:")
-        for y_node in y_nodes:
-            print(y_node)
+    def register(self, node: Node) -> None:
+        """Adds the new nodes reachable from a node to the arena of nodes.
 
-    def query(self, q: Point) -> Optional[Trapezoid]:
+        The traversal stops at the nodes that already have a handle, so only the subtree created by the latest update
+        is visited.
+
+        Args:
+            node (Node): The node, usually a replaced leaf.
+        """
+
+        stack = [node.left_child, node.right_child] if node.handle is not None else [node]
+        while stack:
+            node = stack.pop()
+            if node is None or node.handle is not None:
+                continue
+
+            self.nodes.add(node)
+            stack.append(node.left_child)
+            stack.append(node.right_child)
+
+    def query(self, q: Point, path: Optional[SearchPath] = None) -> Optional[Trapezoid]:
         """Queries a point in the search structure.
 
-        Querying a point consists in a recursive traversal of the search structure's DAG, starting from the root.
+        Querying a point consists in an iterative traversal of the search structure's DAG, starting from the root.
         If the traversal reaches a leaf, the corresponding trapezoid is returned. Otherwise, the query has failed.
 
         Args:
             q (Point): The query point.
+            path (Optional[SearchPath]): The container where the visited nodes are recorded, if any.
 
         Returns:
             Optional[Trapezoid]: The trapezoid that contains the query point.
         """
 
-        print("Querying point " + str(q) + "...")
+        if tracer.level >= DEBUG:
+            tracer.emit(DEBUG, "query", point=q)
 
-        # Start from the root of the search structure.
-        node = self.root
+        # Look up the cache, unless the path has to be recorded.
+        cache = self.cache if path is None else None
+        if cache is not None:
+            key = cache.key(q.x, q.y)
+            face = cache.get(key)
+            if face is not None:
+                return face
 
-        # Traverse the search structure.
-        res = node.traverse(q)
+        # Traverse the search structure, starting from the root.
+        res = self.root.locate(q.x, q.y, path)
 
         # Check whether a leaf node has been reached.
         if isinstance(res, LeafNode):
             face = res.trapezoid
+            if cache is not None:
+                cache.put(key, face)
         else:
             face = None
-            print("The query point is not valid.")
+            if tracer.level >= INFO:
+                tracer.emit(INFO, "invalid_query", point=q)
 
         return face
 
+    def locate(self, q: Point, hint: Optional[Trapezoid] = None, max_steps: int = 8) -> Optional[Trapezoid]:
+        """Queries a point in the search structure, starting from a trapezoid that is likely to contain it.
+
+        The hint and its neighbors are visited in breadth-first order, up to the given number of trapezoids, checking
+        whether they contain the query point. If none of them does, the query falls back to the search structure. The
+        result is the same as the one of query, but a point that lies in or near the hint is located in constant time.
+        A hint that is no longer in the map, because an update has replaced it, is ignored.
+
+        Args:
+            q (Point): The query point.
+            hint (Optional[Trapezoid]): The trapezoid where the walk starts, such as the result of a previous query.
+            max_steps (int): The maximum number of trapezoids visited by the walk.
+
+        Returns:
+            Optional[Trapezoid]: The trapezoid that contains the query point.
+        """
+
+        nodes = self.nodes
+
+        def live(t: Optional[Trapezoid]) -> bool:
+            # A trapezoid replaced by an update loses its handle, and the leaf of a trapezoid of another map is not in
+            # the arena of this search structure.
+            return t is not None and t.handle is not None and t.leaf in nodes
+
+        if live(hint):
+            # Walk from the hint through the neighbor links.
+            queue = deque([hint])
+            visited = {hint}
+            steps = 0
+            while queue and steps < max_steps:
+                t = queue.popleft()
+                steps += 1
+                if t.contains(q):
+                    return t
+
+                for n in (t.uln, t.lln, t.urn, t.lrn):
+                    if n not in visited and live(n):
+                        visited.add(n)
+                        queue.append(n)
+
+        return self.query(q)
+
+    def locate_trajectory(self, points: Iterable[Point], max_steps: int = 8) -> Iterator[Optional[Trapezoid]]:
+        """Queries a stream of points, such as the positions of a moving object.
+
+        Each point is located starting from the trapezoid of the previous one (see locate), so that a trajectory that
+        moves across nearby trapezoids costs a constant time per point. The map may be updated between two points.
+
+        Args:
+            points (Iterable[Point]): The query points.
+            max_steps (int): The maximum number of trapezoids visited by each walk.
+
+        Returns:
+            Iterator[Optional[Trapezoid]]: The trapezoid that contains each query point.
+        """
+
+        hint = None
+        for q in points:
+            t = self.locate(q, hint, max_steps)
+            if t is not None:
+                hint = t
+            yield t
+
+    def enable_cache(self, capacity: int = 65536, quantum: Optional[float] = None) -> QueryCache:
+        """Enables a cache of the query results in front of the search structure.
+
+        The entries of the trapezoids replaced by an update are invalidated automatically. The cache belongs to the
+        search structure, so it is discarded when the trapezoidal map is built again, but the rebuilds triggered by
+        Subdivision.remove_segment keep it, emptied. See QueryCache.
+
+        Args:
+            capacity (int): The maximum number of entries, which must be positive.
+            quantum (Optional[float]): The side of the cells of the grid of quantized keys, or None for exact keys.
+
+        Returns:
+            QueryCache: The cache, which also exposes the hit and miss counters.
+        """
+
+        self.cache = QueryCache(capacity, quantum)
+
+        return self.cache
+
+    def query_face(self, q: Point, path: Optional[SearchPath] = None) -> Optional[Hashable]:
+        """Queries the face of the subdivision that contains a point.
+
+        Args:
+            q (Point): The query point.
+            path (Optional[SearchPath]): The path that records the visited nodes, if any.
+
+        Returns:
+            Optional[Hashable]: The label of the face that contains the query point, or None if the point lies outside
+                every labeled face or the query is not valid.
+        """
+
+        t = self.query(q, path)
+
+        return t.face if t is not None else None
+
+    def compile(self) -> CompiledSearchStructure:
+        """Compiles the search structure into a flat, array-backed query engine.
+
+        The compiled structure is a snapshot: it must be compiled again after the search structure is updated.
+
+        Returns:
+            CompiledSearchStructure: The compiled search structure.
+        """
+
+        return CompiledSearchStructure.from_root(self.root)
+
+    def query_many(self, xs: Sequence[float], ys: Sequence[float]) -> "numpy.ndarray":
+        """Queries a batch of points, given by their coordinates, in the search structure.
+
+        The search structure is compiled on the first batch after an update, and the compiled copy is reused by the
+        following batches. See CompiledSearchStructure.query_many.
+
+        Args:
+            xs (Sequence[float]): The X coordinates of the query points.
+            ys (Sequence[float]): The Y coordinates of the query points.
+
+        Returns:
+            numpy.ndarray: The handle of the trapezoid that contains each point, or -1 if the query is not valid.
+        """
+
+        if self.compiled is None:
+            self.compiled = self.compile()
+
+        return self.compiled.query_many(xs, ys)
+
+    def ray_shoot_up(self, xs: Sequence[float], ys: Sequence[float]) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+        """Finds the first segment hit by a vertical ray going up from each point of a batch.
+
+        See CompiledSearchStructure.ray_shoot_up, which is used on the compiled copy as in query_many.
+
+        Args:
+            xs (Sequence[float]): The X coordinates of the query points.
+            ys (Sequence[float]): The Y coordinates of the query points.
+
+        Returns:
+            Tuple[numpy.ndarray, numpy.ndarray]: The index of the hit segment in the segment table of the compiled copy
+                and the Y coordinate of the hit point, or -1 and NaN if no segment is hit.
+        """
+
+        if self.compiled is None:
+            self.compiled = self.compile()
+
+        return self.compiled.ray_shoot_up(xs, ys)
+
+    def ray_shoot_down(self, xs: Sequence[float], ys: Sequence[float]) -> Tuple["numpy.ndarray", "numpy.ndarray"]:
+        """Finds the first segment hit by a vertical ray going down from each point of a batch.
+
+        See CompiledSearchStructure.ray_shoot_down, which is used on the compiled copy as in query_many.
+
+        Args:
+            xs (Sequence[float]): The X coordinates of the query points.
+            ys (Sequence[float]): The Y coordinates of the query points.
+
+        Returns:
+            Tuple[numpy.ndarray, numpy.ndarray]: The index of the hit segment in the segment table of the compiled copy
+                and the Y coordinate of the hit point, or -1 and NaN if no segment is hit.
+        """
+
+        if self.compiled is None:
+            self.compiled = self.compile()
+
+        return self.compiled.ray_shoot_down(xs, ys)
+
 
 class Subdivision:
     """Class for subdivisions.
@@ -507,6 +1128,9 @@ class Subdivision:
     Attributes:
         segments (Set[Segment]): The set of segments.
         T (TrapezoidalMap): The corresponding trapezoidal map.
+        seed (Optional[int]): The seed of the insertion order of the last construction, which reproduces it.
+        tombstones (int): The number of segments removed since the last construction.
+        points (Dict[Tuple[float, float], Point]): The endpoints of the segments, by coordinates.
     """
 
     def __init__(self, segments: Set[Segment]) -> None:
@@ -517,13 +1141,17 @@ class Subdivision:
         """
 
         self.segments = segments
+        self.points = {(p.x, p.y): p for s in segments for p in (s.p, s.q)}
 
         # Create the bounding box.
         R = self.bounding_box()
-        print(R)
+        if tracer.level >= INFO:
+            tracer.emit(INFO, "bounding_box", trapezoid=R)
 
         # Initialize the trapezoidal map.
         self.T = TrapezoidalMap(R)
+        self.seed = None
+        self.tombstones = 0
 
     def __str__(self) -> str:
         """Returns the string representation of a Subdivision object.
@@ -536,6 +1164,51 @@ class Subdivision:
 
         return res
 
+    @classmethod
+    def from_polygons(cls, polygons: Dict[Hashable, Sequence[Tuple[float, float]]]) -> "Subdivision":
+        """Creates a labeled subdivision from a set of polygons.
+
+        Every polygon is given by the coordinates of its vertices, in either orientation, and is labeled by its key.
+        The polygons may share vertices and edges, which become single points and segments of the subdivision, but they
+        must not overlap. Each segment records the labels of the polygons on its two sides, so that the trapezoids of
+        the map can be labeled with their faces (see TrapezoidalMap.label_faces).
+
+        Args:
+            polygons (Dict[Hashable, Sequence[Tuple[float, float]]]): The vertices of each polygon, by label.
+
+        Returns:
+            Subdivision: The labeled subdivision.
+        """
+
+        points = {}
+        segments = {}
+
+        for label, vertices in polygons.items():
+            vertices = [tuple(v) for v in vertices]
+
+            # Orient the polygon counterclockwise, so that its interior lies to the left of every edge.
+            area = sum(x1 * y2 - x2 * y1 for (x1, y1), (x2, y2) in zip(vertices, vertices[1:] + vertices[:1]))
+            if area < 0:
+                vertices = vertices[::-1]
+
+            for a, b in zip(vertices, vertices[1:] + vertices[:1]):
+                # Get the segment of the edge, creating its endpoints only once.
+                key = (min(a, b), max(a, b))
+                s = segments.get(key)
+                if s is None:
+                    p = points.setdefault(a, Point(*a))
+                    q = points.setdefault(b, Point(*b))
+                    s = segments[key] = Segment(p, q)
+
+                # The interior lies above the edges that go right and below the ones that go left. Vertical edges are
+                # ordered from bottom to top, as by Point.lies_left.
+                side = "above" if a < b else "below"
+                if getattr(s, side) is not None:
+                    raise ValueError("The polygons " + str(getattr(s, side)) + " and " + str(label) + " overlap.")
+                setattr(s, side, label)
+
+        return cls(set(segments.values()))
+
     def bounding_box(self) -> Trapezoid:
         """Creates a bounding box for the subdivision.
 
@@ -548,7 +1221,7 @@ class Subdivision:
             Trapezoid: The bounding box rectangle, a particular case of trapezoid.
         """
 
-        print("Building the bounding box...")
+        tracer.message(INFO, "Building the bounding box...")
 
         min_x = float("inf")
         max_x = float("-inf")
@@ -591,22 +1264,135 @@ class Subdivision:
         # Create and return the bounding box.
         return Trapezoid(Segment(ul, ur), Segment(ll, lr), ll, lr)
 
-    def trapezoidal_map(self) -> None:
+    def remove_segment(self, s: Segment, rebuild_fraction: float = 0.25) -> None:
+        """Removes a segment from the subdivision, updating its trapezoidal map if it has already been built.
+
+        The trapezoidal map is updated locally, while the inner nodes of the segment are left in the search structure as
+        tombstones: they still lead to the right leaves, but they make the queries longer. When the removed segments
+        exceed the given fraction of the ones inserted since the last construction, the map is rebuilt from scratch, and
+        the query cache, if enabled, is emptied and moved to the new search structure.
+
+        Args:
+            s (Segment): The segment.
+            rebuild_fraction (float): The fraction of tombstones that triggers a full construction.
+        """
+
+        if s not in self.segments:
+            raise ValueError("The segment " + str(s) + " is not part of the subdivision.")
+
+        self.segments.discard(s)
+
+        if self.seed is None:
+            # The map has not been built yet: just shrink the bounding box.
+            self.T = TrapezoidalMap(self.bounding_box())
+            return
+
+        self.T.remove(s)
+        self.tombstones += 1
+
+        # Rebuild the map when the tombstones exceed the threshold.
+        if self.segments and self.tombstones > rebuild_fraction * (len(self.segments) + self.tombstones):
+            tracer.message(INFO, "Too many tombstones: rebuilding the trapezoidal map...")
+            cache = self.T.D.cache
+            self.trapezoidal_map()
+
+            # Move the query cache, emptied, to the new search structure.
+            if cache is not None:
+                cache.clear()
+                self.T.D.cache = cache
+
+    def add_segment(self, s: Segment) -> None:
+        """Adds a segment to the subdivision, updating its trapezoidal map if it has already been built.
+
+        See add_segments.
+
+        Args:
+            s (Segment): The segment, which must not cross the existing ones.
+        """
+
+        self.add_segments([s])
+
+    def add_segments(self, segments: Iterable[Segment], seed: Optional[int] = None) -> None:
+        """Adds multiple segments to the subdivision, updating its trapezoidal map if it has already been built.
+
+        The segments are inserted into the live trapezoidal map and search structure, in random order, with the same
+        steps as the construction. If some of them lie outside the bounding box, it is grown in place with the same
+        margin used by bounding_box, instead of rebuilding the map.
+        The endpoints of the segments are replaced with the existing points that have the same coordinates, since the
+        map compares endpoints by identity.
+        After an insertion, the recorded seed no longer reproduces the map.
+
+        Args:
+            segments (Iterable[Segment]): The segments, which must not cross each other or the existing ones.
+            seed (Optional[int]): The seed of the insertion order, by default a random one.
+        """
+
+        segments = list(segments)
+        if not segments:
+            return
+
+        # Share the endpoints with the existing segments and with each other.
+        points = self.points
+        for s in segments:
+            s.p = points.setdefault((s.p.x, s.p.y), s.p)
+            s.q = points.setdefault((s.q.x, s.q.y), s.q)
+
+        if self.seed is None:
+            # The map has not been built yet: the segments will be inserted by the construction.
+            self.segments.update(segments)
+            self.T = TrapezoidalMap(self.bounding_box())
+            return
+
+        # Grow the bounding box if needed.
+        xs = [p.x for s in segments for p in (s.p, s.q)]
+        ys = [p.y for s in segments for p in (s.p, s.q)]
+        self.T.grow(min(xs) - 1, min(ys) - 1, max(xs) + 1, max(ys) + 1)
+
+        random.Random(seed).shuffle(segments)
+
+        # Iteratively update the trapezoidal map.
+        for s in segments:
+            if tracer.level >= INFO:
+                tracer.emit(INFO, "insert_step", index=len(self.segments), segment=s)
+
+            # Find the intersected trapezoids.
+            deltas = self.T.follow_segment(s)
+
+            # Update the trapezoidal map and the search structure, labeling the new trapezoids.
+            self.T.update(s, deltas, True)
+            self.segments.add(s)
+
+    def trapezoidal_map(self, seed: Optional[int] = None) -> None:
         """Builds the trapezoidal map from the subdivision.
 
         The trapezoidal map is a refinement of the original subdivision. It is completed by a search structure, which is
         a DAG representing the trapezoids as leaves.
         These structures can be used together to query which trapezoid contains a given point.
+        The segments are inserted in a random order, determined by the seed: the same seed always reproduces the same
+        construction. If the map has already been built, it is rebuilt from the bounding box.
+
+        Args:
+            seed (Optional[int]): The seed of the insertion order, by default a random one.
         """
 
-        # Get the list of segments and shuffle it.
-        segments = list(self.segments)
-        random.shuffle(segments)
+        if self.seed is not None:
+            # Start again from an empty trapezoidal map.
+            self.T = TrapezoidalMap(self.bounding_box())
+
+        # Record the seed, so that the construction can be reproduced.
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.seed = seed
+        self.tombstones = 0
+
+        # Get the list of segments in a canonical order and shuffle it.
+        segments = sorted(self.segments, key=lambda s: (s.p.x, s.p.y, s.q.x, s.q.y))
+        random.Random(seed).shuffle(segments)
 
         # Iteratively build the trapezoidal map.
         for i in range(len(segments)):
-            print("\n" + 80 * "~")
-            print("\tITERATION " + str(i) + ":\t" + str(segments[i]) + "\n")
+            if tracer.level >= INFO:
+                tracer.emit(INFO, "insert_step", index=i, segment=segments[i])
 
             # Find the intersected trapezoids.
             deltas = self.T.follow_segment(segments[i])
@@ -614,5 +1400,136 @@ class Subdivision:
             # Update the trapezoidal map and the search structure.
             self.T.update(segments[i], deltas)
 
-        print("\n" + 80 * "~")
-        print("Construction completed.")
+        # Label the faces, now that every segment is in the map.
+        self.T.label_faces()
+
+        tracer.message(INFO, "\n" + 80 * "~" + "\nConstruction completed.")
+
+    def bounded_trapezoidal_map(self, depth_factor: float = 5.0, size_factor: float = 16.0, attempts: int = 10,
+                                candidates: int = 1, processes: Optional[int] = None,
+                                seed: Optional[int] = None) -> bool:
+        """Builds the trapezoidal map from the subdivision, guaranteeing the depth and the size of the search structure.
+
+        A single random insertion order can produce a search structure much deeper than the expected O(log n). After
+        each construction, the maximum query depth and the number of nodes are measured and compared with the bounds
+        depth_factor * log2(n + 1) and size_factor * (n + 1): if they are exceeded, the map is rebuilt with a new seed.
+        In each attempt, several seeded candidates can be built, optionally in parallel worker processes, and the best
+        one is kept: the workers only return its seed, and the map is rebuilt locally from it.
+        If no attempt satisfies the bounds, the best map found is kept. Either way, its seed is recorded.
+
+        Args:
+            depth_factor (float): The constant c of the depth bound c * log2(n + 1).
+            size_factor (float): The constant of the size bound, relative to the number of segments.
+            attempts (int): The maximum number of attempts.
+            candidates (int): The number of candidates built in each attempt.
+            processes (Optional[int]): The number of worker processes for the candidates, by default the number of CPUs.
+            seed (Optional[int]): The seed that generates the seeds of the candidates, by default a random one.
+
+        Returns:
+            bool: True if the bounds are satisfied, False otherwise.
+        """
+
+        n = len(self.segments)
+        max_depth = depth_factor * math.log2(n + 1)
+        max_size = size_factor * (n + 1)
+
+        rng = random.Random(seed)
+        best = None
+
+        pool = None
+        if candidates > 1:
+            import multiprocessing
+            pool = multiprocessing.Pool(processes)
+
+        try:
+            for attempt in range(attempts):
+                seeds = [rng.randrange(2 ** 32) for _ in range(candidates)]
+
+                # Build and measure the candidates.
+                if pool is not None:
+                    results = pool.starmap(_measure_candidate, [(self.segments, c) for c in seeds])
+                else:
+                    results = []
+                    for c in seeds:
+                        self.trapezoidal_map(c)
+                        C = self.T.D.compiled = self.T.D.compile()
+                        results.append((C.max_depth(), len(C.kind), c))
+
+                # Keep the shallowest candidate, and the smallest among the shallowest.
+                for depth, size, c in results:
+                    if tracer.level >= STEP:
+                        stats = "depth " + str(depth) + ", size " + str(size)
+                        tracer.message(STEP, "Candidate " + str(c) + ": " + stats + ".")
+                    if best is None or (depth, size) < best[:2]:
+                        best = (depth, size, c)
+
+                if best[0] <= max_depth and best[1] <= max_size:
+                    break
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        # Rebuild the best candidate, unless it is the last local build.
+        if self.seed != best[2]:
+            self.trapezoidal_map(best[2])
+            self.T.D.compiled = self.T.D.compile()
+
+        return best[0] <= max_depth and best[1] <= max_size
+
+    def parallel_trapezoidal_map(self, slabs: Optional[int] = None, processes: Optional[int] = None,
+                                 seed: Optional[int] = None) -> None:
+        """Builds the trapezoidal map from the subdivision in vertical slabs, using several worker processes.
+
+        The bounding box is cut by vertical walls into slabs with about the same number of endpoints, and the segments
+        are clipped to the walls. The map and the search structure of each slab are built by a worker process, then
+        they are stitched under a tree of X-nodes on the walls, merging the trapezoids that are only split by a wall.
+        The trapezoids are the same as the ones built by trapezoidal_map, while the search structure is a few levels
+        deeper. See slabs.build_slabs.
+        The same seed and number of slabs always reproduce the same construction. If there are too few distinct X
+        coordinates to place a wall, the map is built by trapezoidal_map instead.
+
+        Args:
+            slabs (Optional[int]): The number of slabs, by default the number of worker processes.
+            processes (Optional[int]): The number of worker processes, by default the number of CPUs, or 1 to build the
+                slabs in the current process.
+            seed (Optional[int]): The seed that generates the insertion orders of the slabs, by default a random one.
+        """
+
+        import os
+
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+
+        # Get the list of segments in a canonical order and cut it into slabs.
+        segments = sorted(self.segments, key=lambda s: (s.p.x, s.p.y, s.q.x, s.q.y))
+        walls, crossings = place_walls(segments, slabs or processes or os.cpu_count() or 1)
+        if not walls:
+            self.trapezoidal_map(seed)
+            return
+
+        self.T = build_slabs(segments, self.bounding_box(), walls, crossings, processes, seed)
+        self.seed = seed
+        self.tombstones = 0
+
+        tracer.message(INFO, "\n" + 80 * "~" + "\nConstruction completed.")
+
+
+def _measure_candidate(segments: Set[Segment], seed: int) -> Tuple[int, int, int]:
+    """Builds a candidate trapezoidal map and measures its search structure.
+
+    It is a module-level function, so that it can be run by worker processes.
+
+    Args:
+        segments (Set[Segment]): The set of segments.
+        seed (int): The seed of the insertion order.
+
+    Returns:
+        Tuple[int, int, int]: The maximum depth, the number of nodes and the seed.
+    """
+
+    S = Subdivision(segments)
+    S.trapezoidal_map(seed)
+    C = S.T.D.compile()
+
+    return C.max_depth(), len(C.kind), seed
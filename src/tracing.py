@@ -0,0 +1,147 @@
+from typing import *
+
+# Trace levels, from the least to the most verbose.
+OFF = 0
+INFO = 1  # Milestones of the construction and invalid queries
+STEP = 2  # Insertion steps, created and destroyed trapezoids
+DEBUG = 3  # Created nodes and every node visited by a traversal
+
+
+class Event:
+    """Class for trace events.
+
+    An event is structured: it carries the objects involved instead of their string representation, which is only built
+    by the sinks that need it.
+
+    Attributes:
+        level (int): The trace level of the event.
+        kind (str): The kind of the event.
+        data (Dict[str, Any]): The objects involved in the event.
+    """
+
+    __slots__ = ("level", "kind", "data")
+
+    def __init__(self, level: int, kind: str, data: Dict[str, Any]) -> None:
+        """Initializes an Event object.
+
+        Args:
+            level (int): The trace level of the event.
+            kind (str): The kind of the event.
+            data (Dict[str, Any]): The objects involved in the event.
+        """
+
+        self.level = level
+        self.kind = kind
+        self.data = data
+
+    def __str__(self) -> str:
+        """Returns the string representation of an Event object, in the style of the console output.
+        """
+
+        from src.util import get_id
+
+        data = self.data
+        kind = self.kind
+
+        if kind == "message":
+            res = data["text"]
+        elif kind == "insert_step":
+            res = "\n" + 80 * "~" + "\n\tITERATION " + str(data["index"]) + ":\t" + str(data["segment"]) + "\n"
+        elif kind == "node_visited":
+            arrows = {"left": "<-", "right": "->", "above": "/\\", "below": "\\/"}
+            res = arrows[data["branch"]] + "\t" + str(data["key"])
+        elif kind == "leaf_reached":
+            res = "Trapezoid ID: " + get_id(data["trapezoid"])
+        elif kind == "trapezoid_created":
+            res = "\t(+) Trapezoid " + get_id(data["trapezoid"]) + " added."
+        elif kind == "trapezoid_destroyed":
+            res = "\t(-) Trapezoid " + get_id(data["trapezoid"]) + " removed."
+        elif kind == "intersected":
+            res = "\nIntersected trapezoids:\n" + "\n".join(get_id(delta) for delta in data["trapezoids"])
+        elif kind == "new_trapezoids":
+            res = "\nNew trapezoids:\n" + str(data["new_trapezoids"])
+        elif kind == "nodes_created":
+            res = "X-nodes:\n" + "\n".join(str(node) for node in data["x_nodes"])
+            res += "\nY-nodes:\n" + "\n".join(str(node) for node in data["y_nodes"])
+        elif kind == "query":
+            res = "Querying point " + str(data["point"]) + "..."
+        elif kind == "invalid_query":
+            res = "The query point " + str(data["point"]) + " is not valid."
+        elif kind == "bounding_box":
+            res = str(data["trapezoid"])
+        else:
+            res = kind + ":" + "".join("\n" + name + " = " + str(value) for name, value in data.items())
+
+        return res
+
+
+class Tracer:
+    """Class for tracers.
+
+    A tracer forwards the events up to its level to a sink, which is any callable accepting an Event. The hot paths
+    check the level before building an event, so a disabled tracer costs a single comparison.
+
+    Attributes:
+        level (int): The most verbose level that is traced, OFF to disable tracing.
+        sink (Callable[[Event], None]): The destination of the events.
+    """
+
+    def __init__(self, level: int = OFF, sink: Optional[Callable[[Event], None]] = None) -> None:
+        """Initializes a Tracer object.
+
+        Args:
+            level (int): The most verbose level that is traced.
+            sink (Optional[Callable[[Event], None]]): The destination of the events, by default the standard output.
+        """
+
+        self.level = level
+        self.sink = sink if sink is not None else print_sink
+
+    def emit(self, level: int, kind: str, **data: Any) -> None:
+        """Emits an event if its level is traced.
+
+        Args:
+            level (int): The trace level of the event.
+            kind (str): The kind of the event.
+            **data (Any): The objects involved in the event.
+        """
+
+        if level <= self.level:
+            self.sink(Event(level, kind, data))
+
+    def message(self, level: int, text: str) -> None:
+        """Emits a plain text event if its level is traced.
+
+        Args:
+            level (int): The trace level of the event.
+            text (str): The text of the message.
+        """
+
+        if level <= self.level:
+            self.sink(Event(level, "message", {"text": text}))
+
+
+def print_sink(event: Event) -> None:
+    """Prints an event on the standard output.
+
+    Args:
+        event (Event): The event.
+    """
+
+    print(event)
+
+
+# The tracer shared by all the structures. It is configured in place, so that imported references stay valid.
+tracer = Tracer()
+
+
+def set_tracing(level: int, sink: Optional[Callable[[Event], None]] = None) -> None:
+    """Configures the shared tracer.
+
+    Args:
+        level (int): The most verbose level that is traced, OFF to disable tracing.
+        sink (Optional[Callable[[Event], None]]): The destination of the events, by default the standard output.
+    """
+
+    tracer.level = level
+    tracer.sink = sink if sink is not None else print_sink
@@ -6,6 +6,8 @@ from src.geometry import Segment, Trapezoid
 def get_id(obj: Optional[object]) -> str:
     """Returns the ID of the object if not None, otherwise returns "None".
 
+    The ID is the handle of the object in its arena (see Arena), if it has one, and its address otherwise.
+
     Args:
         obj (Optional[object]): The object.
 
@@ -16,143 +18,194 @@ def get_id(obj: Optional[object]) -> str:
     res = "None"
 
     if obj is not None:
-        res = str(id(obj))
+        handle = getattr(obj, "handle", None)
+        res = str(handle) if handle is not None else "@" + str(id(obj))
 
     return res
 
 
-def split_trapezoids(s: Segment, deltas: List[Trapezoid]) -> (List[Trapezoid], List[Trapezoid]):
-    """Splits the trapezoids intersected by a segment into their upper and lower parts.
+def split_chain(s: Segment, deltas: List[Trapezoid], first: Optional[Trapezoid], last: Optional[Trapezoid],
+                above: bool) -> List[Trapezoid]:
+    """Splits the trapezoids intersected by a segment on one side of it, merging the parts and setting their neighbors.
 
-    The resulting trapezoids maintain the relevant neighbors that will be used to initialize the merged trapezoids.
+    The intersected trapezoids are visited once, from left to right. Consecutive parts that share the same side are
+    merged by extending the current trapezoid, so that only the resulting trapezoids are created. The neighbors of each
+    trapezoid are set when it is completed, and its outer neighbors are notified of the update.
 
     Args:
         s (Segment): The segment.
         deltas (List[Trapezoid]): The list of intersected trapezoids.
+        first (Optional[Trapezoid]): The leftmost neighbor.
+        last (Optional[Trapezoid]): The rightmost neighbor.
+        above (bool): True for the parts above the segment, False for the parts below it.
 
     Returns:
-        (List[Trapezoid], List[Trapezoid]): The lists of the upper and lower parts of trapezoids, respectively.
+        List[Trapezoid]: The mapping from the intersected trapezoids to the new ones, which contains duplicates for the
+            merged parts.
     """
 
-    upper = []
-    lower = []
+    res = []
+
+    size = len(deltas)
+    curr = None
 
-    # Add the leftmost trapezoids.
-    left_upper = Trapezoid(deltas[0].top, s, s.p, deltas[0].rightp)
-    left_upper.set_neighbors(None, None, deltas[0].urn, None)
-    upper.append(left_upper)
-    left_lower = Trapezoid(s, deltas[0].bottom, s.p, deltas[0].rightp)
-    left_lower.set_neighbors(None, None, None, deltas[0].lrn)
-    lower.append(left_lower)
+    for i in range(size):
+        delta = deltas[i]
+        side = delta.top if above else delta.bottom
+        rightp = s.q if i == size - 1 else delta.rightp
 
-    # Add the intermediate trapezoids.
-    for i in range(1, len(deltas) - 1):
-        # Get the intersected trapezoid.
-        curr = deltas[i]
+        if curr is not None and (curr.top if above else curr.bottom) is side:
+            # Merge the part with the current trapezoid.
+            curr.rightp = rightp
+            res.append(curr)
+            continue
 
-        # Split the trapezoid.
-        curr_upper = Trapezoid(curr.top, s, curr.leftp, curr.rightp)
-        curr_upper.set_neighbors(curr.uln, None, curr.urn, None)
-        upper.append(curr_upper)
-        curr_lower = Trapezoid(s, curr.bottom, curr.leftp, curr.rightp)
-        curr_lower.set_neighbors(None, curr.lln, None, curr.lrn)
-        lower.append(curr_lower)
+        prev = curr
+        if above:
+            curr = Trapezoid(side, s, s.p if i == 0 else delta.leftp, rightp)
+        else:
+            curr = Trapezoid(s, side, s.p if i == 0 else delta.leftp, rightp)
+        res.append(curr)
+
+        # Get the outer left neighbor, from the intersected trapezoid where the new one starts.
+        if i == 0:
+            outer = first
+        else:
+            outer = delta.uln if above else delta.lln
 
-    # Add the rightmost trapezoids.
-    right_upper = Trapezoid(deltas[-1].top, s, deltas[-1].leftp, s.q)
-    right_upper.set_neighbors(deltas[-1].uln, None, None, None)
-    upper.append(right_upper)
-    right_lower = Trapezoid(s, deltas[-1].bottom, deltas[-1].leftp, s.q)
-    right_lower.set_neighbors(None, deltas[-1].lln, None, None)
-    lower.append(right_lower)
+        if above:
+            curr.set_neighbors(outer, prev, None, None)
+        else:
+            curr.set_neighbors(prev, outer, None, None)
+
+        # Complete the previous trapezoid with the outer right neighbor of the intersected trapezoid where it ends.
+        if prev is not None:
+            if above:
+                prev.urn = deltas[i - 1].urn
+                if prev.urn is not None:
+                    prev.urn.uln = prev
+            else:
+                prev.lrn = deltas[i - 1].lrn
+                if prev.lrn is not None:
+                    prev.lrn.lln = prev
+
+    # Complete the last trapezoid.
+    if above:
+        curr.urn = last
+        if last is not None:
+            last.uln = curr
+    else:
+        curr.lrn = last
+        if last is not None:
+            last.lln = curr
 
-    return upper, lower
+    return res
 
 
-def merge_trapezoids(parts: List[Trapezoid]) -> List[Trapezoid]:
-    """Merges the adjacent trapezoids that share both non-vertical sides.
+def merge_region(upper: List[Trapezoid], lower: List[Trapezoid]) -> List[Trapezoid]:
+    """Decomposes the region left by a removed segment into new trapezoids.
 
-    In the resulting list, the i-th element specifies the destination trapezoid of the i-th part, which means that the
-    list contains duplicates for consecutive merged parts.
+    The region is bounded from above by the tops of the upper chain and from below by the bottoms of the lower chain.
+    Both chains are ordered from left to right and cover the same X interval, and a trapezoid that spans the whole
+    height of the region belongs to both of them. Every wall of the chains now extends across the whole region, except
+    for the walls between parts with the same top and bottom, which are merged.
+    The neighbors of the new trapezoids are set, replacing the trapezoids of the region in the links of their neighbors.
 
     Args:
-        parts (List[Trapezoid]): The list of parts of trapezoids.
+        upper (List[Trapezoid]): The upper chain.
+        lower (List[Trapezoid]): The lower chain.
 
     Returns:
-        List[Trapezoid]: The mapping from the original trapezoids to the merged ones.
+        List[Trapezoid]: The new trapezoids, ordered from left to right.
     """
 
-    res = []
+    region = set(upper) | set(lower)
+
+    # Each part records its sides and the chain elements on its left and right walls. A chain "breaks" at a wall when
+    # one of its elements ends there: the neighbors beyond that part of the wall are then outside the region.
+    parts = []
 
     i = 0
-    j = 1
-    size = len(parts)
+    j = 0
+    top_break = True
+    bottom_break = True
+    leftp = upper[0].leftp
+
+    while i < len(upper) and j < len(lower):
+        top = upper[i]
+        bottom = lower[j]
+
+        # The current slab ends at the nearest wall of either chain.
+        if top.rightp is bottom.rightp:
+            rightp = top.rightp
+            top_end, bottom_end = True, True
+        elif top.rightp.lies_left(bottom.rightp):
+            rightp = top.rightp
+            top_end, bottom_end = True, False
+        else:
+            rightp = bottom.rightp
+            top_end, bottom_end = False, True
+
+        right = (top_end, top, bottom_end, bottom)
+        if parts and parts[-1][0] is top.top and parts[-1][1] is bottom.bottom:
+            # Merge the slab with the previous part.
+            parts[-1][3] = rightp
+            parts[-1][5] = right
+        else:
+            parts.append([top.top, bottom.bottom, leftp, rightp, (top_break, top, bottom_break, bottom), right])
 
-    while i < size and j < size:
-        # Initialize the properties of a new trapezoid.
-        top = parts[i].top
-        bottom = parts[i].bottom
-        leftp = parts[i].leftp
-        rightp = parts[i].rightp
+        top_break, bottom_break = top_end, bottom_end
+        leftp = rightp
+        if top_end:
+            i += 1
+        if bottom_end:
+            j += 1
 
-        # Check if the current trapezoid can be merged with the predecessor.
-        while (i < size and j < size) and (parts[j].top == parts[i].top and parts[j].bottom == parts[i].bottom):
-            rightp = parts[j].rightp
+    res = [Trapezoid(part[0], part[1], part[2], part[3]) for part in parts]
 
-            j += 1
+    # Set the neighbors of each new trapezoid.
+    for k, part in enumerate(parts):
+        prev = res[k - 1] if k > 0 else None
+        succ = res[k + 1] if k < len(res) - 1 else None
 
-        # Map each original trapezoid to the merged one.
-        merged = Trapezoid(top, bottom, leftp, rightp)
-        for k in range(i, j):
-            res.append(merged)
+        top_break, first_top, bottom_break, first_bottom = part[4]
+        uln = first_top.uln if top_break else prev
+        lln = first_bottom.lln if bottom_break else prev
 
-        i = j
+        top_break, last_top, bottom_break, last_bottom = part[5]
+        urn = last_top.urn if top_break else succ
+        lrn = last_bottom.lrn if bottom_break else succ
 
-    return res
+        # Neighbors inside the region are replaced by the adjacent new trapezoids.
+        uln = prev if uln in region else uln
+        lln = prev if lln in region else lln
+        urn = succ if urn in region else urn
+        lrn = succ if lrn in region else lrn
 
+        res[k].set_neighbors(uln, lln, urn, lrn)
 
-def update_neighbors(s_list: List[Trapezoid], m_list: List[Trapezoid], first: Trapezoid, last: Trapezoid,
-                     above: bool) -> None:
-    """Updates the neighbors of a list of trapezoids that share the same non-vertical side.
+    return res
 
-    Args:
-        m_list (List[Trapezoids]): The mapping from the split trapezoids to the merged ones.
-        s_list (List[Trapezoids]): The list of split trapezoids.
-        first (Trapezoid): The leftmost neighbor.
-        last (Trapezoid): The rightmost neighbor.
-        above (bool): True if the trapezoids share the bottom side, False if they share the top side.
-    """
 
-    k = 0
-    size = len(m_list)
+def x_tree(ts: List[Trapezoid]) -> "Node":
+    """Builds a balanced tree of X-nodes that locates a point among consecutive trapezoids.
 
-    while k < size:
-        old = s_list[k]
-        curr = m_list[k]
+    Args:
+        ts (List[Trapezoid]): The trapezoids, ordered from left to right and separated by vertical walls.
 
-        pred = m_list[k - 1] if k > 0 else None
-        succ = curr
+    Returns:
+        Node: The root of the tree, which is the leaf of the trapezoid if there is only one.
+    """
 
-        # Obtain the left neighbors.
-        if above:
-            uln = old.uln if k > 0 else first  # Problem: k may have been updated
-            lln = pred
-        else:
-            uln = pred
-            lln = old.lln if k > 0 else first
+    from src.nodes import XNode
 
-        # Iterate while the successor is a duplicate of the current trapezoid.
-        while curr == succ:
-            k += 1
-            succ = m_list[k] if k < size else None
+    if len(ts) == 1:
+        return ts[0].leaf
 
-        # Obtain the right neighbors.
-        if above:
-            urn = old.urn if k < size - 1 else last
-            lrn = succ
-        else:
-            urn = succ
-            lrn = old.lrn if k < size - 1 else last
+    # Split the trapezoids at the middle wall.
+    mid = len(ts) // 2
+    node = XNode(ts[mid].leftp)
+    node.set_left_child(x_tree(ts[:mid]))
+    node.set_right_child(x_tree(ts[mid:]))
 
-        # Set the neighbors of the current trapezoid.
-        curr.set_neighbors(uln, lln, urn, lrn)
+    return node
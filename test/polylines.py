@@ -0,0 +1,15 @@
+from src.geometry import Point, Segment
+
+
+# ---SUBDIVISION----
+
+def polyline(points):
+    vertices = [Point(x, y) for x, y in points]
+
+    return {Segment(a, b) for a, b in zip(vertices, vertices[1:])}
+
+
+# Two zigzag polylines, one above the other, shared by the tests that need a small subdivision. The tests that modify it
+# work on a copy of the set.
+segments = polyline([(0, 5), (3, 1), (7, 6), (11, 2), (14, 7), (18, 3)]) | \
+           polyline([(1, 12), (5, 9), (9, 13), (13, 10), (17, 14)])
@@ -0,0 +1,50 @@
+from src.arena import Arena
+from src.geometry import Point, Segment
+from src.structures import Subdivision
+
+
+# ---SUBDIVISION----
+
+p1 = Point(2, 4)
+p2 = Point(10, 8)
+p3 = Point(6, 2)
+p4 = Point(20, 4)
+
+s1 = Segment(p1, p2)
+s2 = Segment(p3, p4)
+
+
+# ----ARENA----
+
+class Item:
+    def __init__(self) -> None:
+        self.handle = None
+
+
+def test_arena_reuses_handles():
+    A = Arena()
+    a, b, c = Item(), Item(), Item()
+    assert [A.add(x) for x in (a, b, c)] == [0, 1, 2]
+
+    A.discard(b)
+    assert b.handle is None and b not in A
+    assert len(A) == 2 and list(A) == [a, c]
+
+    # The freed slot is reused by the next allocation.
+    d = Item()
+    assert A.add(d) == 1
+    assert A[1] is d
+
+
+def test_map_handles():
+    S = Subdivision({s1, s2})
+    S.trapezoidal_map(0)
+
+    assert all(S.T.trapezoids[t.handle] is t for t in S.T.trapezoids)
+    assert all(S.T.D.nodes[n.handle] is n for n in S.T.D.nodes)
+
+    # The same construction assigns the same handles.
+    S2 = Subdivision({s1, s2})
+    S2.trapezoidal_map(0)
+    for q in (Point(8, 5), Point(8, 9), Point(8, 1), Point(15, 5)):
+        assert S.T.D.query(q).handle == S2.T.D.query(q).handle
@@ -0,0 +1,81 @@
+import pytest
+
+from src.cache import QueryCache
+from src.geometry import Point, Segment
+from src.structures import Subdivision
+
+
+# ---SUBDIVISION----
+
+p1 = Point(2, 4)
+p2 = Point(10, 8)
+p3 = Point(6, 2)
+p4 = Point(20, 4)
+
+s1 = Segment(p1, p2)
+s2 = Segment(p3, p4)
+
+
+# ----CACHE----
+
+def test_cache_hits():
+    S = Subdivision({s1, s2})
+    S.trapezoidal_map(0)
+    cache = S.T.D.enable_cache(capacity=2)
+
+    q = Point(8, 5)
+    t = S.T.D.query(q)
+    assert S.T.D.query(q) is t
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    # The least recently used entry is evicted.
+    S.T.D.query(Point(8, 9))
+    S.T.D.query(Point(8, 1))
+    assert len(cache) == 2
+    assert cache.key(q.x, q.y) not in cache.entries
+
+
+def test_cache_invalidation():
+    S = Subdivision({s1, s2})
+    S.trapezoidal_map(0)
+    cache = S.T.D.enable_cache()
+
+    q = Point(15, 7)
+    old = S.T.D.query(q)
+
+    # The new segment splits the cached trapezoid.
+    s = Segment(Point(12, 6), Point(18, 8))
+    S.add_segment(s)
+    assert len(cache) == 0
+    assert S.T.D.query(q).bottom is s
+    assert S.T.D.query(q) is not old
+
+
+def test_cache_after_rebuild():
+    S = Subdivision({s1, s2})
+    S.trapezoidal_map(0)
+    cache = S.T.D.enable_cache(capacity=8, quantum=0.5)
+
+    q = Point(15, 7)
+    S.T.D.query(q)
+
+    # The removal triggers a rebuild, which keeps the cache but drops its entries.
+    S.remove_segment(s1)
+    assert S.T.D.cache is cache
+    assert (cache.capacity, cache.quantum) == (8, 0.5)
+    assert len(cache) == 0
+    assert S.T.D.query(q) in S.T.trapezoids
+    assert len(cache) == 1
+
+
+def test_quantized_keys():
+    cache = QueryCache(quantum=0.5)
+
+    assert cache.key(1.1, 2.3) == cache.key(1.4, 2.1)
+    assert cache.key(1.1, 2.3) != cache.key(1.6, 2.3)
+
+
+def test_invalid_capacity():
+    for capacity in (0, -1):
+        with pytest.raises(ValueError):
+            QueryCache(capacity)
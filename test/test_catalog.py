@@ -0,0 +1,78 @@
+import pytest
+
+from src.catalog import MapCatalog
+from src.geometry import Point
+from src.structures import Subdivision
+
+
+# ---SUBDIVISION----
+
+# Two triangles that share an edge, a parcel with a notch filled by another one, a frame around them and a field larger
+# than a cell.
+polygons = {
+    "west": [(0, 0), (10, 1), (1, 9)],
+    "east": [(10, 1), (11, 10), (1, 9)],
+    "park": [(20, 0), (40, 1), (41, 20), (30, 12), (21, 19)],
+    3: [(21, 19), (30, 12), (41, 20), (31, 23)],
+    "frame": [(-5, -5), (50, -5), (50, 30), (-5, 30), (-5, 25), (45, 25), (45, -2), (-5, -2)],
+    "field": [(60, -40), (140, -40), (140, 60), (60, 60)],
+}
+
+
+def build(tmp_path, memory_budget: int) -> (Subdivision, MapCatalog):
+    S = Subdivision.from_polygons(polygons)
+    S.trapezoidal_map(0)
+    C = MapCatalog.build(S.segments, str(tmp_path), cells=(3, 3), seed=0, memory_budget=memory_budget)
+
+    return S, C
+
+
+# ----CATALOG----
+
+def test_catalog_faces(tmp_path):
+    S, C = build(tmp_path, 2 ** 20)
+
+    assert len(C) == 9
+
+    # Every face is found in the shards, also on the grid lines.
+    xs = [i / 2 + 0.3 for i in range(-100, 300)] + C.x_lines
+    ys = [j / 2 + 0.35 for j in range(-90, 130)] + C.y_lines
+    for x in xs:
+        for y in ys:
+            q = Point(x, y)
+            assert C.query_face(q) == S.T.D.query_face(q)
+
+    # The catalog can be opened again from its directory.
+    C2 = MapCatalog(str(tmp_path))
+    assert C2.query_face(Point(30, 3)) == "park"
+    assert C2.query_face(Point(32, 18)) == 3
+    assert C2.query_face(Point(100, 10)) == "field"
+
+
+def test_catalog_budget(tmp_path):
+    S, C = build(tmp_path, 1)
+
+    # Only the most recently used shard stays loaded.
+    q = Point(32, 18)
+    C.query(q)
+    C.query(q)
+    C.query(Point(0, 28))
+    assert (C.loads, len(C.resident)) == (2, 1)
+
+    # The global index of a trapezoid leads back to it.
+    i = C.locate(q.x, q.y)
+    t = C.trapezoid(i)
+    assert t.contains(q)
+    assert t.face == 3
+
+
+def test_catalog_query_many(tmp_path):
+    np = pytest.importorskip("numpy")
+
+    S, C = build(tmp_path, 2 ** 20)
+
+    xs = np.array([x / 3 for x in range(-120, 420)] + C.x_lines)
+    ys = np.array([(x * 7 % 300) / 3 - 40 for x in range(-120, 420)] + C.y_lines)
+
+    res = C.query_many(xs, ys)
+    assert list(res) == [C.locate(x, y) for x, y in zip(xs, ys)]
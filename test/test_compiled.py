@@ -0,0 +1,152 @@
+import random
+
+import pytest
+
+from src.geometry import Point, Segment
+from src.structures import Subdivision
+
+
+# ---SUBDIVISION----
+
+# Points
+p1 = Point(10, 8)
+p2 = Point(2, 4)
+p3 = Point(6, 2)
+p4 = Point(20, 4)
+p5 = Point(12, 10)
+p6 = Point(16, 6)
+
+# Segments
+s1 = Segment(p1, p2)
+s2 = Segment(p2, p3)
+s3 = Segment(p3, p4)
+s4 = Segment(p4, p5)
+s5 = Segment(p2, p6)
+
+
+def build() -> Subdivision:
+    random.seed(0)
+    S = Subdivision({s1, s2, s3, s4, s5})
+    S.trapezoidal_map()
+
+    return S
+
+
+# ----QUERY----
+
+def test_compiled_query():
+    S = build()
+    C = S.T.D.compile()
+
+    assert len(C.kind) == len(C.key) == len(C.left) == len(C.right)
+    assert len(C.trapezoids) == len(C.trap_top)
+
+    # Compare the compiled engine with the object DAG on a grid of points.
+    for i in range(3, 42):
+        for j in range(3, 22):
+            q = Point(i / 2, j / 2)
+            assert C.query(q) is S.T.D.query(q)
+
+
+def test_compiled_invalid_query():
+    S = build()
+    C = S.T.D.compile()
+
+    # Querying an endpoint of the subdivision is not valid.
+    assert C.locate(p3.x, p3.y) == -1
+    assert C.query(p3) is None
+
+
+def test_query_many():
+    np = pytest.importorskip("numpy")
+
+    S = build()
+    C = S.T.D.compile()
+
+    xs = np.array([i / 2 for i in range(3, 42) for j in range(3, 22)] + [p3.x, p5.x])
+    ys = np.array([j / 2 for i in range(3, 42) for j in range(3, 22)] + [p3.y, p5.y])
+
+    # Compare the batch queries with the single queries.
+    res = S.T.D.query_many(xs, ys)
+    assert list(res) == [C.locate(x, y) for x, y in zip(xs, ys)]
+    assert res[-1] == res[-2] == -1
+
+
+def test_ray_shoot():
+    np = pytest.importorskip("numpy")
+
+    S = build()
+    C = S.T.D.compile()
+
+    # Between s3 and s5, on s3, below every segment, and on a vertex.
+    xs = np.array([10, 13, 14, p3.x])
+    ys = np.array([4, 3, 0, p3.y])
+
+    up, up_y = S.T.D.ray_shoot_up(xs, ys)
+    down, down_y = S.T.D.ray_shoot_down(xs, ys)
+
+    def coords(i):
+        s = C.segments.segment(i)
+        return s.p.x, s.p.y, s.q.x, s.q.y
+
+    assert coords(up[0]) == (2, 4, 16, 6) and up_y[0] == 4 + 8 / 14 * 2
+    assert coords(down[0]) == (6, 2, 20, 4) and down_y[0] == 2 + 4 / 14 * 2
+    assert coords(up[1]) == (2, 4, 16, 6)
+    assert coords(down[1]) == (6, 2, 20, 4) and down_y[1] == 3
+    assert coords(up[2]) == (6, 2, 20, 4) and down[2] == -1 and np.isnan(down_y[2])
+    assert up[3] == down[3] == -1
+
+
+def test_save_load(tmp_path):
+    from src.storage import load
+
+    S = build()
+    C = S.T.D.compile()
+
+    path = str(tmp_path / "map.bin")
+    S.T.save(path)
+    L = load(path)
+
+    assert list(L.kind) == list(C.kind)
+    assert list(L.segments.dx) == list(C.segments.dx)
+
+    # The loaded structure answers the same queries.
+    for i in range(3, 42):
+        for j in range(3, 22):
+            assert L.locate(i / 2, j / 2) == C.locate(i / 2, j / 2)
+
+    t = L.query(Point(4, 2))
+    assert (t.top.p.x, t.top.p.y, t.top.q.x, t.top.q.y) == (p2.x, p2.y, p3.x, p3.y)
+
+
+
+def test_compiled_handles(tmp_path):
+    from src.storage import load
+
+    S = build()
+
+    # Free some slots of the arena, so that the handles are not contiguous.
+    S.remove_segment(s4, rebuild_fraction=1)
+    assert len(S.T.trapezoids) < len(S.T.trapezoids.slots)
+
+    C = S.T.D.compile()
+    path = str(tmp_path / "map.bin")
+    S.T.save(path)
+    L = load(path)
+    G = S.T.adjacency()
+
+    # The compiled and the loaded structures return the handles of the trapezoids, which index the adjacency graph.
+    for i in range(3, 42):
+        for j in range(3, 22):
+            t = S.T.D.query(Point(i / 2, j / 2))
+            if t is None:
+                continue
+            assert C.locate(i / 2, j / 2) == L.locate(i / 2, j / 2) == t.handle
+            assert C.trapezoids[t.handle] is t
+            assert set(G.neighbors(t.handle)) == {n.handle for n in (t.uln, t.lln, t.urn, t.lrn) if n is not None}
+
+    # The rows of the free slots are empty.
+    free = [h for h, t in enumerate(C.trapezoids) if t is None]
+    assert free and all(C.trap_top[h] == C.trap_face[h] == -1 for h in free)
+    with pytest.raises(ValueError):
+        L.trapezoid(free[0])
@@ -0,0 +1,141 @@
+from src.geometry import Point, Segment
+from src.structures import Subdivision
+
+from polylines import polyline, segments
+
+
+# ----CONSTRUCTION----
+
+def test_seed_reproduces_construction():
+    S1 = Subdivision(segments)
+    S1.trapezoidal_map()
+
+    S2 = Subdivision(segments)
+    S2.trapezoidal_map(S1.seed)
+
+    C1 = S1.T.D.compile()
+    C2 = S2.T.D.compile()
+    assert list(C1.kind) == list(C2.kind)
+    assert list(C1.segments.px) == list(C2.segments.px)
+
+
+def test_bounded_construction():
+    S = Subdivision(segments)
+
+    assert S.bounded_trapezoidal_map(depth_factor=10, seed=0)
+    assert S.T.D.compiled.max_depth() <= 10 * 4
+
+    # Every segment and every distinct endpoint adds one trapezoid.
+    assert len(S.T.trapezoids) == 1 + len(segments) + 11
+
+
+def test_add_segment():
+    S = Subdivision(set(segments))
+    S.trapezoidal_map(0)
+
+    # The new segment lies partly outside the bounding box.
+    s = Segment(Point(15, 16), Point(24, 18))
+    S.add_segment(s)
+
+    assert s in S.segments
+    assert (S.T.R.top.q.x, S.T.R.top.q.y) == (25, 19)
+    assert len(S.T.trapezoids) == 1 + len(segments) + 11 + 1 + 2
+    assert S.T.D.query(Point(20, 18)).bottom is s
+    assert S.T.D.query(Point(20, 16)).top is s
+
+
+def test_add_segment_shared_endpoint():
+    S = Subdivision({Segment(Point(0, 0), Point(5, 5))})
+    S.trapezoidal_map(0)
+
+    # The new segment starts at the same coordinates as the existing endpoint, but with a new point.
+    s = Segment(Point(5, 5), Point(10, 0))
+    S.add_segment(s)
+
+    assert s.p is next(t.q for t in S.segments if t is not s)
+    assert len(S.T.trapezoids) == 1 + 2 + 3
+    assert all(t.leftp.x < t.rightp.x for t in S.T.trapezoids)
+
+
+def test_remove_segment():
+    S = Subdivision(set(segments))
+    S.trapezoidal_map(0)
+
+    s = next(s for s in S.segments if (s.p.x, s.q.x) == (7, 11))
+    t = next(t for t in S.segments if (t.p.x, t.q.x) == (14, 18))
+
+    # The endpoints of the first segment are still shared, while the right endpoint of the second one is freed.
+    S.remove_segment(s, rebuild_fraction=1)
+    assert len(S.T.trapezoids) == 1 + len(segments) + 11 - 1
+    S.remove_segment(t, rebuild_fraction=1)
+    assert len(S.T.trapezoids) == 1 + len(segments) + 11 - 3
+
+    assert S.tombstones == 2
+    assert S.T.D.query(Point(9, 4)).bottom is S.T.R.bottom
+    assert S.T.D.query(Point(16, 4)).top is not t
+
+    # Removing too many segments rebuilds the map.
+    u = next(u for u in S.segments if (u.p.x, u.q.x) == (0, 3))
+    S.remove_segment(u, rebuild_fraction=0.2)
+    assert S.tombstones == 0
+    assert len(S.T.trapezoids) == 1 + len(segments) - 3 + 9
+
+
+def test_trapezoids_along():
+    stairs = polyline([(0, -10), (0, -8), (4, -8), (4, -5), (8, -5), (8, -4)])
+    S = Subdivision(set(segments) | stairs)
+    S.trapezoidal_map(0)
+    S.remove_segment(next(s for s in S.segments if (s.p.x, s.q.x) == (7, 11)), rebuild_fraction=1)
+
+    # The chains found through the search structure are the trapezoids on each side, from left to right.
+    for s in S.segments:
+        upper, lower = S.T.trapezoids_along(s)
+        assert set(upper) == {t for t in S.T.trapezoids if t.bottom is s}
+        assert set(lower) == {t for t in S.T.trapezoids if t.top is s}
+        for chain in (upper, lower):
+            assert all(a.rightp.lies_left(b.rightp) for a, b in zip(chain, chain[1:]))
+
+
+def test_shared_x_and_vertical_segments():
+    # A staircase of vertical and horizontal steps, above a polyline whose vertices share the same X coordinates.
+    stairs = polyline([(0, 0), (0, 2), (4, 2), (4, 5), (8, 5), (8, 6)])
+    below = polyline([(0, -3), (4, -1), (8, -4)])
+    S = Subdivision(stairs | below)
+    S.trapezoidal_map(0)
+
+    assert len(S.T.trapezoids) == 1 + 7 + 9
+    assert S.T.D.query(Point(2, 3)).bottom.p.y == 2
+    assert S.T.D.query(Point(2, 1)).top.p.y == 2
+    assert S.T.D.query(Point(6, 0)).bottom.q.y == -4
+
+
+def test_parallel_construction():
+    S1 = Subdivision(set(segments))
+    S1.trapezoidal_map(0)
+
+    # The slabs are built in the current process and in worker processes.
+    for processes in (1, 2):
+        S2 = Subdivision(set(segments))
+        S2.parallel_trapezoidal_map(slabs=3, processes=processes, seed=0)
+
+        # The trapezoids are the same, and no trapezoid is split by a wall.
+        assert len(S2.T.trapezoids) == len(S1.T.trapezoids)
+        for i in range(-1, 37):
+            for j in range(-1, 27):
+                q = Point(i / 2 + 0.25, j / 2 + 0.25)
+                t1 = S1.T.D.query(q)
+                t2 = S2.T.D.query(q)
+                assert (t1.leftp.x, t1.rightp.x, t1.top.p.y) == (t2.leftp.x, t2.rightp.x, t2.top.p.y)
+                assert t2 in S2.T.trapezoids
+
+
+def test_parallel_construction_on_wall():
+    crossing = Segment(Point(0, 0), Point(2, 1))
+    S = Subdivision({crossing, Segment(Point(-3, 5), Point(-1, 6)), Segment(Point(3, 5), Point(5, 6))})
+    S.parallel_trapezoidal_map(slabs=2, processes=1, seed=0)
+
+    # The wall lies at the midpoint of the crossing segment, where the searches beside it meet the router.
+    assert {t.bottom for t in S.T.query_window(0.5, -0.5, 1.5, 3)} >= {crossing}
+    S.remove_segment(crossing, rebuild_fraction=1)
+    assert crossing not in S.segments
+    assert all(crossing not in (t.top, t.bottom) for t in S.T.trapezoids)
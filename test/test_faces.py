@@ -0,0 +1,66 @@
+from src.geometry import Point, Segment
+from src.structures import Subdivision
+
+
+# ---SUBDIVISION----
+
+# Two triangles that share an edge, and a parcel with a notch that contains another one.
+polygons = {
+    "west": [(0, 0), (10, 1), (1, 9)],
+    "east": [(10, 1), (11, 10), (1, 9)],
+    "park": [(20, 0), (40, 1), (41, 20), (21, 19)],
+    3: [(25, 5), (35, 6), (30, 9), (34, 15), (26, 14)],
+}
+
+
+def build() -> Subdivision:
+    S = Subdivision.from_polygons(polygons)
+    S.trapezoidal_map(0)
+
+    return S
+
+
+# ----FACES----
+
+def test_from_polygons():
+    S = build()
+
+    # The shared edge and its endpoints are created once, with a label on each side.
+    assert len(S.segments) == 3 + 2 + 4 + 5
+    s = next(s for s in S.segments if (s.p.x, s.q.x) == (1, 10))
+    assert (s.above, s.below) == ("east", "west")
+
+
+def test_query_face():
+    S = build()
+    C = S.T.D.compile()
+
+    queries = [(3, 2, "west"), (9, 8, "east"), (15, 5, None), (22, 10, "park"), (33, 9, "park"), (28, 10, 3)]
+    for x, y, face in queries:
+        assert S.T.D.query_face(Point(x, y)) == face
+        assert C.query_face(Point(x, y)) == face
+
+
+def test_save_load_faces(tmp_path):
+    from src.storage import load
+
+    S = build()
+    path = str(tmp_path / "faces.bin")
+    S.T.save(path)
+    L = load(path)
+
+    assert L.query_face(Point(28, 10)) == 3
+    assert L.query_face(Point(22, 10)) == "park"
+
+
+def test_add_segment_faces():
+    S = build()
+
+    # A segment inside a face splits its trapezoids, which are labeled by the insertion.
+    s = Segment(Point(2, 2), Point(6, 3))
+    s.above = s.below = "west"
+    S.add_segment(s)
+
+    assert S.T.D.query_face(Point(4, 2.2)) == "west"
+    assert S.T.D.query_face(Point(4, 3)) == "west"
+    assert S.T.D.query_face(Point(1.5, 2)) == "west"
@@ -0,0 +1,50 @@
+from src.structures import Subdivision
+
+
+# ---SUBDIVISION----
+
+# A square with vertical edges next to a triangle.
+polygons = {
+    "square": [(0, 0), (10, 0), (10, 10), (0, 10)],
+    "triangle": [(20, 0), (30, 5), (20, 10)],
+}
+
+
+def build() -> Subdivision:
+    S = Subdivision.from_polygons(polygons)
+    S.trapezoidal_map(0)
+
+    return S
+
+
+# ----GRAPH----
+
+def test_adjacency():
+    S = build()
+    T = S.T
+    G = T.adjacency()
+
+    assert len(G) == len(T.trapezoids.slots)
+    assert len(G.indices) == len(G.wall) == G.indptr[-1]
+
+    edges = {}
+    for t in T.trapezoids:
+        for e in range(G.indptr[t.handle], G.indptr[t.handle + 1]):
+            edges[t.handle, G.indices[e]] = G.wall[e]
+
+    # The links are symmetric and never cross a segment.
+    for (i, j), w in edges.items():
+        assert edges[j, i] == w
+        assert T.trapezoids[i].face == T.trapezoids[j].face
+
+    # The centroids are the ones of the trapezoids.
+    for t in T.trapezoids:
+        c = t.centroid()
+        assert (G.centroid_x[t.handle], G.centroid_y[t.handle]) == (c.x, c.y)
+
+    square = next(t for t in T.trapezoids if t.face == "square" and t.leftp.x < t.rightp.x)
+    assert (square.centroid().x, square.centroid().y) == (5, 5)
+
+    # The trapezoid between the polygons shares the vertical sides of both, and the gaps above and below them.
+    t = next(t for t in T.trapezoids if t.face is None and t.leftp.x == 10 and t.rightp.x == 20)
+    assert sorted(G.wall[e] for e in range(G.indptr[t.handle], G.indptr[t.handle + 1])) == [1, 1, 11, 11]
@@ -0,0 +1,95 @@
+from src.geometry import Point, Segment
+from src.nodes import LeafNode, SearchPath
+from src.structures import Subdivision
+
+from polylines import segments
+
+
+# ---SUBDIVISION----
+
+def build() -> Subdivision:
+    S = Subdivision(set(segments))
+    S.trapezoidal_map(0)
+
+    return S
+
+
+# ----LOCATE----
+
+def test_search_path():
+    S = build()
+    D = S.T.D
+    D.enable_cache()
+
+    for q in (Point(8, 8), Point(8, 8), Point(2, 0), Point(16, 13)):
+        path = SearchPath()
+        t = D.query(q, path)
+
+        # The path goes from the root to the leaf of the result, one child at a time, even if the result is cached.
+        assert path.nodes[0] is D.root
+        assert path.nodes[-1] is t.leaf
+        for a, b in zip(path.nodes, path.nodes[1:]):
+            assert b is a.left_child or b is a.right_child
+
+        # Every node but the leaf is a comparison.
+        assert path.comparisons == len(path.nodes) - 1
+        assert not any(isinstance(node, LeafNode) for node in path.nodes[:-1])
+
+    # A query on an endpoint stops at its X-node, after the same number of comparisons as nodes.
+    path = SearchPath()
+    assert D.query(Point(7, 6), path) is None
+    assert path.nodes[-1].point.x == 7
+    assert path.comparisons == len(path.nodes)
+
+
+def test_locate_with_hint():
+    S = build()
+    D = S.T.D
+
+    # The walk from any trapezoid gives the same result as the search structure.
+    hint = D.query(Point(4, 2))
+    for i in range(-1, 37):
+        for j in range(-1, 29):
+            q = Point(i / 2 + 0.25, j / 2 + 0.25)
+            assert D.locate(q, hint) is D.query(q)
+
+    # A trajectory is located point by point.
+    trajectory = [Point(3 + i / 4, 3 + i / 8) for i in range(60)]
+    assert list(D.locate_trajectory(trajectory)) == [D.query(q) for q in trajectory]
+
+
+def test_locate_with_stale_hint():
+    S = build()
+    D = S.T.D
+
+    # The hint is replaced by the insertion of a segment that crosses it.
+    hint = D.query(Point(8, 8))
+    S.add_segment(Segment(Point(6, 7.5), Point(10, 8.5)))
+    assert hint not in S.T.trapezoids
+
+    for q in (Point(8, 7), Point(8, 9), Point(8.5, 8)):
+        t = D.locate(q, hint)
+        assert t is D.query(q) and t in S.T.trapezoids
+
+    # The same happens after a removal.
+    q = Point(8, 7)
+    hint = D.query(q)
+    S.remove_segment(next(s for s in S.segments if s.p.x == 6), rebuild_fraction=1)
+    t = D.locate(q, hint)
+    assert t is D.query(q) and t in S.T.trapezoids
+
+    # A trapezoid of another map is not used as a hint.
+    other = build()
+    assert D.locate(q, other.T.D.query(q)) is D.query(q)
+
+
+def test_trajectory_with_updates():
+    S = build()
+    D = S.T.D
+
+    # The map is updated while the trajectory crosses it.
+    trajectory = [Point(6 + i / 10, 7 + i / 20) for i in range(40)]
+    for k, t in enumerate(D.locate_trajectory(trajectory)):
+        assert t is D.query(trajectory[k]) and t in S.T.trapezoids
+        if k == 10:
+            S.add_segment(Segment(Point(7.05, 8.5), Point(10, 9.5)))
@@ -0,0 +1,47 @@
+import random
+
+from bench.generators import random_grid, random_polylines
+from src.geometry import Point
+from src.structures import Subdivision
+
+
+# ---SUBDIVISION----
+
+def build(segments) -> Subdivision:
+    random.seed(0)
+    S = Subdivision(segments)
+    S.trapezoidal_map()
+
+    return S
+
+
+def y_at(s, x):
+    return s.p.y + s.dy * (x - s.p.x) / s.dx
+
+
+# ----NEIGHBORS----
+
+def test_generated_neighbors():
+    # Long merged runs above and below the inserted segments only appear with a few hundred segments.
+    for segments in (random_grid(300, 1), random_polylines(300, 2)):
+        S = build(segments)
+        T = S.T
+
+        for t in T.trapezoids:
+            # Every neighbor is in the map and links back through the shared wall.
+            for n in (t.urn, t.lrn):
+                if n is not None:
+                    assert n in T.trapezoids
+                    assert n.leftp is t.rightp
+                    assert t in (n.uln, n.lln)
+            for n in (t.uln, t.lln):
+                if n is not None:
+                    assert n in T.trapezoids
+                    assert n.rightp is t.leftp
+                    assert t in (n.urn, n.lrn)
+
+            # The middle of the trapezoid is located in it.
+            x = (t.leftp.x + t.rightp.x) / 2
+            if t.leftp.x < x < t.rightp.x:
+                y = (y_at(t.top, x) + y_at(t.bottom, x)) / 2
+                assert S.T.D.query(Point(x, y)) is t
@@ -0,0 +1,29 @@
+import pytest
+
+from src.pool import QueryPool
+from src.structures import Subdivision
+
+from polylines import segments
+
+
+# ----POOL----
+
+def test_query_pool(tmp_path):
+    np = pytest.importorskip("numpy")
+
+    S = Subdivision(set(segments))
+    S.trapezoidal_map(0)
+    path = str(tmp_path / "map.bin")
+    S.T.save(path)
+
+    # A grid of points, with two endpoints whose queries are not valid.
+    xs = np.array([i / 2 for i in range(-1, 39) for j in range(-1, 31)] + [3, 7], dtype=float)
+    ys = np.array([j / 2 for i in range(-1, 39) for j in range(-1, 31)] + [1, 6], dtype=float)
+
+    with QueryPool(path, processes=2, chunk_size=100) as pool:
+        res = pool.query_many(xs, ys)
+        empty = pool.query_many([], [])
+
+    assert list(res) == list(S.T.D.query_many(xs, ys))
+    assert res[-1] == res[-2] == -1
+    assert empty.shape == (0,) and empty.dtype == np.int64
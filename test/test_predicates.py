@@ -0,0 +1,24 @@
+from src.geometry import Point, Segment
+from src.predicates import lies_above, exact_lies_above
+
+
+# ----PREDICATES----
+
+def test_nearly_collinear_point():
+    # Large projected coordinates, where the floating-point cross product has the wrong sign.
+    px, py, qx, qy = 5003687.438218354, 4003104.6119617764, 5012608.622374014, 4009775.561934628
+    x, y = 5003798.138865712, 4003187.3900400675
+    s = Segment(Point(px, py), Point(qx, qy))
+
+    assert s.dx * (qy - y) - s.dy * (qx - x) <= 0
+    assert not exact_lies_above(px, py, qx, qy, x, y)
+    assert not Point(x, y).lies_above(s)
+    assert not lies_above(px, py, qx, qy, s.dx, s.dy, x, y)
+
+
+def test_collinear_point():
+    s = Segment(Point(0.1, 0.2), Point(0.7, 1.4))
+
+    # A point on the line lies above the segment.
+    assert Point(0.3, 0.6).lies_above(s) == exact_lies_above(0.1, 0.2, 0.7, 1.4, 0.3, 0.6)
+    assert Point(0.5, 1.0).lies_above(Segment(Point(0, 0), Point(1, 2)))
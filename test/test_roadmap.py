@@ -0,0 +1,71 @@
+import math
+
+from src.geometry import Point
+from src.structures import Subdivision
+
+
+# ---SUBDIVISION----
+
+# Two obstacles, and a room with a pillar whose floor is free space only when requested.
+polygons = {
+    "square": [(10, 10), (20, 10), (20, 20), (10, 20)],
+    "triangle": [(40, 0), (50, 0), (45, 30)],
+    "room": [(60, 0), (80, 0), (80, 20), (60, 20)],
+    "pillar": [(68, 8), (72, 8), (72, 12), (68, 12)],
+}
+
+
+def build() -> Subdivision:
+    S = Subdivision.from_polygons(polygons)
+    S.trapezoidal_map(0)
+
+    return S
+
+
+def crosses(a: Point, b: Point, polygon: list) -> bool:
+    # Sample the edge of the path and check that no sample lies strictly inside the convex polygon.
+    for k in range(1, 100):
+        x = a.x + (b.x - a.x) * k / 100
+        y = a.y + (b.y - a.y) * k / 100
+        n = len(polygon)
+        sides = [(polygon[(i + 1) % n][0] - polygon[i][0]) * (y - polygon[i][1]) -
+                 (polygon[(i + 1) % n][1] - polygon[i][1]) * (x - polygon[i][0]) for i in range(n)]
+        if all(c > 1e-9 for c in sides):
+            return True
+
+    return False
+
+
+# ----ROADMAP----
+
+def test_plan():
+    S = build()
+    M = S.T.roadmap()
+
+    start = Point(9.5, 15)
+    goal = Point(55, 15)
+    path = M.plan(start, goal)
+
+    assert path[0] is start and path[-1] is goal
+    for a, b in zip(path, path[1:]):
+        assert not any(crosses(a, b, polygons[name]) for name in ("square", "triangle"))
+    assert sum(math.hypot(b.x - a.x, b.y - a.y) for a, b in zip(path, path[1:])) >= goal.x - start.x
+
+    # Points inside the obstacles have no path.
+    assert M.plan(Point(15, 15), goal) is None
+    assert M.plan(start, Point(45, 10)) is None
+
+
+def test_plan_many():
+    S = build()
+    M = S.T.roadmap(free={"room"})
+
+    starts = [Point(62, 2), Point(62, 2), Point(62, 2)]
+    goals = [Point(78, 18), Point(70, 10), Point(15, 15)]
+    paths = M.plan_many(starts, goals)
+
+    # The pillar is avoided, and the other faces are not reachable.
+    assert paths[0][0] is starts[0] and paths[0][-1] is goals[0]
+    assert all(not crosses(a, b, polygons["pillar"]) for a, b in zip(paths[0], paths[0][1:]))
+    assert paths[1] is None
+    assert paths[2] is None
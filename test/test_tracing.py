@@ -0,0 +1,62 @@
+import pytest
+
+import src.tracing
+from src.geometry import Point
+from src.structures import Subdivision
+from src.tracing import tracer, set_tracing, OFF, DEBUG
+
+from polylines import segments
+
+
+# ---SUBDIVISION----
+
+@pytest.fixture
+def restore():
+    yield
+    set_tracing(OFF)
+
+
+# ----TRACING----
+
+def test_disabled_tracer(restore, monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("A disabled tracer has been used.")
+
+    set_tracing(OFF, fail)
+    monkeypatch.setattr(src.tracing, "Event", fail)
+
+    # Count the calls that reach the tracer, which must not depend on the number of insertions.
+    calls = []
+    monkeypatch.setattr(tracer, "message", lambda *args: calls.append(args))
+    monkeypatch.setattr(tracer, "emit", lambda *args, **kwargs: calls.append(args))
+
+    S = Subdivision(set(segments))
+    S.trapezoidal_map(0)
+    S.T.D.query(Point(8, 8))
+    count = len(calls)
+
+    S = Subdivision(set(list(segments)[:3]))
+    S.trapezoidal_map(0)
+    S.T.D.query(Point(8, 8))
+    assert len(calls) == 2 * count
+
+
+def test_custom_sink(restore):
+    events = []
+    set_tracing(DEBUG, events.append)
+
+    S = Subdivision(set(segments))
+    S.trapezoidal_map(0)
+    S.T.D.query(Point(8, 8))
+
+    # The events carry the objects involved, not their text.
+    kinds = {event.kind for event in events}
+    assert {"insert_step", "node_visited", "trapezoid_created", "trapezoid_destroyed", "leaf_reached"} <= kinds
+
+    steps = [event for event in events if event.kind == "insert_step"]
+    assert len(steps) == len(segments)
+    assert all(event.data["segment"] in segments for event in steps)
+
+    created = [event.data["trapezoid"] for event in events if event.kind == "trapezoid_created"]
+    destroyed = [event.data["trapezoid"] for event in events if event.kind == "trapezoid_destroyed"]
+    assert len(created) - len(destroyed) == len(S.T.trapezoids)
@@ -0,0 +1,49 @@
+from src.structures import Subdivision
+
+
+# ---SUBDIVISION----
+
+# Two triangles that share an edge, and a square with vertical edges.
+polygons = {
+    "west": [(0, 0), (10, 1), (1, 9)],
+    "east": [(10, 1), (11, 10), (1, 9)],
+    "square": [(20, 0), (30, 0), (30, 10), (20, 10)],
+}
+
+
+def build() -> Subdivision:
+    S = Subdivision.from_polygons(polygons)
+    S.trapezoidal_map(0)
+
+    return S
+
+
+# ----WINDOW----
+
+def test_query_window():
+    S = build()
+    T = S.T
+
+    windows = [(-5, -5, 40, 15), (2, 2, 4, 4), (9, 0, 12, 3), (19, 2, 21, 3), (25, 5, 35, 6), (10, 1, 20, 9)]
+    for w in windows:
+        res = T.query_window(*w)
+
+        # The flood finds exactly the overlapping trapezoids, once each.
+        assert len(res) == len(set(res))
+        assert set(res) == {t for t in T.trapezoids if t.overlaps(*w)}
+
+    assert T.query_window(50, 50, 60, 60) == []
+    assert T.query_window(2, 2, 2, 4) == []
+
+
+def test_query_window_segments_and_faces():
+    S = build()
+    T = S.T
+
+    assert T.query_window_faces(2, 2, 4, 4) == {"west"}
+    assert T.query_window_faces(5, 4, 7, 6) == {"west", "east"}
+    assert T.query_window_faces(25, -5, 35, 5) == {"square"}
+
+    # Only the vertical edge and the bottom of the square cross the window.
+    res = T.query_window_segments(29, -1, 31, 5)
+    assert {(s.p.x, s.p.y, s.q.x, s.q.y) for s in res} == {(20, 0, 30, 0), (30, 0, 30, 10)}